@@ -3,15 +3,52 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from django.conf import settings
 from django.conf.urls.static import static
-from groceryItem.views import GroceryItemViewSet
+from groceryItem.async_views import AsyncItemDetailView, AsyncItemListView
+from groceryItem.views import (
+    GroceryItemViewSet,
+    GroceryListViewSet,
+    item_stream,
+    metrics_view,
+    health_view
+)
 
 router = DefaultRouter()
 router.register(r'items', GroceryItemViewSet, basename='groceryitem')
+router.register(r'lists', GroceryListViewSet, basename='grocerylist')
+router.register(
+    r'lists/(?P<list_pk>[^/.]+)/items', GroceryItemViewSet, basename='listitem'
+)
+
+# Same paths and names as the router's item routes, which they shadow
+async_item_patterns = [
+    path('items/', AsyncItemListView.as_view(), name='groceryitem-list'),
+    path('items/<uuid:pk>/', AsyncItemDetailView.as_view(), name='groceryitem-detail'),
+    path(
+        'lists/<str:list_pk>/items/',
+        AsyncItemListView.as_view(basename='listitem'),
+        name='listitem-list'
+    ),
+    path(
+        'lists/<str:list_pk>/items/<uuid:pk>/',
+        AsyncItemDetailView.as_view(basename='listitem'),
+        name='listitem-detail'
+    ),
+]
 
 urlpatterns = [
+    # Must precede the router so "stream" is not taken for an item id
+    path('items/stream/', item_stream, name='groceryitem-stream'),
+    path(
+        'lists/<uuid:list_pk>/items/stream/', item_stream, name='listitem-stream'
+    ),
+    path('metrics/', metrics_view, name='metrics'),
+    path('health/', health_view, name='health'),
     path('', include(router.urls)),
 ]
 
+if settings.GROCERY_ASYNC_VIEWS:
+    urlpatterns[-1:-1] = async_item_patterns
+
 # Serve media files in development
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
+import django
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -46,6 +50,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware
+    'groceryItem.middleware.RequestMetricsMiddleware',
+    # Inside the metrics, so shed reads are counted and DB time is known
+    'groceryItem.middleware.LoadSheddingMiddleware',
+    # Next, so it compresses what every later middleware produced
+    'groceryItem.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -54,6 +64,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, so a profile holds the view and its rendering only
+    'groceryItem.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -80,12 +92,96 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
+# Chosen by environment: GROCERY_DB_ENGINE=postgresql for production, anything
+# else keeps SQLite. Connections are kept open for GROCERY_DB_CONN_MAX_AGE
+# seconds and health-checked before reuse. Under ASGI set it to 0 and pool
+# instead (GROCERY_DB_POOL=1 on Django 5.1+ with psycopg 3, or PgBouncer).
+
+DB_ENGINE = os.environ.get('GROCERY_DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('GROCERY_DB_CONN_MAX_AGE', 60))
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('GROCERY_DB_NAME', 'grocery'),
+            'USER': os.environ.get('GROCERY_DB_USER', 'grocery'),
+            'PASSWORD': os.environ.get('GROCERY_DB_PASSWORD', ''),
+            'HOST': os.environ.get('GROCERY_DB_HOST', '127.0.0.1'),
+            'PORT': os.environ.get('GROCERY_DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': 5,
+            },
+        }
+    }
+    if os.environ.get('GROCERY_DB_POOL') == '1' and django.VERSION >= (5, 1):
+        # Pooled connections replace persistent ones
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('GROCERY_DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('GROCERY_DB_POOL_MAX', 10)),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('GROCERY_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+
+# Caches
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory is per process; use a shared backend (Redis, Memcached) when
+# running several workers so list cache invalidation reaches all of them.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'grocery',
     }
 }
+GROCERY_LIST_CACHE = 'default'  # Cache alias used for GET /api/items/
+GROCERY_LIST_CACHE_TIMEOUT = 300  # Seconds; writes invalidate immediately
+GROCERY_COMPRESS_MIN_SIZE = 512  # Bytes; smaller API responses are sent as-is
+# Unpaginated JSON lists this long or longer are streamed from a cursor instead
+# of being built in memory (and are not cached or compressed); None disables it
+GROCERY_STREAM_LIST_MIN_ITEMS = 5000
+
+# Deleted items leave tombstones for GET /api/items/changes/. Run
+# `manage.py compact_tombstones` periodically (e.g. daily from cron) to purge
+# those older than this; clients that last synced before then reload the list.
+GROCERY_TOMBSTONE_RETENTION_DAYS = 30
+
+# New items get time-ordered UUIDv7 ids (4 for random UUIDv4). Rekey items
+# created with v4 ids offline with `manage.py rekey_items`.
+GROCERY_ITEM_ID_VERSION = 7
+
+# Responses to writes sent with an Idempotency-Key are kept this many seconds
+# so offline clients can retry safely; purge expired ones with
+# `manage.py purge_idempotency_keys`.
+GROCERY_IDEMPOTENCY_TTL = 24 * 60 * 60
+
+# An item marked bought again within this many seconds of its name's last
+# purchase (a bought -> not bought -> bought slip) is not logged again
+GROCERY_PURCHASE_MIN_INTERVAL = 15 * 60
+
+# Serve the item routes with the async views in groceryItem/async_views.py.
+# Only worthwhile under an ASGI server (backend.asgi); under WSGI every async
+# view runs in its own event loop. GROCERY_ASYNC_VIEWS=1 to enable.
+GROCERY_ASYNC_VIEWS = os.environ.get('GROCERY_ASYNC_VIEWS') == '1'
+
+# Applied to every new SQLite connection (see groceryItem/db.py). WAL lets
+# readers run alongside the single writer; busy_timeout makes writers wait
+# for the lock instead of failing with "database is locked".
+GROCERY_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+}
 
 
 # Password validation
@@ -154,7 +250,11 @@ REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_CLASSES': [],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
-        'user': '1000/hour'
+        'user': '1000/hour',
+        # Token buckets on the item routes (see groceryItem/throttling.py):
+        # a burst of N, refilled at N per period. None turns a scope off.
+        'items_client': '30/second',
+        'items_global': '500/second',
     },
 }
 
@@ -167,6 +267,21 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Browsers must be allowed to send Idempotency-Key on cross-origin writes
+# and to read the replay marker and throttling hints on the response
+CORS_ALLOW_HEADERS = [
+    'accept',
+    'authorization',
+    'content-type',
+    'origin',
+    'user-agent',
+    'x-csrftoken',
+    'x-requested-with',
+    'idempotency-key',
+    'x-grocery-profile',
+]
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'Retry-After', 'X-Grocery-Profile-Id']
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -187,5 +302,54 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        # One JSON line per request from RequestMetricsMiddleware
+        'groceryItem.metrics': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
-}
\ No newline at end of file
+}
+# `manage.py test` sends thousands of requests; keep their log lines (one
+# per request from RequestMetricsMiddleware) out of grocery_api.log
+if sys.argv[1:2] == ['test']:
+    LOGGING['handlers']['file'] = {'class': 'logging.NullHandler'}
+# Grocery item change feed (GET /api/items/stream/, needs an ASGI server).
+# The default backend only reaches streams in the same process. With several
+# workers use groceryItem.events.CacheEventBackend and point
+# GROCERY_EVENTS_CACHE at a cache they share (Redis or Memcached).
+GROCERY_EVENTS_BACKEND = 'groceryItem.events.LocalEventBackend'
+GROCERY_EVENTS_HISTORY = 1000  # Events kept for Last-Event-ID resumption
+GROCERY_EVENTS_HEARTBEAT = 15  # Seconds between keep-alive comments
+GROCERY_EVENTS_CACHE = 'default'  # Cache alias used by CacheEventBackend
+GROCERY_EVENTS_CACHE_TIMEOUT = 300  # Seconds a shared event can be replayed
+GROCERY_EVENTS_POLL_INTERVAL = 0.5  # Seconds between CacheEventBackend polls
+# Item API rate limiting. The default keeps token buckets in process memory;
+# CacheBucketBackend shares them between workers through GROCERY_THROTTLE_CACHE.
+GROCERY_THROTTLE_BACKEND = 'groceryItem.throttling.LocalBucketBackend'
+GROCERY_THROTTLE_CACHE = 'default'
+GROCERY_THROTTLE_MAX_KEYS = 10000  # Client buckets kept by the local backend
+# GET /api/metrics/ shows per-view latency and query counts, so it is served
+# only to staff sessions and to scrapers sending `Authorization: Bearer
+# <GROCERY_METRICS_TOKEN>`. GROCERY_METRICS_PUBLIC = True serves it to anyone
+GROCERY_METRICS_TOKEN = os.environ.get('GROCERY_METRICS_TOKEN')
+GROCERY_METRICS_PUBLIC = False
+# Shed API reads with 503 while overloaded so writes stay responsive; None disables
+GROCERY_LOAD_SHEDDING = {
+    'MAX_IN_FLIGHT': 64,  # Requests being handled by this process
+    'MAX_DB_TIME': 0.5,  # Seconds of SQL per request, moving average
+    'RETRY_AFTER': 2,  # Seconds, sent in Retry-After
+    'PATH_PREFIX': '/api/',
+    'EXEMPT_VIEWS': ('health', 'metrics'),
+}
+# cProfile item API calls sent with a signed X-Grocery-Profile token (from
+# `manage.py profiles --token`) and a SAMPLE_RATE fraction of the rest; read
+# the captures with `manage.py profiles`. None disables it
+GROCERY_PROFILING = {
+    'DIRECTORY': BASE_DIR / 'profiles',
+    'SAMPLE_RATE': 0.0,  # Fraction of item API requests profiled without a token
+    'MAX_FILES': 200,  # Newest captures kept; older ones are deleted
+    'TOKEN_MAX_AGE': 60 * 60,  # Seconds a token stays valid
+    'VIEWS': ('groceryitem', 'listitem'),  # Route basenames of GroceryItemViewSet
+    'EXEMPT_VIEWS': ('groceryitem-stream', 'listitem-stream'),
+}
@@ -1,20 +1,20 @@
 from django.contrib import admin
-from .models import GroceryItem
+from .models import GroceryItem, GroceryList
 
 
 @admin.register(GroceryItem)
 class GroceryItemAdmin(admin.ModelAdmin):
     """Admin interface for GroceryItem model"""
     
-    list_display = ['name', 'bought', 'created_at', 'updated_at']
-    list_filter = ['bought', 'created_at']
+    list_display = ['name', 'grocery_list', 'bought', 'created_at', 'updated_at']
+    list_filter = ['grocery_list', 'bought', 'created_at']
     search_fields = ['name']
     readonly_fields = ['id', 'created_at', 'updated_at']
     ordering = ['-created_at']
     
     fieldsets = (
         (None, {
-            'fields': ('name', 'bought')
+            'fields': ('grocery_list', 'name', 'bought')
         }),
         ('Timestamps', {
             'fields': ('id', 'created_at', 'updated_at'),
@@ -22,6 +22,23 @@ class GroceryItemAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_search_results(self, request, queryset, search_term):
+        """Search names by case-insensitive prefix so the name index is used"""
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.name_startswith(search_term), False
+    
     def get_queryset(self, request):
         """Optimize queryset for admin list view"""
-        return super().get_queryset(request).select_related()
\ No newline at end of file
+        return super().get_queryset(request).select_related('grocery_list')
+
+
+@admin.register(GroceryList)
+class GroceryListAdmin(admin.ModelAdmin):
+    """Admin interface for GroceryList model"""
+    
+    list_display = ['name', 'created_at']
+    search_fields = ['name']
+    readonly_fields = ['id', 'created_at']
+    ordering = ['created_at']
\ No newline at end of file
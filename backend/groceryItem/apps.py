@@ -10,4 +10,7 @@ class GroceryConfig(AppConfig):
     
     def ready(self):
         """Initialize app when Django starts"""
-        pass
\ No newline at end of file
+        from django.db.models.signals import post_migrate
+        from . import db, signals  # noqa: F401 - registers signal receivers
+        
+        post_migrate.connect(db.create_default_list, sender=self)
\ No newline at end of file
@@ -0,0 +1,345 @@
+"""
+Async-native item views for ASGI deployments
+
+With ``settings.GROCERY_ASYNC_VIEWS`` on (see api/urls.py), list, retrieve,
+create, partial update and delete on the item routes and the list-scoped
+item routes are served by these views instead of GroceryItemViewSet.
+Reads use the async ORM (``aget``, ``aaggregate``, ``async for``) and
+create and delete use ``acreate`` / ``adelete``, so while those wait on the
+database they hold no worker thread. PATCH runs the viewset's
+``update_bought`` through ``sync_to_async``, on a thread, because that
+single UPDATE needs a transaction the async ORM cannot open. Responses are
+the same bytes the viewset sends.
+
+A few requests are handed to the viewset on a thread instead. These are
+writes with an Idempotency-Key (the write and its stored response need
+one transaction), the browsable API, non-JSON bodies and anything content
+negotiation rejects. The viewset then produces its usual response or error.
+
+Native requests are throttled by the viewset's token buckets before any
+other work.
+"""
+import json
+import logging
+import math
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import classonlymethod
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import NotAcceptable, NotFound, Throttled
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+
+from . import cache as list_cache
+from . import idempotency
+from . import throttling
+from . import transfer
+from .conditional import (
+    PreconditionFailed,
+    alist_validators,
+    if_match_versions,
+    item_validators,
+    not_modified,
+    set_validators,
+)
+from .models import GroceryItem, GroceryList, DEFAULT_LIST_ID
+from .filters import InvalidListQuery, ListQuery
+from .pagination import KeysetPagination
+from .rendering import (
+    COLUMNAR_RENDERERS,
+    GroceryItemJSONRenderer,
+    item_columns,
+    item_dict,
+    item_dicts,
+    item_rows,
+)
+from .serializers import (
+    GroceryItemCreateSerializer,
+    GroceryItemSerializer,
+    GroceryItemUpdateSerializer,
+)
+from .views import GroceryItemViewSet, update_bought
+
+logger = logging.getLogger(__name__)
+
+RENDERERS = [GroceryItemJSONRenderer(), *(renderer() for renderer in COLUMNAR_RENDERERS)]
+
+
+def _cache_lookup(request, grocery_list_id, representation):
+    key = list_cache.list_key(request, grocery_list_id, representation)
+    return key, list_cache.get_entry(key)
+
+
+class AsyncItemView(View):
+    """
+    Shared plumbing: list scoping, content negotiation, rendering and the
+    fallback to the viewset
+    """
+
+    native_methods = ('GET', 'POST', 'PATCH', 'DELETE')
+    viewset_actions = None
+    viewset_view = None
+    basename = 'groceryitem'
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        viewset_view = GroceryItemViewSet.as_view(
+            cls.viewset_actions, basename=initkwargs.get('basename', cls.basename)
+        )
+        view = super().as_view(viewset_view=viewset_view, **initkwargs)
+        # Like every DRF view; django.views.decorators.csrf_exempt would hide
+        # that this view is a coroutine on Django 4.2
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        if self.should_delegate(request):
+            return await self.delegate(request, *args, **kwargs)
+        try:
+            self.renderer, self.accepted_media_type = DefaultContentNegotiation().select_renderer(
+                Request(request), RENDERERS
+            )
+        except (NotAcceptable, Http404):
+            return await self.delegate(request, *args, **kwargs)
+
+        wait = await self.throttle_wait(request)
+        if wait is not None:
+            response = self.render(
+                {"error": str(Throttled(wait).detail)}, status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            response['Retry-After'] = str(math.ceil(wait))
+            return response
+
+        try:
+            self.grocery_list_id = await self.get_grocery_list_id(kwargs.get('list_pk'))
+        except NotFound as e:
+            return self.render({"error": str(e.detail)}, status.HTTP_404_NOT_FOUND)
+        return await super().dispatch(request, *args, **kwargs)
+
+    def should_delegate(self, request):
+        return (
+            request.method not in self.native_methods
+            or 'text/html' in request.headers.get('Accept', '')
+            or (request.method in idempotency.METHODS and idempotency.HEADER in request.headers)
+            or (request.method in ('POST', 'PATCH') and request.content_type != 'application/json')
+        )
+
+    async def delegate(self, request, *args, **kwargs):
+        """Serve the request with GroceryItemViewSet on a worker thread"""
+        return await sync_to_async(self.viewset_view)(request, *args, **kwargs)
+
+    async def throttle_wait(self, request):
+        """Take from the viewset's buckets; None or the seconds to wait"""
+        throttle_classes = GroceryItemViewSet.throttle_classes
+        if throttling.get_bucket_backend().blocking:
+            return await sync_to_async(throttling.throttle_wait)(
+                Request(request), self, throttle_classes
+            )
+        return throttling.throttle_wait(Request(request), self, throttle_classes)
+
+    async def get_grocery_list_id(self, list_pk):
+        """Return the id of the list in the URL, or the default list"""
+        if list_pk is None:
+            return DEFAULT_LIST_ID
+        try:
+            return await GroceryList.objects.values_list('pk', flat=True).aget(pk=list_pk)
+        except (GroceryList.DoesNotExist, ValueError, ValidationError):
+            raise NotFound("List not found")
+
+    def get_queryset(self):
+        return GroceryItem.objects.filter(
+            grocery_list_id=self.grocery_list_id
+        ).order_by('created_at')
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        """Encode ``data`` with the negotiated renderer, as DRF's Response would"""
+        if data is None:
+            response = HttpResponse(status=status_code)
+        else:
+            response = HttpResponse(
+                self.renderer.render(data, self.renderer.media_type),
+                content_type=self.renderer.media_type,
+                status=status_code
+            )
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+    def parse_json(self, request):
+        """Return the decoded JSON body, or raise ValueError"""
+        return json.loads(request.body)
+
+    def internal_error(self, message, e):
+        logger.error(f"{message}: {str(e)}")
+        return self.render(
+            {"error": "Internal server error"},
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+class AsyncItemListView(AsyncItemView):
+    """
+    GET /items/ - List all items (?page_size=&cursor= for keyset pages)
+    POST /items/ - Create new item
+    """
+
+    viewset_actions = {'get': 'list', 'post': 'create'}
+
+    async def get(self, request, *args, **kwargs):
+        """
+        Same filters, cache, validators, formats and streaming as
+        GroceryItemViewSet.list
+        """
+        try:
+            paginator = KeysetPagination()
+            query = ListQuery(request.GET, paginator.is_requested(Request(request)))
+            queryset = query.filter(self.get_queryset())
+            representation = self.renderer.format
+            build = item_columns if getattr(self.renderer, 'columnar', False) else item_dicts
+
+            key, entry = await sync_to_async(_cache_lookup)(
+                request, self.grocery_list_id, representation
+            )
+            if entry is not None:
+                etag, data = entry
+                count = None
+            else:
+                etag, count = await alist_validators(request, queryset, representation)
+                data = None
+
+            cached = not_modified(request, etag)
+            if cached is not None:
+                return set_validators(cached, etag)
+
+            if (
+                data is None
+                and not query.paginated
+                and transfer.streams_list(count, self.renderer, self.accepted_media_type)
+            ):
+                response = StreamingHttpResponse(
+                    transfer.aexport_items(queryset, 'json', fields=query.fields),
+                    content_type=self.renderer.media_type
+                )
+                return set_validators(response, etag)
+
+            if data is None:
+                rows = query.rows(queryset)
+                page = await paginator.apaginate_queryset(rows, Request(request))
+                if page is not None:
+                    data = paginator.get_paginated_response(build(page, query.fields)).data
+                else:
+                    data = build([row async for row in rows], query.fields)
+                await sync_to_async(list_cache.set_entry)(key, (etag, data))
+
+            return set_validators(self.render(data), etag)
+        except InvalidListQuery as e:
+            return self.render({"error": str(e.detail)}, status.HTTP_400_BAD_REQUEST)
+        except NotFound as e:
+            return self.render({"error": str(e.detail)}, status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return self.internal_error("Error retrieving grocery items", e)
+
+    async def post(self, request, *args, **kwargs):
+        try:
+            try:
+                payload = self.parse_json(request)
+            except ValueError:
+                return await self.delegate(request, *args, **kwargs)
+
+            serializer = GroceryItemCreateSerializer(data=payload)
+            if not serializer.is_valid():
+                return self.render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+            item = await GroceryItem.objects.acreate(
+                **serializer.validated_data,
+                bought=False,
+                grocery_list_id=self.grocery_list_id
+            )
+            return self.render(GroceryItemSerializer(item).data, status.HTTP_201_CREATED)
+        except Exception as e:
+            return self.internal_error("Error creating grocery item", e)
+
+
+class AsyncItemDetailView(AsyncItemView):
+    """
+    GET /items/{id}/ - Retrieve specific item
+    PATCH /items/{id}/ - Update item status
+    DELETE /items/{id}/ - Delete item
+    """
+
+    viewset_actions = {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    }
+
+    async def get_item(self, queryset, pk):
+        """Return the item or None if it is not in this list"""
+        try:
+            return await queryset.aget(pk=pk)
+        except GroceryItem.DoesNotExist:
+            return None
+
+    def item_not_found(self):
+        return self.render({"error": "Item not found"}, status.HTTP_404_NOT_FOUND)
+
+    async def get(self, request, pk, *args, **kwargs):
+        try:
+            item = await self.get_item(item_rows(self.get_queryset(), 'updated_at'), pk)
+            if item is None:
+                return self.item_not_found()
+
+            etag, last_modified = item_validators(item)
+            cached = not_modified(request, etag, last_modified)
+            if cached is not None:
+                return set_validators(cached, etag, last_modified)
+
+            return set_validators(self.render(item_dict(item)), etag, last_modified)
+        except Exception as e:
+            return self.internal_error(f"Error retrieving grocery item {pk}", e)
+
+    async def patch(self, request, pk, *args, **kwargs):
+        try:
+            try:
+                payload = self.parse_json(request)
+            except ValueError:
+                return await self.delegate(request, pk, *args, **kwargs)
+
+            serializer = GroceryItemUpdateSerializer(data=payload, partial=True)
+            if not serializer.is_valid():
+                return self.render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+            if 'bought' not in serializer.validated_data:
+                return await self.delegate(request, pk, *args, **kwargs)
+
+            # The viewset's single-UPDATE write; it needs a transaction, which
+            # the async ORM cannot open
+            item = await sync_to_async(update_bought)(
+                self.grocery_list_id,
+                pk,
+                serializer.validated_data['bought'],
+                if_match_versions(request, pk)
+            )
+            response = self.render(GroceryItemSerializer(item).data)
+            response['ETag'] = item_validators(item)[0]
+            return response
+        except GroceryItem.DoesNotExist:
+            return self.item_not_found()
+        except PreconditionFailed as e:
+            return self.render({"error": str(e.detail)}, e.status_code)
+        except Exception as e:
+            return self.internal_error(f"Error updating grocery item {pk}", e)
+
+    async def delete(self, request, pk, *args, **kwargs):
+        try:
+            item = await self.get_item(self.get_queryset(), pk)
+            if item is None:
+                return self.item_not_found()
+
+            await item.adelete()
+            return self.render(None, status.HTTP_204_NO_CONTENT)
+        except Exception as e:
+            return self.internal_error(f"Error deleting grocery item {pk}", e)
@@ -0,0 +1,87 @@
+"""
+Read-through cache for the item list payload
+
+Entries are stored under a key that embeds the grocery list's *version*.
+Any write to one of its items bumps that list's version, so every worker
+sharing the cache backend moves to fresh keys at once and old entries simply
+age out; other households' entries are untouched. The version is
+bumped when the write happens and again once its transaction commits: the
+second bump discards anything a concurrent reader cached from a snapshot
+taken before the commit.
+
+The cache alias and timeout come from ``settings.GROCERY_LIST_CACHE`` and
+``settings.GROCERY_LIST_CACHE_TIMEOUT``. The default local-memory backend
+is per process; point the alias at a shared backend (Redis, Memcached)
+when running several workers.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from . import metrics
+
+VERSION_KEY = 'grocery:items:version:{}'
+# Entries are (etag, payload); the suffix changes with that layout
+KEY_PREFIX = 'grocery:items:list:2'
+
+
+def get_cache():
+    return caches[getattr(settings, 'GROCERY_LIST_CACHE', 'default')]
+
+
+def current_version(grocery_list_id):
+    """Return a list's version, creating it if it is missing"""
+    cache = get_cache()
+    key = VERSION_KEY.format(grocery_list_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock, not 1, so an evicted counter never
+        # comes back at a version that still has entries
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(grocery_list_id):
+    """Move a list to a new version, orphaning its cached entries"""
+    cache = get_cache()
+    key = VERSION_KEY.format(grocery_list_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate(grocery_list_id):
+    """Invalidate a list now and again when the current transaction commits"""
+    bump_version(grocery_list_id)
+    transaction.on_commit(lambda: bump_version(grocery_list_id))
+
+
+def list_key(request, grocery_list_id, representation='json'):
+    """
+    Return the cache key for this list request at the list's current version
+
+    ``representation`` is the negotiated renderer format, since row and
+    columnar payloads (and their ETags) differ for the same URL.
+    """
+    variant = hashlib.md5(
+        f"{representation}:{request.get_host()}{request.path}"
+        f"?{request.META.get('QUERY_STRING', '')}"
+        .encode('utf-8')
+    ).hexdigest()
+    return f"{KEY_PREFIX}:{grocery_list_id}:{current_version(grocery_list_id)}:{variant}"
+
+
+def get_entry(key):
+    """Return the cached entry for ``key`` or None, counting hits and misses"""
+    entry = get_cache().get(key)
+    metrics.registry.record_cache('hit' if entry is not None else 'miss')
+    return entry
+
+
+def set_entry(key, entry):
+    get_cache().set(key, entry, getattr(settings, 'GROCERY_LIST_CACHE_TIMEOUT', 300))
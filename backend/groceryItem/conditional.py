@@ -0,0 +1,133 @@
+"""
+Conditional request helpers for the grocery item endpoints
+
+Validators are derived from cheap aggregates so that a request answered
+with 304 Not Modified never loads or serializes any rows. An item's ETag
+also works as its version for conditional writes (``If-Match``).
+"""
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Max
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "Item has changed since it was read"
+    default_code = 'precondition_failed'
+
+
+LIST_AGGREGATES = {
+    'count': Count('pk'),
+    'max_updated_at': Max('updated_at'),
+}
+
+
+def _timestamp(value):
+    """Return a datetime as an integer UNIX timestamp (None-safe)"""
+    return int(value.timestamp()) if value is not None else None
+
+
+def list_validators(request, queryset, representation='json'):
+    """
+    Return (etag, count) for a list response
+
+    The ETag combines the row count with max(updated_at), so creates and
+    updates move the timestamp and deletes move the count. The query string
+    and the negotiated ``representation`` are folded in so every page,
+    variant and wire format gets its own validator.
+
+    Lists send no Last-Modified: max(updated_at) stays put when an older
+    item is deleted, and HTTP dates have whole seconds, so If-Modified-Since
+    would answer 304 with a stale list. Clients revalidate with the ETag.
+    """
+    aggregate = queryset.order_by().aggregate(**LIST_AGGREGATES)
+    return _list_validators(request, aggregate, representation)
+
+
+async def alist_validators(request, queryset, representation='json'):
+    """Async version of ``list_validators`` for the async item views"""
+    aggregate = await queryset.order_by().aaggregate(**LIST_AGGREGATES)
+    return _list_validators(request, aggregate, representation)
+
+
+def _list_validators(request, aggregate, representation):
+    max_updated_at = aggregate['max_updated_at']
+    version = max_updated_at.timestamp() if max_updated_at is not None else 0
+    variant = hashlib.md5(
+        f"{representation}:{request.META.get('QUERY_STRING', '')}".encode('utf-8')
+    ).hexdigest()[:8]
+    etag = quote_etag(f"{aggregate['count']}-{version:.6f}-{variant}")
+    return etag, aggregate['count']
+
+
+def item_validators(item):
+    """Return (etag, last_modified) for a single item or item row"""
+    etag = quote_etag(f"{item.id}-{item.updated_at.timestamp():.6f}")
+    return etag, _timestamp(item.updated_at)
+
+
+def if_match_versions(request, item_id):
+    """
+    Return the ``updated_at`` values an If-Match header allows a write to
+    item ``item_id`` to start from, or None if it sets no condition
+
+    Item ETags are "<id>-<updated_at as a timestamp with microseconds>", so
+    each maps back to an exact ``updated_at`` the write can be conditioned
+    on in its WHERE clause. Weak tags are accepted: the only weak ETags this
+    API sends are compressed copies of strong ones. Raises
+    PreconditionFailed when no tag can be this item's.
+    """
+    header = request.headers.get('If-Match')
+    if header is None:
+        return None
+    etags = parse_etags(header)
+    if etags == ['*']:
+        return None
+    try:
+        item_id = uuid.UUID(str(item_id))
+    except ValueError:
+        raise PreconditionFailed()
+
+    versions = []
+    for etag in etags:
+        etag_id, _, timestamp = etag.removeprefix('W/').strip('"').rpartition('-')
+        try:
+            if uuid.UUID(etag_id) != item_id:
+                continue
+            # Decimal keeps the microseconds exact where a float would not
+            microseconds = int(Decimal(timestamp) * 1000000)
+        except (ValueError, InvalidOperation):
+            continue
+        versions.append(EPOCH + timedelta(microseconds=microseconds))
+    if not versions:
+        raise PreconditionFailed()
+    return versions
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return a 304 response if the client's copy is still fresh, else None"""
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified=None):
+    """Attach validators and force clients to revalidate before reuse"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    # The representation, and so the validators, depend on content negotiation
+    patch_vary_headers(response, ('Accept',))
+    return response
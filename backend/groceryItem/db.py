@@ -0,0 +1,36 @@
+"""
+Database connection setup
+
+SQLite connections get the pragmas in ``settings.GROCERY_SQLITE_PRAGMAS``
+as soon as they are opened; other backends are left alone. Every
+connection then gets the request metrics execute wrapper. After migrate
+(and test database setup) the default grocery list is created.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import metrics
+
+
+@receiver(connection_created, dispatch_uid='grocery_sqlite_pragmas')
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'GROCERY_SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(connection_created, dispatch_uid='grocery_metrics_wrapper')
+def install_metrics_wrapper(sender, connection, **kwargs):
+    # connection_created fires again on every reconnect of the same wrapper
+    if metrics.execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.execute_wrapper)
+
+
+def create_default_list(sender, using, **kwargs):
+    """post_migrate receiver, connected in GroceryConfig.ready"""
+    from .models import GroceryList
+    GroceryList.ensure_default(using=using)
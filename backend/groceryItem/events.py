@@ -0,0 +1,351 @@
+"""
+In-process pub/sub for grocery item change events
+
+Writes publish small create/update/delete deltas tagged with their grocery
+list; the SSE stream view subscribes and forwards one list's events. Every
+event carries a resume token so a client that reconnects
+(``Last-Event-ID``) only receives what it missed.
+
+The backend is pluggable through ``settings.GROCERY_EVENTS_BACKEND``. The
+default ``LocalEventBackend`` fans out within one process only: a stream
+served by one worker never sees writes handled by another. Deployments
+with several workers use ``CacheEventBackend``, which shares events through
+the Django cache named by ``settings.GROCERY_EVENTS_CACHE`` (Redis or
+Memcached), or a class implementing the same interface over another broker.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = 'groceryItem.events.LocalEventBackend'
+
+EVENT_CREATED = 'created'
+EVENT_UPDATED = 'updated'
+EVENT_DELETED = 'deleted'
+
+
+class Subscription:
+    """A single stream's queue of pending events"""
+
+    def __init__(self, maxsize):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        """Queue an event; called on the subscriber's event loop"""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A stalled client must resync rather than hold unbounded memory
+            self.overflowed = True
+
+    def lose_events(self):
+        """Mark the stream as having missed events; it must resync"""
+        self.overflowed = True
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class BaseEventBackend:
+    """
+    Interface for change-event backends
+
+    Events are dicts with ``id`` (the resume token), ``type``, ``list`` (the
+    grocery list id as a string) and ``data``.
+    """
+
+    def publish(self, event_type, data, grocery_list_id=None):
+        """Publish an event to every subscriber and return it"""
+        raise NotImplementedError
+
+    def events_since(self, token):
+        """
+        Return the events published after ``token``
+
+        Return None if the token is unknown or too old to resume from; the
+        client must then refetch the full list.
+        """
+        raise NotImplementedError
+
+    def current_token(self):
+        """Return the token of the most recently published event"""
+        raise NotImplementedError
+
+    def subscribe(self):
+        """Return a new Subscription; must be called on an event loop"""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class LocalEventBackend(BaseEventBackend):
+    """
+    Event backend that fans out to subscribers within this process
+
+    Recent events are kept in a bounded ring buffer for resumption. Tokens
+    are prefixed with a per-process epoch so a token issued by a previous
+    process (or another worker) is never mistaken for a local one.
+    """
+
+    def __init__(self, history=None, queue_size=None):
+        self.history = deque(maxlen=history or getattr(settings, 'GROCERY_EVENTS_HISTORY', 1000))
+        self.queue_size = queue_size or getattr(settings, 'GROCERY_EVENTS_QUEUE_SIZE', 1000)
+        self.epoch = uuid.uuid4().hex[:8]
+        self.sequence = 0
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def make_token(self, sequence):
+        return f"{self.epoch}-{sequence}"
+
+    def parse_token(self, token):
+        """Return the local sequence number of a token, or None if foreign"""
+        epoch, _, sequence = (token or '').partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def publish(self, event_type, data, grocery_list_id=None):
+        with self.lock:
+            self.sequence += 1
+            event = {
+                'id': self.make_token(self.sequence),
+                'seq': self.sequence,
+                'type': event_type,
+                'list': str(grocery_list_id) if grocery_list_id is not None else None,
+                'data': data,
+            }
+            self.history.append(event)
+            subscribers = list(self.subscribers)
+
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has closed; it will unsubscribe itself
+                pass
+        return event
+
+    def events_since(self, token):
+        sequence = self.parse_token(token)
+        if sequence is None:
+            return None
+        with self.lock:
+            if sequence > self.sequence:
+                return None
+            if sequence == self.sequence:
+                return []
+            # Anything between the token and the oldest buffered event is lost
+            if not self.history or self.history[0]['seq'] > sequence + 1:
+                return None
+            return [event for event in self.history if event['seq'] > sequence]
+
+    def current_token(self):
+        with self.lock:
+            return self.make_token(self.sequence)
+
+    def subscribe(self):
+        subscription = Subscription(self.queue_size)
+        with self.lock:
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+
+class CacheEventBackend(BaseEventBackend):
+    """
+    Event backend shared by every worker using one Django cache
+
+    ``publish`` numbers events with an atomic ``incr`` on a counter in the
+    cache named by ``settings.GROCERY_EVENTS_CACHE`` and stores each event
+    under its number. While a process has subscribers, a thread polls the
+    counter every ``settings.GROCERY_EVENTS_POLL_INTERVAL`` seconds and
+    fans the new events out to them, so streams see events published by any
+    worker after at most one interval. Events stay replayable for
+    ``settings.GROCERY_EVENTS_CACHE_TIMEOUT`` seconds.
+
+    The counter starts from the clock, like the list cache's versions, so a
+    counter that was evicted never hands out a number again. An event that
+    expires or is evicted before a stream has read it makes that stream
+    reset. The cache must be shared between workers: with the default
+    local-memory cache this is no better than LocalEventBackend.
+    """
+
+    SEQUENCE_KEY = 'grocery:events:seq'
+    EVENT_KEY = 'grocery:events:{}'
+    # Polls an event may lag behind the counter while its publisher is
+    # still writing it, before it is taken as lost
+    MISSING_POLLS = 3
+
+    def __init__(self, history=None, queue_size=None, poll_interval=None):
+        self.cache = caches[getattr(settings, 'GROCERY_EVENTS_CACHE', 'default')]
+        self.history = history or getattr(settings, 'GROCERY_EVENTS_HISTORY', 1000)
+        self.queue_size = queue_size or getattr(settings, 'GROCERY_EVENTS_QUEUE_SIZE', 1000)
+        self.poll_interval = poll_interval or getattr(
+            settings, 'GROCERY_EVENTS_POLL_INTERVAL', 0.5
+        )
+        self.timeout = getattr(settings, 'GROCERY_EVENTS_CACHE_TIMEOUT', 300)
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.poller = None
+        self.delivered = 0
+        self.missing_polls = 0
+
+    def sequence(self):
+        """The number of the last event published by any worker"""
+        sequence = self.cache.get(self.SEQUENCE_KEY)
+        if sequence is None:
+            self.cache.add(self.SEQUENCE_KEY, time.time_ns() // 1000, timeout=None)
+            sequence = self.cache.get(self.SEQUENCE_KEY)
+        return sequence
+
+    def next_sequence(self):
+        try:
+            return self.cache.incr(self.SEQUENCE_KEY)
+        except ValueError:
+            self.sequence()
+            return self.cache.incr(self.SEQUENCE_KEY)
+
+    def parse_token(self, token):
+        return int(token) if (token or '').isdigit() else None
+
+    def read(self, first, last):
+        """The stored events numbered ``first`` to ``last``, None where missing"""
+        keys = [self.EVENT_KEY.format(sequence) for sequence in range(first, last + 1)]
+        found = self.cache.get_many(keys)
+        return [found.get(key) for key in keys]
+
+    def publish(self, event_type, data, grocery_list_id=None):
+        sequence = self.next_sequence()
+        event = {
+            'id': str(sequence),
+            'seq': sequence,
+            'type': event_type,
+            'list': str(grocery_list_id) if grocery_list_id is not None else None,
+            'data': data,
+        }
+        self.cache.set(self.EVENT_KEY.format(sequence), event, self.timeout)
+        return event
+
+    def events_since(self, token):
+        sequence = self.parse_token(token)
+        if sequence is None:
+            return None
+        current = self.sequence()
+        if sequence > current or current - sequence > self.history:
+            return None
+        events = self.read(sequence + 1, current)
+        if None in events:
+            return None
+        return events
+
+    def current_token(self):
+        return str(self.sequence())
+
+    def subscribe(self):
+        subscription = Subscription(self.queue_size)
+        with self.lock:
+            if self.poller is None:
+                self.delivered = self.sequence()
+                self.missing_polls = 0
+                self.poller = threading.Thread(
+                    target=self.poll_forever, name='grocery-events-poller', daemon=True
+                )
+                self.poller.start()
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def poll_forever(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self.lock:
+                if not self.subscribers:
+                    self.poller = None
+                    return
+            try:
+                self.poll()
+            except Exception:
+                # An unreachable cache must not stop the poller for good
+                logger.exception("Polling the shared change events failed")
+
+    def poll(self):
+        """Deliver the events published since the last poll to subscribers"""
+        current = self.sequence()
+        if current <= self.delivered:
+            return
+        # Far behind (a counter restarted from the clock): start over
+        first = max(self.delivered + 1, current - self.history + 1)
+        lost = first > self.delivered + 1
+        events = []
+        sequence = first - 1
+        for event in self.read(first, current):
+            if event is None:
+                self.missing_polls += 1
+                if self.missing_polls < self.MISSING_POLLS:
+                    # Perhaps still being written; look again next poll
+                    break
+                lost = True
+            else:
+                events.append(event)
+            self.missing_polls = 0
+            sequence += 1
+        self.delivered = sequence
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            try:
+                for event in events:
+                    subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+                if lost:
+                    subscription.loop.call_soon_threadsafe(subscription.lose_events)
+            except RuntimeError:
+                # The subscriber's loop has closed; it will unsubscribe itself
+                pass
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_event_backend():
+    """Return the process-wide event backend configured in settings"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'GROCERY_EVENTS_BACKEND', DEFAULT_BACKEND)
+                _backend = import_string(path)()
+    return _backend
+
+
+def reset_event_backend():
+    """Drop the cached backend (used by tests and settings changes)"""
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+def publish(event_type, data, grocery_list_id=None):
+    """Publish a change event through the configured backend"""
+    return get_event_backend().publish(event_type, data, grocery_list_id)
@@ -0,0 +1,117 @@
+"""
+Filtering, ordering and sparse fieldsets for the item list
+
+``GET /items/`` takes any of:
+
+- ``bought=true|false``: only items to buy, or only bought items
+- ``created_after=<ISO 8601 datetime>``: items created after that instant
+- ``updated_since=<ISO 8601 datetime>``: items written at or after it
+- ``ordering=``: one of ``ORDERINGS``; ``created_at`` by default
+- ``fields=id,name``: only those API fields, selected in SQL
+
+Each filter and ordering runs off one of GroceryItem's list-scoped
+indexes: the partial to-buy / bought indexes, (created_at, id),
+(updated_at, id) or (UPPER(name), id). explain_queries checks them.
+Keyset pages are always in created_at order, so another ordering cannot be
+combined with ``page_size`` or ``cursor``.
+"""
+from datetime import timezone as dt_timezone
+
+from django.db.models.functions import Upper
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .pagination import KeysetPagination
+from .rendering import ITEM_FIELDS, item_rows
+
+BOOLEANS = {'true': True, 'false': False}
+
+# ?ordering= value -> order_by(); id breaks ties so the order is total
+ORDERINGS = {
+    'created_at': ('created_at', 'id'),
+    '-created_at': ('-created_at', '-id'),
+    'updated_at': ('updated_at', 'id'),
+    '-updated_at': ('-updated_at', '-id'),
+    'name': (Upper('name').asc(), 'id'),
+    '-name': (Upper('name').desc(), '-id'),
+}
+PAGINATED_ORDERINGS = ('created_at',)
+
+
+class InvalidListQuery(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Invalid list query"
+
+
+def parse_boolean(params, name):
+    value = params.get(name)
+    if value is None:
+        return None
+    try:
+        return BOOLEANS[value.lower()]
+    except KeyError:
+        raise InvalidListQuery(f"{name} must be true or false")
+
+
+def parse_instant(params, name):
+    value = params.get(name)
+    if value is None:
+        return None
+    try:
+        instant = parse_datetime(value)
+    except ValueError:
+        instant = None
+    if instant is None:
+        raise InvalidListQuery(f"{name} must be an ISO 8601 datetime")
+    if timezone.is_naive(instant):
+        instant = timezone.make_aware(instant, dt_timezone.utc)
+    return instant
+
+
+def parse_fields(params):
+    """Return the requested API fields in representation order, or None for all"""
+    value = params.get('fields')
+    if value is None:
+        return None
+    requested = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = requested - set(ITEM_FIELDS)
+    if unknown or not requested:
+        raise InvalidListQuery(
+            f"fields must be a comma-separated subset of {','.join(ITEM_FIELDS)}"
+        )
+    return tuple(field for field in ITEM_FIELDS if field in requested)
+
+
+class ListQuery:
+    """The filters, ordering and fields of one list request"""
+
+    def __init__(self, params, paginated=False):
+        self.bought = parse_boolean(params, 'bought')
+        self.created_after = parse_instant(params, 'created_after')
+        self.updated_since = parse_instant(params, 'updated_since')
+        self.fields = parse_fields(params)
+        self.ordering = params.get('ordering')
+        if self.ordering is not None and self.ordering not in ORDERINGS:
+            raise InvalidListQuery(f"ordering must be one of {', '.join(ORDERINGS)}")
+        if paginated and self.ordering not in (None, *PAGINATED_ORDERINGS):
+            raise InvalidListQuery("Pages are always in created_at order")
+        self.paginated = paginated
+
+    def filter(self, queryset):
+        """Apply the filters and ordering to a list's items"""
+        if self.bought is not None:
+            queryset = queryset.filter(bought=self.bought)
+        if self.created_after is not None:
+            queryset = queryset.filter(created_at__gt=self.created_after)
+        if self.updated_since is not None:
+            queryset = queryset.filter(updated_at__gte=self.updated_since)
+        if self.ordering is not None:
+            queryset = queryset.order_by(*ORDERINGS[self.ordering])
+        return queryset
+
+    def rows(self, queryset):
+        """Named rows of the requested fields, plus the columns a page seeks on"""
+        extra = KeysetPagination.ordering if self.paginated else ()
+        return item_rows(queryset, *extra, fields=self.fields)
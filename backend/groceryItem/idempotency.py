@@ -0,0 +1,114 @@
+"""
+Idempotency keys for item writes
+
+A client that queues writes while offline sends each one with an
+``Idempotency-Key`` header (or a ``key`` per operation in a replay batch).
+The first request with a key runs normally and its response is stored in
+the same transaction; any retry with that key gets the stored response
+back instead of writing again, so a lost response can never turn into a
+duplicate item.
+
+Keys live for ``settings.GROCERY_IDEMPOTENCY_TTL`` seconds and are purged
+by ``manage.py purge_idempotency_keys``.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+METHODS = ('POST', 'PATCH', 'DELETE')
+MAX_KEY_LENGTH = 255
+
+
+class InvalidIdempotencyKey(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters"
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = f"{HEADER} was already used for a different request"
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = f"A request with this {HEADER} is still in progress"
+
+
+class Replayed(Exception):
+    """Raised to answer a retried request with its stored response"""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def get_ttl():
+    return timedelta(seconds=getattr(settings, 'GROCERY_IDEMPOTENCY_TTL', 24 * 60 * 60))
+
+
+def validate_key(key):
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise InvalidIdempotencyKey()
+    return key
+
+
+def fingerprint(method, path):
+    return f"{method} {path}"
+
+
+def get_record(key):
+    """Return the live record for ``key``, dropping it if it has expired"""
+    record = IdempotencyRecord.objects.filter(pk=key).first()
+    if record is not None and record.created_at < timezone.now() - get_ttl():
+        record.delete()
+        return None
+    return record
+
+
+def replay(record, request_fingerprint):
+    """Return the stored response for a retried request"""
+    if record.fingerprint != request_fingerprint:
+        raise IdempotencyKeyReused()
+    response = Response(record.body, status=record.status_code)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def save_record(key, request_fingerprint, response):
+    """
+    Store ``response`` under ``key`` in the current transaction
+
+    Returns None, or the record of a concurrent request that stored the same
+    key first; the caller must then roll its own write back.
+    """
+    try:
+        with transaction.atomic():
+            IdempotencyRecord.objects.create(
+                key=key,
+                fingerprint=request_fingerprint,
+                status_code=response.status_code,
+                body=response.data
+            )
+    except IntegrityError:
+        record = get_record(key)
+        if record is None:
+            raise IdempotencyKeyInUse()
+        return record
+    return None
+
+
+def purge_expired():
+    """Delete expired records; returns how many went"""
+    deleted, _ = IdempotencyRecord.objects.filter(
+        created_at__lt=timezone.now() - get_ttl()
+    ).delete()
+    return deleted
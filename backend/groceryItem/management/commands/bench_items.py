@@ -0,0 +1,416 @@
+import json
+import platform
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from groceryItem.models import GroceryItem, GroceryItemName, GroceryItemStats, DEFAULT_LIST_ID
+
+try:
+    import uvicorn
+except ImportError:  # pragma: no cover - optional dependency
+    uvicorn = None
+
+LIST_PATH = '/api/items/'
+OPERATIONS = ('create', 'retrieve', 'patch', 'list', 'delete')
+TRANSPORTS = ('client', 'wsgi', 'asgi')
+SEED_BATCH_SIZE = 1000
+
+
+def primary_key_index_bytes(model):
+    """Size of the model's primary key index, or None where it cannot be read"""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT pg_relation_size(indexrelid) FROM pg_index "
+                "WHERE indrelid = %s::regclass AND indisprimary",
+                [table]
+            )
+        elif connection.vendor == 'sqlite':
+            # Needs SQLite built with the dbstat table (most builds are)
+            try:
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s",
+                    [f"sqlite_autoindex_{table}_1"]
+                )
+            except Exception:
+                return None
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def percentile_summary(latencies):
+    """Return p50/p95/p99/mean/max of a list of latencies in milliseconds"""
+    if not latencies:
+        return None
+    if len(latencies) == 1:
+        value = latencies[0]
+        return {'p50': value, 'p95': value, 'p99': value, 'mean': value, 'max': value}
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+    return {
+        'p50': round(cuts[49], 3),
+        'p95': round(cuts[94], 3),
+        'p99': round(cuts[98], 3),
+        'mean': round(statistics.fmean(latencies), 3),
+        'max': round(max(latencies), 3),
+    }
+
+
+class ClientTransport:
+    """Requests through django.test.Client, in-process with no sockets"""
+
+    name = 'client'
+
+    def session(self):
+        client = Client(HTTP_HOST='127.0.0.1')
+
+        def send(method, path, body=None):
+            response = client.generic(
+                method, path, json.dumps(body) if body is not None else '',
+                content_type='application/json'
+            )
+            return response.status_code, response.content
+
+        return send
+
+    def close(self):
+        pass
+
+
+class HTTPTransport:
+    """Requests over real sockets to a server running in a background thread"""
+
+    host = '127.0.0.1'
+
+    def session(self):
+        def send(method, path, body=None):
+            conn = HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                payload = json.dumps(body) if body is not None else None
+                headers = {'Content-Type': 'application/json'} if payload else {}
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                return response.status, response.read()
+            finally:
+                conn.close()
+
+        return send
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class WSGITransport(HTTPTransport):
+    """Threaded wsgiref server in front of backend.wsgi"""
+
+    name = 'wsgi'
+
+    def __init__(self):
+        from backend.wsgi import application
+
+        self.server = make_server(
+            self.host, 0, application,
+            server_class=ThreadingWSGIServer,
+            handler_class=QuietWSGIRequestHandler
+        )
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+class ASGITransport(HTTPTransport):
+    """uvicorn in front of backend.asgi"""
+
+    name = 'asgi'
+
+    def __init__(self):
+        from backend.asgi import application
+
+        config = uvicorn.Config(
+            application, host=self.host, port=0, log_level='warning', lifespan='off'
+        )
+        self.server = uvicorn.Server(config)
+        self.server.install_signal_handlers = lambda: None
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise CommandError("uvicorn did not start")
+            time.sleep(0.05)
+        self.port = self.server.servers[0].sockets[0].getsockname()[1]
+
+    def close(self):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+class ItemBenchmark:
+    """
+    Seed items and time each API operation at a given list size
+
+    Assumes the current database is disposable. Concurrency 1 runs in the
+    calling thread; higher levels spread the requests over a thread pool.
+    """
+
+    def __init__(self, requests=200, list_requests=20, seed=0):
+        self.requests = requests
+        self.list_requests = list_requests
+        self.random = random.Random(seed)
+
+    def seed(self, size):
+        """Top the table up to ``size`` items; returns the insert result"""
+        existing = GroceryItem.objects.count()
+        started = time.perf_counter()
+        for start in range(existing, size, SEED_BATCH_SIZE):
+            stop = min(start + SEED_BATCH_SIZE, size)
+            GroceryItem.objects.bulk_create(
+                GroceryItem(name=f"Item {i}", bought=i % 3 == 0)
+                for i in range(start, stop)
+            )
+        wall = time.perf_counter() - started
+        # bulk_create bypasses the signals that maintain counters and history
+        GroceryItemStats.recount(DEFAULT_LIST_ID)
+        GroceryItemName.rebuild(DEFAULT_LIST_ID)
+        inserted = max(size - existing, 0)
+        return {
+            'transport': 'orm',
+            'size': size,
+            'operation': 'seed',
+            'concurrency': 1,
+            'requests': inserted,
+            'errors': 0,
+            'throughput_rps': round(inserted / wall, 2) if inserted and wall else None,
+            'latency_ms': None,
+            'pk_index_bytes': primary_key_index_bytes(GroceryItem),
+        }
+
+    def build_tasks(self, size):
+        """Return (operation, [(method, path, body), ...]) in run order"""
+        ids = [
+            str(pk) for pk in
+            GroceryItem.objects.order_by('?').values_list('id', flat=True)[:1000]
+        ]
+        pick = lambda: self.random.choice(ids)  # noqa: E731
+        return [
+            ('create', [
+                ('POST', LIST_PATH, {'name': f"Bench {size} {i}"})
+                for i in range(self.requests)
+            ]),
+            ('retrieve', [
+                ('GET', f"{LIST_PATH}{pick()}/", None) for _ in range(self.requests)
+            ]),
+            ('patch', [
+                ('PATCH', f"{LIST_PATH}{pick()}/", {'bought': self.random.random() < 0.5})
+                for _ in range(self.requests)
+            ]),
+            ('list', [('GET', LIST_PATH, None)] * self.list_requests),
+        ]
+
+    def time_tasks(self, transport, tasks, concurrency):
+        """Run tasks and return (latencies_ms, errors, wall_seconds, bodies)"""
+        latencies, bodies = [], []
+        errors = 0
+        lock = threading.Lock()
+
+        def worker(chunk):
+            nonlocal errors
+            send = transport.session()
+            for method, path, body in chunk:
+                start = time.perf_counter()
+                status_code, content = send(method, path, body)
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    if status_code >= 400:
+                        errors += 1
+                    elif method == 'POST':
+                        bodies.append(content)
+
+        started = time.perf_counter()
+        if concurrency == 1:
+            worker(tasks)
+        else:
+            chunks = [tasks[i::concurrency] for i in range(concurrency)]
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(worker, chunks))
+        return latencies, errors, time.perf_counter() - started, bodies
+
+    def run(self, transport, size, concurrency):
+        """Benchmark every operation once and return one result per operation"""
+        results = []
+        created = []
+        plan = self.build_tasks(size)
+        for operation, tasks in plan + [('delete', None)]:
+            if operation == 'delete':
+                # Remove what create added so the next run sees the same size
+                tasks = [('DELETE', f"{LIST_PATH}{pk}/", None) for pk in created]
+            latencies, errors, wall, bodies = self.time_tasks(transport, tasks, concurrency)
+            if operation == 'create':
+                created = [json.loads(body)['id'] for body in bodies]
+            results.append({
+                'transport': transport.name,
+                'size': size,
+                'operation': operation,
+                'concurrency': concurrency,
+                'requests': len(tasks),
+                'errors': errors,
+                'throughput_rps': round(len(tasks) / wall, 2) if wall else None,
+                'latency_ms': percentile_summary(latencies),
+            })
+        return results
+
+
+def compare(results, baseline, tolerance):
+    """Return descriptions of results whose p95 regressed past tolerance"""
+    def key(result):
+        return (result['transport'], result['size'], result['operation'], result['concurrency'])
+
+    previous = {key(result): result for result in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if not before or not before.get('latency_ms') or not result['latency_ms']:
+            continue
+        old, new = before['latency_ms']['p95'], result['latency_ms']['p95']
+        if old and new > old * (1 + tolerance):
+            regressions.append(
+                f"{'/'.join(str(part) for part in key(result))}: p95 {old}ms -> {new}ms"
+            )
+    return regressions
+
+
+def unthrottled():
+    """Turn off rate limits and load shedding, so runs measure the API itself"""
+    rest_framework = settings.REST_FRAMEWORK
+    rates = {
+        **rest_framework.get('DEFAULT_THROTTLE_RATES', {}),
+        'items_client': None,
+        'items_global': None,
+    }
+    return override_settings(
+        REST_FRAMEWORK={**rest_framework, 'DEFAULT_THROTTLE_RATES': rates},
+        GROCERY_LOAD_SHEDDING=None,
+    )
+
+
+def parse_ints(value):
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the items API at several list sizes, concurrency levels and "
+        "transports on a throwaway database, and write the results as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=parse_ints, default=[1000, 10000, 100000],
+                            help="Comma-separated list sizes to seed (default 1000,10000,100000)")
+        parser.add_argument('--concurrency', type=parse_ints, default=[1, 8],
+                            help="Comma-separated client thread counts (default 1,8)")
+        parser.add_argument('--transports', default='client,wsgi,asgi',
+                            help="Comma-separated subset of client,wsgi,asgi")
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Requests per create/retrieve/patch/delete run")
+        parser.add_argument('--list-requests', type=int, default=20,
+                            help="Requests per full-list run")
+        parser.add_argument('--output', help="Write JSON here instead of stdout")
+        parser.add_argument('--item-ids', type=int, choices=(4, 7),
+                            default=getattr(settings, 'GROCERY_ITEM_ID_VERSION', 7),
+                            help="UUID version of new item ids (default GROCERY_ITEM_ID_VERSION)")
+        parser.add_argument('--baseline', help="Previous JSON output to compare p95 against")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Allowed p95 regression against --baseline (default 0.2)")
+
+    def handle(self, *args, **options):
+        transports = [name.strip() for name in options['transports'].split(',') if name.strip()]
+        unknown = set(transports) - set(TRANSPORTS)
+        if unknown:
+            raise CommandError(f"Unknown transports: {', '.join(sorted(unknown))}")
+        if 'asgi' in transports and uvicorn is None:
+            self.stderr.write("uvicorn is not installed, skipping the asgi transport")
+            transports.remove('asgi')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            if connection.vendor == 'sqlite':
+                # A file (not shared memory) so server threads behave like production
+                connection.settings_dict['TEST']['NAME'] = str(Path(tmp) / 'bench.sqlite3')
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                with unthrottled(), override_settings(GROCERY_ITEM_ID_VERSION=options['item_ids']):
+                    results = self.run_all(transports, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'async_views': settings.GROCERY_ASYNC_VIEWS,
+                'item_ids': options['item_ids'],
+                'requests': options['requests'],
+                'list_requests': options['list_requests'],
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        if options['baseline']:
+            baseline = json.loads(Path(options['baseline']).read_text())
+            regressions = compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError("p95 regressions:\n" + "\n".join(regressions))
+
+    def run_all(self, transports, options):
+        benchmark = ItemBenchmark(options['requests'], options['list_requests'])
+        factories = {'client': ClientTransport, 'wsgi': WSGITransport, 'asgi': ASGITransport}
+        results = []
+        for size in sorted(options['sizes']):
+            self.stderr.write(f"Seeding {size} items")
+            results.append(benchmark.seed(size))
+            for name in transports:
+                transport = factories[name]()
+                try:
+                    for concurrency in options['concurrency']:
+                        self.stderr.write(f"  {name} x{concurrency}")
+                        results.extend(benchmark.run(transport, size, concurrency))
+                finally:
+                    transport.close()
+        return results
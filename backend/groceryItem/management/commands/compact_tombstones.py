@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from groceryItem.models import GroceryItemTombstone
+
+
+class Command(BaseCommand):
+    help = (
+        "Purge delete tombstones older than the retention period; clients that "
+        "last synced before the purge get a full reload from /items/changes/"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            default=getattr(settings, 'GROCERY_TOMBSTONE_RETENTION_DAYS', 30),
+            help="Keep tombstones this many days (default GROCERY_TOMBSTONE_RETENTION_DAYS)"
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError("--days must not be negative")
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted = GroceryItemTombstone.compact(cutoff)
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} tombstones"))
@@ -0,0 +1,115 @@
+from datetime import datetime, timezone as dt_timezone
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from groceryItem.filters import ORDERINGS
+from groceryItem.models import (
+    GroceryItem,
+    GroceryItemName,
+    GroceryItemPurchaseRollup,
+    DEFAULT_LIST_ID,
+)
+
+
+def hot_queries():
+    """
+    Return (label, queryset, expected index) for the queries the API and
+    admin actually run, each scoped to one list as the API scopes them
+    """
+    items = GroceryItem.objects.filter(grocery_list_id=DEFAULT_LIST_ID)
+    cursor_at = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+    cursor_id = uuid.UUID(int=0)
+    return [
+        (
+            "item list",
+            items.order_by('created_at'),
+            'grocery_list_created_id_idx',
+        ),
+        (
+            "keyset page",
+            items.filter(
+                Q(created_at__gt=cursor_at) | Q(created_at=cursor_at, id__gt=cursor_id)
+            ).order_by('created_at', 'id')[:21],
+            'grocery_list_created_id_idx',
+        ),
+        (
+            "to-buy list",
+            items.filter(bought=False).order_by('created_at'),
+            'grocery_list_to_buy_idx',
+        ),
+        (
+            "admin bought filter",
+            items.filter(bought=True).order_by('-created_at'),
+            'grocery_list_bought_idx',
+        ),
+        (
+            "created after",
+            items.filter(created_at__gt=cursor_at).order_by('created_at'),
+            'grocery_list_created_id_idx',
+        ),
+        (
+            "updated since",
+            items.filter(updated_at__gte=cursor_at).order_by(*ORDERINGS['updated_at']),
+            'grocery_list_updated_idx',
+        ),
+        (
+            "name order",
+            items.order_by(*ORDERINGS['name']),
+            'grocery_list_name_upper_idx',
+        ),
+        (
+            "delta sync",
+            items.filter(change_seq__gt=0, change_seq__lte=100).order_by('change_seq'),
+            'grocery_list_change_seq_idx',
+        ),
+        (
+            "admin name search",
+            items.name_startswith('mil'),
+            'grocery_list_name_upper_idx',
+        ),
+        (
+            "autocomplete",
+            GroceryItemName.matching(DEFAULT_LIST_ID, 'mil')[:10],
+            'grocery_name_term_idx',
+        ),
+        (
+            "usual purchases",
+            GroceryItemPurchaseRollup.objects.filter(
+                grocery_list_id=DEFAULT_LIST_ID, next_due_at__isnull=False
+            ).order_by('next_due_at')[:10],
+            'grocery_purchase_due_idx',
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN on the hot GroceryItem queries and check they use their indexes"
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f"Unsupported database vendor: {vendor}")
+
+        failures = []
+        with transaction.atomic():
+            if vendor == 'postgresql':
+                # Small tables make a sequential scan look cheaper; we only
+                # want to know whether the planner *can* use the index
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for label, queryset, index in hot_queries():
+                plan = queryset.explain()
+                ok = index in plan
+                if not ok:
+                    failures.append(label)
+                style = self.style.SUCCESS if ok else self.style.ERROR
+                self.stdout.write(style(f"{'OK' if ok else 'MISSING'} {label} ({index})"))
+                if options['verbosity'] > 1:
+                    self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"Queries not using their index: {', '.join(failures)}")
@@ -0,0 +1,69 @@
+import io
+import sys
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from groceryItem import transfer
+from groceryItem.models import GroceryList, DEFAULT_LIST_ID
+
+EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Import grocery items from a CSV or NDJSON file (as written by "
+        "GET /api/items/export/), streaming it in batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or - for stdin")
+        parser.add_argument('--list', dest='list_id', default=str(DEFAULT_LIST_ID),
+                            help="Id of the list to add the items to (default list if omitted)")
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            help="Input format (default from the file extension)")
+        parser.add_argument('--batch-size', type=int, default=transfer.IMPORT_BATCH_SIZE,
+                            help=f"Rows per INSERT and commit (default {transfer.IMPORT_BATCH_SIZE})")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or EXTENSIONS.get(Path(path).suffix.lower())
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        try:
+            if not GroceryList.objects.filter(pk=options['list_id']).exists():
+                raise CommandError(f"List {options['list_id']} does not exist")
+        except ValidationError:
+            raise CommandError(f"{options['list_id']} is not a list id")
+
+        if path == '-':
+            lines = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+        else:
+            try:
+                lines = open(path, encoding='utf-8-sig', newline='')
+            except OSError as e:
+                raise CommandError(f"Cannot open {path}: {e.strerror}")
+
+        report = transfer.ImportReport()
+        try:
+            with lines:
+                transfer.import_items(
+                    lines, fmt, options['list_id'], options['batch_size'], report
+                )
+        except transfer.MalformedInput as e:
+            self.write_errors(report)
+            raise CommandError(f"Stopped at {e} after importing {report.created} items")
+
+        self.write_errors(report)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.created} items, skipped {report.skipped}"
+        ))
+
+    def write_errors(self, report):
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        if report.skipped > len(report.errors):
+            self.stderr.write(f"... and {report.skipped - len(report.errors)} more skipped rows")
@@ -0,0 +1,103 @@
+import pstats
+
+from django.core.management.base import BaseCommand, CommandError
+
+from groceryItem import profiling
+
+SORT_KEYS = {
+    'cumulative': pstats.SortKey.CUMULATIVE,
+    'tottime': pstats.SortKey.TIME,
+    'calls': pstats.SortKey.CALLS,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "List the item API profiles ProfilingMiddleware captured, sum up the top "
+        "functions of some of them, or make a token that has a request profiled"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names', nargs='*',
+            help="Captures to sum up (as listed); with none, list the captures"
+        )
+        parser.add_argument(
+            '--last', type=int,
+            help="Sum up the newest N captures (of --view, if given)"
+        )
+        parser.add_argument('--view', help="Only captures of this url name, e.g. groceryitem-list")
+        parser.add_argument(
+            '--sort', choices=SORT_KEYS, default='cumulative',
+            help="Order of the top functions (default cumulative)"
+        )
+        parser.add_argument('--limit', type=int, default=25, help="Top functions shown")
+        parser.add_argument(
+            '--token', action='store_true',
+            help="Print a token; send it as X-Grocery-Profile to profile a request"
+        )
+        parser.add_argument('--label', default='', help="Saved with captures made with --token")
+
+    def handle(self, *args, **options):
+        config = profiling.profiling_config()
+        if not config:
+            raise CommandError("Profiling is off (settings.GROCERY_PROFILING)")
+        if options['token']:
+            self.stdout.write(profiling.make_token(options['label']))
+            return
+
+        directory = profiling.profile_directory(config)
+        names = profiling.list_profiles(directory)
+        infos = {name: profiling.read_info(directory, name) for name in names}
+        if options['view']:
+            names = [name for name in names if infos[name].get('view') == options['view']]
+
+        if options['names']:
+            unknown = set(options['names']) - set(names)
+            if unknown:
+                raise CommandError(f"No such capture: {', '.join(sorted(unknown))}")
+            selected = options['names']
+        elif options['last'] is not None:
+            if options['last'] < 1:
+                raise CommandError("--last must be at least 1")
+            selected = names[-options['last']:]
+        else:
+            self.list_captures(names, infos)
+            return
+
+        if not selected:
+            raise CommandError(f"No captures in {directory}")
+        self.summarize(directory, selected, infos, options)
+
+    def list_captures(self, names, infos):
+        for name in reversed(names):
+            info = infos[name]
+            self.stdout.write(
+                f"{name}  {info.get('duration_ms', '?'):>9} ms  {info.get('status', '?')}  "
+                f"{info.get('method', '?')} {info.get('path', '?')}  "
+                f"({info.get('trigger', '?')}{': ' + info['label'] if info.get('label') else ''})"
+            )
+        self.stdout.write(f"Captures: {len(names)}")
+
+    def summarize(self, directory, names, infos, options):
+        stats = profiling.load_stats([directory / f"{name}.prof" for name in names])
+        durations = [infos[name]['duration_ms'] for name in names if 'duration_ms' in infos[name]]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Captures: {len(names)}, {sum(durations):.1f} ms of requests, "
+            f"{stats.total_tt * 1000:.1f} ms profiled"
+        ))
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Own time by area"))
+        for area, seconds in profiling.area_times(stats):
+            share = seconds / stats.total_tt * 100 if stats.total_tt else 0.0
+            self.stdout.write(f"  {area:<12} {seconds * 1000:10.2f} ms  {share:5.1f}%")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Top functions by {options['sort']}"))
+        self.stdout.write(f"  {'calls':>9} {'own ms':>10} {'cum ms':>10}  function")
+        stats.sort_stats(SORT_KEYS[options['sort']])
+        for function in stats.fcn_list[:options['limit']]:
+            _, calls, own_time, cumulative_time, _ = stats.stats[function]
+            self.stdout.write(
+                f"  {calls:>9} {own_time * 1000:10.2f} {cumulative_time * 1000:10.2f}  "
+                f"{profiling.function_label(function)}"
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from groceryItem import idempotency
+
+
+class Command(BaseCommand):
+    help = "Delete stored Idempotency-Key responses older than GROCERY_IDEMPOTENCY_TTL"
+
+    def handle(self, *args, **options):
+        deleted = idempotency.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} idempotency records"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from groceryItem import cache
+from groceryItem.models import GroceryItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Replace random (UUIDv4) item ids with time-ordered UUIDv7 ids in "
+        "created_at order. Run with the API stopped; clients reload their lists"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Items per UPDATE and commit (default 1000)")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        rekeyed = GroceryItem.rekey(options['batch_size'])
+        for list_id in rekeyed:
+            cache.invalidate(list_id)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rekeyed {sum(rekeyed.values())} items in {len(rekeyed)} lists"
+        ))
@@ -0,0 +1,226 @@
+"""
+Per-request instrumentation and aggregated metrics
+
+``RequestMetrics`` counts SQL queries and DB time for one request and
+collects named timings such as serialization. The middleware makes it the
+current request's metrics; ``execute_wrapper``, installed on every database
+connection (see db.py), feeds it the queries. The current metrics live in a
+context variable, so queries the async ORM runs on worker threads are
+counted too. ``timed()`` adds to the current request's timings from
+anywhere in the call stack.
+
+Finished requests are folded into process-wide histograms that
+``render_prometheus()`` exposes in the Prometheus text format.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('grocery_request_metrics', default=None)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestMetrics:
+    """Query count, DB time and named timings for a single request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.timings = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+    def activate(self):
+        """Make this the current request's metrics; returns a reset token"""
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+
+def current_metrics():
+    """Return the RequestMetrics of the request being handled, if any"""
+    return _current.get()
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Connection execute wrapper that reports to the current request's metrics"""
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    return request_metrics(execute, sql, params, many, context)
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the time spent in the block to the current request's ``name`` timing
+
+    DB time spent inside the block is left out, so a lazily evaluated
+    queryset does not count as serialization.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    db_before = metrics.db_time
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.timings[name] += elapsed - (metrics.db_time - db_before)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """A labelled histogram with fixed upper bounds"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, labels, value):
+        counts = self.series.get(labels)
+        if counts is None:
+            # One count per bucket plus +Inf, then the running sum
+            counts = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self):
+        lines = []
+        for labels, counts in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, [le])} {cumulative}"
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {counts[-1]}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Counter:
+    """A labelled monotonically increasing counter"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.series = defaultdict(float)
+
+    def inc(self, labels, amount=1):
+        self.series[labels] += amount
+
+    def render(self):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}"
+            for labels, value in sorted(self.series.items())
+        ]
+
+
+class Registry:
+    """Process-wide collection of request metrics"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        labels = ('view', 'method')
+        self.requests = Counter(
+            'grocery_requests_total', "Requests handled", labels + ('status',)
+        )
+        self.duration = Histogram(
+            'grocery_request_duration_seconds', "Total request time", labels, DURATION_BUCKETS
+        )
+        self.view_duration = Histogram(
+            'grocery_view_duration_seconds', "Time spent in the view", labels, DURATION_BUCKETS
+        )
+        self.db_duration = Histogram(
+            'grocery_db_duration_seconds', "Time spent in SQL per request", labels, DURATION_BUCKETS
+        )
+        self.db_queries = Histogram(
+            'grocery_db_queries', "SQL queries per request", labels, QUERY_BUCKETS
+        )
+        self.serialize_duration = Histogram(
+            'grocery_serialize_duration_seconds', "Serialization time per request",
+            labels, DURATION_BUCKETS
+        )
+        self.list_cache = Counter(
+            'grocery_list_cache_requests_total', "Item list cache lookups", ('result',)
+        )
+
+    @property
+    def metrics(self):
+        return (
+            self.requests, self.duration, self.view_duration,
+            self.db_duration, self.db_queries, self.serialize_duration,
+            self.list_cache,
+        )
+
+    def record(self, view, method, status, duration, view_time, metrics):
+        labels = (view, method)
+        with self.lock:
+            self.requests.inc(labels + (str(status),))
+            self.duration.observe(labels, duration)
+            self.view_duration.observe(labels, view_time)
+            self.db_duration.observe(labels, metrics.db_time)
+            self.db_queries.observe(labels, metrics.queries)
+            self.serialize_duration.observe(labels, metrics.timings.get('serialize', 0.0))
+
+    def record_cache(self, result):
+        with self.lock:
+            self.list_cache.inc((result,))
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for metric in self.metrics:
+                lines.append(f"# HELP {metric.name} {metric.documentation}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def reset_registry():
+    """Start all aggregated metrics from zero (used by tests)"""
+    global registry
+    registry = Registry()
+
+
+def render_prometheus():
+    """Return every aggregated metric in the Prometheus text format"""
+    return registry.render()
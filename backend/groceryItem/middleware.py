@@ -0,0 +1,346 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from . import metrics
+from . import profiling
+from . import throttling
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+logger = logging.getLogger('groceryItem.metrics')
+
+# Brotli's default (11) is meant for static assets; 5 compresses JSON
+# about as well as gzip -9 at a fraction of the CPU
+BROTLI_QUALITY = 5
+
+# API payloads only: compressing HTML pages that carry a CSRF token
+# alongside user input would expose them to BREACH
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/vnd.grocery.columns+json',
+    'application/msgpack',
+    'text/plain',
+)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, DB, serialization and view time for every request
+
+    The numbers are sent back in a ``Server-Timing`` header, written as one
+    JSON log line to the ``groceryItem.metrics`` logger and aggregated into
+    the histograms served at ``/api/metrics/``.
+
+    View time runs from the view being called until it returns its
+    response, before a DRF response is rendered; serialization covers
+    building the item payloads and rendering JSON, excluding DB time.
+
+    Runs natively under both WSGI and ASGI, so it never forces async views
+    onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request_metrics = metrics.RequestMetrics()
+        token = request_metrics.activate()
+        start = self.begin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.RequestMetrics.deactivate(token)
+        return self.finish(request, response, request_metrics, start)
+
+    async def __acall__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = request_metrics.activate()
+        start = self.begin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.RequestMetrics.deactivate(token)
+        return self.finish(request, response, request_metrics, start)
+
+    def begin(self, request):
+        request._metrics_view_start = None
+        request._metrics_view_end = None
+        return time.perf_counter()
+
+    def finish(self, request, response, request_metrics, start):
+        duration = time.perf_counter() - start
+
+        view_start = request._metrics_view_start
+        view_end = request._metrics_view_end or time.perf_counter()
+        view_time = view_end - view_start if view_start is not None else 0.0
+
+        self.add_server_timing(response, request_metrics, view_time, duration)
+        self.record(request, response, request_metrics, view_time, duration)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called once the view has returned, just before DRF renders
+        request._metrics_view_end = time.perf_counter()
+        return response
+
+    def add_server_timing(self, response, request_metrics, view_time, duration):
+        entries = [
+            f'db;dur={request_metrics.db_time * 1000:.2f};desc="{request_metrics.queries} queries"',
+            f"serialize;dur={request_metrics.timings.get('serialize', 0.0) * 1000:.2f}",
+            f"view;dur={view_time * 1000:.2f}",
+            f"total;dur={duration * 1000:.2f}",
+        ]
+        existing = response.get('Server-Timing')
+        if existing:
+            entries.insert(0, existing)
+        response['Server-Timing'] = ', '.join(entries)
+
+    def record(self, request, response, request_metrics, view_time, duration):
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unmatched'
+        metrics.registry.record(
+            view, request.method, response.status_code, duration, view_time, request_metrics
+        )
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'view_ms': round(view_time * 1000, 2),
+            'db_queries': request_metrics.queries,
+            'db_ms': round(request_metrics.db_time * 1000, 2),
+            'serialize_ms': round(request_metrics.timings.get('serialize', 0.0) * 1000, 2),
+        }))
+
+
+class LoadSheddingMiddleware:
+    """
+    Turn away item reads with 503 while this process is overloaded
+
+    Overloaded means more than ``MAX_IN_FLIGHT`` requests in flight or, with
+    others in flight, an average DB time per request above ``MAX_DB_TIME``
+    seconds (see ``settings.GROCERY_LOAD_SHEDDING``). GET and HEAD requests under the API
+    are then answered at once with ``Retry-After``, leaving the workers and
+    the database to writes such as marking an item bought. Writes, the
+    health check and the metrics endpoint are never shed.
+
+    Sits just inside RequestMetricsMiddleware, whose per-request DB time
+    feeds the average.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        monitor = throttling.monitor
+        shed = self.shed(request, monitor, monitor.enter())
+        if shed is not None:
+            monitor.leave()
+            return shed
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            monitor.leave()
+            raise
+        monitor.leave(self.db_time())
+        return response
+
+    async def __acall__(self, request):
+        monitor = throttling.monitor
+        shed = self.shed(request, monitor, monitor.enter())
+        if shed is not None:
+            monitor.leave()
+            return shed
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            monitor.leave()
+            raise
+        monitor.leave(self.db_time())
+        return response
+
+    def db_time(self):
+        request_metrics = metrics.current_metrics()
+        return request_metrics.db_time if request_metrics is not None else None
+
+    def shed(self, request, monitor, in_flight):
+        """Return a 503 response if ``request`` should be turned away"""
+        config = throttling.load_shedding_config()
+        if (
+            not config
+            or request.method not in ('GET', 'HEAD')
+            or not request.path_info.startswith(config['PATH_PREFIX'])
+            or not monitor.overloaded(in_flight, config)
+        ):
+            return None
+        try:
+            if resolve(request.path_info).url_name in config['EXEMPT_VIEWS']:
+                return None
+        except Resolver404:
+            return None
+        response = JsonResponse(
+            {"error": "Server is busy, retry later"}, status=503
+        )
+        response['Retry-After'] = str(config['RETRY_AFTER'])
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    cProfile GroceryItemViewSet calls asked for by token or picked by sampling
+
+    See profiling.py and ``settings.GROCERY_PROFILING``. Last in MIDDLEWARE,
+    so a capture holds the view and the rendering of its response but not
+    the other middleware. A streamed response is profiled up to its first
+    chunk. Under ASGI only the request's own work is profiled, not the
+    other requests the event loop runs while it awaits (see profiling.py).
+    Requests that are not profiled cost a header lookup and, with sampling
+    on, a random number.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        config = profiling.profiling_config()
+        capture = profiling.capture(request, config)
+        if capture is None:
+            return self.get_response(request)
+        try:
+            capture.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                capture.stop()
+            capture.save(request, response, config)
+        finally:
+            capture.release()
+        return response
+
+    async def __acall__(self, request):
+        config = profiling.profiling_config()
+        capture = profiling.capture(request, config)
+        if capture is None:
+            return await self.get_response(request)
+        try:
+            response = await capture.aprofile(self.get_response(request))
+            capture.save(request, response, config)
+        finally:
+            capture.release()
+        return response
+
+
+def accepted_encodings(header):
+    """Return the content codings an Accept-Encoding header allows"""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Compress API responses with brotli or gzip, as the client allows
+
+    Brotli is preferred when the ``brotli`` package is installed. Bodies
+    smaller than ``settings.GROCERY_COMPRESS_MIN_SIZE`` bytes, streaming
+    responses (such as the change feed) and non-API content types are sent
+    as they are. Like Django's GZipMiddleware, a strong ETag is made weak
+    once the body is compressed, so conditional requests keep working.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'GROCERY_COMPRESS_MIN_SIZE', 512)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or content_type not in COMPRESSIBLE_TYPES
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < self.min_size:
+            return response
+
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and accepted & {'br', '*'}:
+            coding, compressed = 'br', brotli.compress(response.content, quality=BROTLI_QUALITY)
+        elif accepted & {'gzip', '*'}:
+            coding, compressed = 'gzip', compress_string(response.content)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = coding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
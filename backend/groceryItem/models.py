@@ -1,14 +1,263 @@
+import os
+import threading
+import time
 import uuid
-from django.db import models
+from datetime import timedelta
+from itertools import islice
+from django.conf import settings
+from django.db import connections, models, transaction, IntegrityError
+from django.db.models import Case, Count, Exists, F, Max, Min, OuterRef, Value, When
+from django.db.models.functions import Greatest, Upper
+from django.db.models.sql import DeleteQuery, UpdateQuery
+from django.utils import timezone
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinLengthValidator, MaxLengthValidator
 
 
+# The household that legacy /api/items/ routes and list-less items use
+DEFAULT_LIST_ID = uuid.UUID('00000000-0000-0000-0000-000000000001')
+
+
+def default_list_id():
+    return DEFAULT_LIST_ID
+
+
+_uuid7_lock = threading.Lock()
+_uuid7_last = (0, 0)
+
+
+def uuid7(unix_ms=None):
+    """
+    Return a time-ordered version 7 UUID (RFC 9562)
+    
+    The first 48 bits are the Unix time in milliseconds, so later ids sort
+    after earlier ones as bytes, as strings and in an index, and inserts
+    land at the right-hand edge of the primary key B-tree. Within one
+    millisecond this process counts up in the next 12 bits; the last 62
+    are random. ``unix_ms`` sets the time, e.g. to key rows by created_at.
+    """
+    global _uuid7_last
+    with _uuid7_lock:
+        last_ms, last_counter = _uuid7_last
+        if unix_ms is None:
+            # Never step back with the wall clock
+            unix_ms = max(time.time_ns() // 1000000, last_ms)
+        if unix_ms == last_ms:
+            counter = last_counter + 1
+            if counter > 0xFFF:
+                unix_ms, counter = unix_ms + 1, 0
+        else:
+            # Start in the lower half to leave room to count up
+            counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        _uuid7_last = (unix_ms, counter)
+    random_bits = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    return uuid.UUID(int=(
+        (unix_ms & 0xFFFFFFFFFFFF) << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | random_bits
+    ))
+
+
+def new_item_id():
+    """
+    Default GroceryItem id: UUIDv7, or UUIDv4 if
+    ``settings.GROCERY_ITEM_ID_VERSION`` is 4
+    """
+    if getattr(settings, 'GROCERY_ITEM_ID_VERSION', 7) == 4:
+        return uuid.uuid4()
+    return uuid7()
+
+
+def prefix_bounds(prefix):
+    """
+    Return (lower, upper) such that lower <= value < upper exactly when an
+    upper-cased value starts with ``prefix``; a range an index can seek
+    """
+    prefix = prefix.upper()
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def search_terms(key):
+    """
+    Return the indexed search terms of an upper-cased name: the name from
+    the start of each word, so "ORGANIC MILK" is found by "ORG" and "MIL"
+    """
+    return [
+        key[i:] for i, char in enumerate(key)
+        if not char.isspace() and (i == 0 or key[i - 1].isspace())
+    ]
+
+
+def can_update_returning(connection):
+    """Whether the database supports UPDATE ... RETURNING"""
+    # PostgreSQL, and SQLite from 3.35 (when INSERT ... RETURNING arrived
+    # too); MySQL and MariaDB have no UPDATE ... RETURNING
+    return connection.vendor == 'postgresql' or (
+        connection.vendor == 'sqlite' and connection.features.can_return_columns_from_insert
+    )
+
+
+def update_returning(queryset, **values):
+    """
+    ``queryset.update(**values)`` as one UPDATE ... RETURNING statement
+
+    Returns the first updated row as a model instance, or None if no row
+    matched. Check ``can_update_returning`` first.
+    """
+    connection = connections[queryset.db]
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values(values)
+    sql, params = query.get_compiler(queryset.db).as_sql()
+
+    model = queryset.model
+    fields = model._meta.concrete_fields
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{sql} RETURNING {columns}", params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    converted = _convert_row(connection, model, fields, row)
+    return model.from_db(queryset.db, [field.attname for field in fields], converted)
+
+
+def delete_returning(queryset, *field_names):
+    """
+    Delete ``queryset``'s rows and return their ``field_names`` as tuples
+
+    One DELETE ... RETURNING where the database has it, else a locking
+    SELECT and a DELETE by primary key. Unlike ``queryset.delete()`` it
+    sends no pre_delete / post_delete signals and does not cascade, so it
+    is only for models nothing else points at; the caller reports the
+    deletes itself. Call inside a transaction.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    fields = [model._meta.get_field(name) for name in field_names]
+    if not can_update_returning(connection):
+        rows = list(queryset.select_for_update().order_by().values_list(*field_names))
+        pk_index = field_names.index(model._meta.pk.attname)
+        DeleteQuery(model).delete_batch([row[pk_index] for row in rows], queryset.db)
+        return rows
+
+    query = queryset.order_by().query.chain(DeleteQuery)
+    sql, params = query.get_compiler(queryset.db).as_sql()
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{sql} RETURNING {columns}", params)
+        rows = cursor.fetchall()
+    return [tuple(_convert_row(connection, model, fields, row)) for row in rows]
+
+
+def _convert_row(connection, model, fields, row):
+    """Apply the conversions a SELECT through the ORM would to a raw row"""
+    converted = []
+    for field, value in zip(fields, row):
+        column = field.get_col(model._meta.db_table)
+        for converter in (
+            connection.ops.get_db_converters(column) + column.get_db_converters(connection)
+        ):
+            value = converter(value, column, connection)
+        converted.append(value)
+    return converted
+
+
+class GroceryList(models.Model):
+    """A household's grocery list; every item belongs to exactly one"""
+    
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    
+    name = models.CharField(
+        max_length=100,
+        validators=[
+            MinLengthValidator(1, message="Name cannot be empty"),
+            MaxLengthValidator(100, message="Name cannot exceed 100 characters")
+        ],
+        help_text="Name of the household or list"
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp when the list was created"
+    )
+    
+    change_seq = models.BigIntegerField(
+        default=0,
+        help_text="Last change sequence number handed out for this list"
+    )
+    
+    compacted_seq = models.BigIntegerField(
+        default=0,
+        help_text="Highest sequence of purged tombstones; older cursors must resync"
+    )
+    
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Grocery List"
+        verbose_name_plural = "Grocery Lists"
+    
+    def __str__(self):
+        return self.name
+    
+    @classmethod
+    def ensure_default(cls, using=None):
+        """Create the default list if it does not exist yet"""
+        grocery_list, _ = cls.objects.db_manager(using).get_or_create(
+            pk=DEFAULT_LIST_ID, defaults={'name': "Family"}
+        )
+        return grocery_list
+    
+    @classmethod
+    def next_change_seq(cls, grocery_list_id, count=1):
+        """
+        Reserve ``count`` change sequence numbers and return the last one
+        
+        The UPDATE locks the list row until the caller's transaction ends,
+        so writers to one list commit in sequence order and a reader never
+        sees a number before the numbers below it are visible.
+        """
+        grocery_list = cls.objects.filter(pk=grocery_list_id)
+        if can_update_returning(connections[grocery_list.db]):
+            updated = update_returning(grocery_list, change_seq=F('change_seq') + count)
+            if updated is None:
+                raise cls.DoesNotExist("GroceryList matching query does not exist.")
+            return updated.change_seq
+        with transaction.atomic(savepoint=False):
+            grocery_list.update(change_seq=F('change_seq') + count)
+            return grocery_list.values_list('change_seq', flat=True).get()
+
+
+class GroceryItemQuerySet(models.QuerySet):
+    """QuerySet with index-backed lookups for grocery items"""
+    
+    def name_startswith(self, prefix):
+        """
+        Case-insensitive prefix match on name
+        
+        Written as a range over UPPER(name) rather than ``istartswith`` so
+        it can seek the ``grocery_list_name_upper_idx`` expression index on
+        both SQLite and PostgreSQL (a LIKE pattern cannot use it on either)
+        once the queryset is scoped to a list.
+        """
+        if not prefix:
+            return self.all()
+        lower_bound, upper_bound = prefix_bounds(prefix)
+        return self.alias(name_upper=Upper('name')).filter(
+            name_upper__gte=lower_bound,
+            name_upper__lt=upper_bound
+        )
+
+
 class GroceryItem(models.Model):
     """Model for grocery items"""
     
+    # Time-ordered, so new rows append to the primary key index instead of
+    # splitting pages all over it; existing ids are rekeyed by rekey_items
     id = models.UUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=new_item_id,
         editable=False
     )
     
@@ -26,6 +275,16 @@ class GroceryItem(models.Model):
         help_text="Whether the item has been bought or not"
     )
     
+    # Indexed through the composite indexes below, which all lead with it
+    grocery_list = models.ForeignKey(
+        GroceryList,
+        on_delete=models.CASCADE,
+        related_name='items',
+        default=default_list_id,
+        db_index=False,
+        help_text="List (household) the item belongs to"
+    )
+    
     created_at = models.DateTimeField(
         auto_now_add=True,
         help_text="Timestamp when the item was created"
@@ -36,8 +295,55 @@ class GroceryItem(models.Model):
         help_text="Timestamp when the item was last updated"
     )
     
+    change_seq = models.BigIntegerField(
+        default=0,
+        help_text="List change sequence number of the last write"
+    )
+    
+    objects = GroceryItemQuerySet.as_manager()
+    
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Every API query is scoped to one list, so each index leads
+            # with grocery_list and per-request cost tracks that list's size.
+            # Default ordering and keyset pagination seek on (created_at, id)
+            models.Index(
+                fields=['grocery_list', 'created_at', 'id'],
+                name='grocery_list_created_id_idx'
+            ),
+            # "To buy" / "bought" lists (?bought=) and the admin bought
+            # filter. Django renders these filters as WHERE [NOT] bought,
+            # which a partial index matches on SQLite and PostgreSQL where a
+            # (bought, created_at) composite would not be used on SQLite
+            models.Index(
+                fields=['grocery_list', 'created_at', 'id'],
+                condition=models.Q(bought=False),
+                name='grocery_list_to_buy_idx'
+            ),
+            models.Index(
+                fields=['grocery_list', 'created_at', 'id'],
+                condition=models.Q(bought=True),
+                name='grocery_list_bought_idx'
+            ),
+            # Case-insensitive name search (see
+            # GroceryItemQuerySet.name_startswith) and ?ordering=name
+            models.Index(
+                F('grocery_list'), Upper('name'), F('id'),
+                name='grocery_list_name_upper_idx'
+            ),
+            # ?updated_since= and ?ordering=updated_at, and max(updated_at)
+            # for the list validators
+            models.Index(
+                fields=['grocery_list', 'updated_at', 'id'],
+                name='grocery_list_updated_idx'
+            ),
+            # Delta sync: everything in a list changed after a sequence number
+            models.Index(
+                fields=['grocery_list', 'change_seq'],
+                name='grocery_list_change_seq_idx'
+            ),
+        ]
         verbose_name = "Grocery Item"
         verbose_name_plural = "Grocery Items"
     
@@ -45,6 +351,13 @@ class GroceryItem(models.Model):
         status = "✓" if self.bought else "○"
         return f"{status} {self.name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored value so saves can tell if bought was toggled
+        instance._loaded_bought = instance.__dict__.get('bought')
+        return instance
+    
     def save(self, *args, **kwargs):
         # Ensure name is not empty or None
         if not self.name or not self.name.strip():
@@ -53,4 +366,718 @@ class GroceryItem(models.Model):
         # Strip whitespace from name
         self.name = self.name.strip()
         
-        super().save(*args, **kwargs)
\ No newline at end of file
+        # post_save receivers update GroceryItemStats in the same transaction
+        with transaction.atomic():
+            self.change_seq = GroceryList.next_change_seq(self.grocery_list_id)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'change_seq'}
+            super().save(*args, **kwargs)
+        self._loaded_bought = self.bought
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+    
+    @classmethod
+    def set_bought(cls, grocery_list_id, pk, bought=None, expected=None):
+        """
+        Set ``bought`` on one item, or flip it when ``bought`` is None,
+        without reading the item first
+        
+        Where the database supports it this is one UPDATE ... RETURNING, so
+        concurrent toggles each flip the stored value rather than writing
+        back what they read. Setting a value the item already has takes a
+        second UPDATE, as the first only matches items it changes. With
+        ``expected``, a list of ``updated_at`` values, only an item still at
+        one of them is written (see conditional.if_match_versions).
+        
+        Returns (item, previous bought) and raises DoesNotExist if nothing
+        matched. No post_save is sent; the caller sends bulk_items_changed.
+        Call inside a transaction, so a miss does not consume a change_seq.
+        """
+        items = cls.objects.filter(grocery_list_id=grocery_list_id, pk=pk)
+        if expected is not None:
+            items = items.filter(updated_at__in=expected)
+        values = {
+            'updated_at': timezone.now(),
+            'change_seq': GroceryList.next_change_seq(grocery_list_id),
+        }
+        
+        if not can_update_returning(connections[items.db]):
+            item = items.select_for_update().get()
+            previous = item.bought
+            item.bought = not previous if bought is None else bought
+            items.update(bought=item.bought, **values)
+            for name, value in values.items():
+                setattr(item, name, value)
+            item._loaded_bought = item.bought
+            return item, previous
+        
+        if bought is None:
+            item = update_returning(items, bought=~F('bought'), **values)
+            previous = None if item is None else not item.bought
+        else:
+            item = update_returning(items.filter(bought=not bought), bought=bought, **values)
+            previous = not bought
+            if item is None:
+                item = update_returning(items, **values)
+                previous = bought
+        if item is None:
+            raise cls.DoesNotExist("GroceryItem matching query does not exist.")
+        return item, previous
+    
+    @classmethod
+    def rekey(cls, batch_size=1000):
+        """
+        Give every item without a UUIDv7 id one made from its created_at
+        
+        For the rekey_items command, run while the API is stopped. Items
+        are rekeyed in created_at order, one transaction per batch, so an
+        interrupted run can simply be started again. Purchases follow their
+        item to the new id, and rekeyed items get a new updated_at so list
+        ETags change. Each list touched has its compacted_seq raised
+        to a fresh change_seq, so clients that synced before reload it
+        rather than keep the old ids. Returns {list id: items rekeyed}.
+        """
+        rekeyed = {}
+        rows = cls.objects.order_by('created_at', 'id').values_list(
+            'pk', 'created_at', 'grocery_list_id'
+        )
+        after = None
+        while True:
+            page = list((rows if after is None else rows.filter(created_at__gt=after))[:batch_size])
+            if not page:
+                return rekeyed
+            # Take every row at the last timestamp, so the next page can
+            # start strictly after it however the ids have changed
+            after = page[-1][1]
+            page = [row for row in page if row[1] != after] + list(rows.filter(created_at=after))
+            
+            stale = [row for row in page if row[0].version != 7]
+            if not stale:
+                continue
+            new_ids = {
+                pk: uuid7(int(created_at.timestamp() * 1000)) for pk, created_at, _ in stale
+            }
+            list_ids = {list_id for _, _, list_id in stale}
+            with transaction.atomic():
+                # Moving updated_at changes the list ETags, whose count and
+                # max(updated_at) would otherwise still match the old ids
+                cls.objects.filter(pk__in=new_ids).update(
+                    id=Case(
+                        *(When(pk=old, then=Value(new)) for old, new in new_ids.items()),
+                        output_field=cls._meta.pk
+                    ),
+                    updated_at=timezone.now()
+                )
+                GroceryItemPurchase.objects.filter(item_id__in=new_ids).update(item_id=Case(
+                    *(When(item_id=old, then=Value(new)) for old, new in new_ids.items()),
+                    output_field=GroceryItemPurchase._meta.get_field('item_id')
+                ))
+                for list_id in list_ids:
+                    seq = GroceryList.next_change_seq(list_id)
+                    GroceryList.objects.filter(pk=list_id).update(compacted_seq=seq)
+            for _, _, list_id in stale:
+                rekeyed[list_id] = rekeyed.get(list_id, 0) + 1
+
+
+class GroceryItemTombstone(models.Model):
+    """
+    Marker left behind by a deleted item so delta sync can report the delete
+    
+    Written by a post_delete receiver, or in one INSERT for a bulk delete
+    (signals.py). ``compact()`` purges old markers and
+    raises the list's ``compacted_seq`` so clients that synced before the
+    purge know to reload the whole list.
+    """
+    
+    # The deleted item's id
+    id = models.UUIDField(primary_key=True, editable=False)
+    
+    # Indexed through grocery_tombstone_list_seq_idx, which leads with it
+    grocery_list = models.ForeignKey(
+        GroceryList,
+        on_delete=models.CASCADE,
+        related_name='tombstones',
+        db_index=False
+    )
+    
+    change_seq = models.BigIntegerField(
+        help_text="List change sequence number of the delete"
+    )
+    
+    deleted_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        help_text="Timestamp when the item was deleted"
+    )
+    
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['grocery_list', 'change_seq'],
+                name='grocery_tombstone_list_seq_idx'
+            ),
+        ]
+        verbose_name = "Grocery Item Tombstone"
+        verbose_name_plural = "Grocery Item Tombstones"
+    
+    @classmethod
+    def compact(cls, older_than):
+        """Delete tombstones older than ``older_than``; returns how many went"""
+        stale = cls.objects.filter(deleted_at__lt=older_than)
+        with transaction.atomic():
+            horizons = stale.order_by().values('grocery_list').annotate(seq=Max('change_seq'))
+            for horizon in horizons:
+                GroceryList.objects.filter(
+                    pk=horizon['grocery_list'], compacted_seq__lt=horizon['seq']
+                ).update(compacted_seq=horizon['seq'])
+            deleted, _ = stale.delete()
+        return deleted
+
+
+class GroceryItemStats(models.Model):
+    """
+    Per-list item counters, kept current by the GroceryItem write signals
+    inside each write's transaction so reading stats is O(1)
+    """
+    
+    grocery_list = models.OneToOneField(
+        GroceryList,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='stats'
+    )
+    
+    total = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of grocery items"
+    )
+    
+    bought = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of grocery items marked as bought"
+    )
+    
+    class Meta:
+        verbose_name = "Grocery Item Stats"
+        verbose_name_plural = "Grocery Item Stats"
+    
+    def __str__(self):
+        return f"{self.bought}/{self.total} bought"
+    
+    @property
+    def active(self):
+        return self.total - self.bought
+    
+    @classmethod
+    def apply(cls, grocery_list_id, total=0, bought=0):
+        """Add deltas to a list's counters, creating the row on first use"""
+        if not total and not bought:
+            return
+        updated = cls.objects.filter(pk=grocery_list_id).update(
+            total=F('total') + total,
+            bought=F('bought') + bought
+        )
+        if not updated:
+            # The recount already includes the write being applied
+            cls.recount(grocery_list_id)
+    
+    @classmethod
+    def current(cls, grocery_list_id):
+        """Return a list's counters, counting items only if the row is missing"""
+        try:
+            return cls.objects.get(pk=grocery_list_id)
+        except cls.DoesNotExist:
+            return cls.recount(grocery_list_id)
+    
+    @classmethod
+    def recount(cls, grocery_list_id):
+        """Rebuild a list's counters from the items table"""
+        with transaction.atomic():
+            counts = GroceryItem.objects.filter(grocery_list_id=grocery_list_id).aggregate(
+                total=models.Count('pk'),
+                bought=models.Count('pk', filter=models.Q(bought=True))
+            )
+            try:
+                with transaction.atomic():
+                    stats, _ = cls.objects.update_or_create(
+                        pk=grocery_list_id, defaults=counts
+                    )
+            except IntegrityError:
+                # Another request created the row first
+                stats = cls.objects.get(pk=grocery_list_id)
+                stats.total, stats.bought = counts['total'], counts['bought']
+                stats.save(update_fields=['total', 'bought'])
+        return stats
+
+
+class GroceryItemName(models.Model):
+    """
+    A name that has been added to a list, with how often and how recently
+    
+    The household's item history behind autocomplete and search ranking.
+    The GroceryItem create signals keep it current (deleting an item does
+    not forget its name); ``rebuild()`` refills it from the items table
+    after writes that bypass them. Each name is indexed by the start of
+    every word through GroceryItemNameTerm.
+    """
+    
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    
+    # Indexed through grocery_name_list_key_uniq, which leads with it
+    grocery_list = models.ForeignKey(
+        GroceryList,
+        on_delete=models.CASCADE,
+        related_name='names',
+        db_index=False
+    )
+    
+    key = models.CharField(
+        max_length=100,
+        help_text="Upper-cased name; one row per key and list"
+    )
+    
+    name = models.CharField(
+        max_length=100,
+        help_text="Name as it was last added"
+    )
+    
+    times_added = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of items created with this name"
+    )
+    
+    last_added_at = models.DateTimeField(
+        help_text="Timestamp when an item with this name was last created"
+    )
+    
+    # Term matches above which matching() walks names in rank order
+    BROAD_PREFIX_MATCHES = 1000
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['grocery_list', 'key'],
+                name='grocery_name_list_key_uniq'
+            ),
+        ]
+        indexes = [
+            # Autocomplete order within a list, see matching()
+            models.Index(
+                fields=['grocery_list', '-times_added', '-last_added_at'],
+                name='grocery_name_rank_idx'
+            ),
+        ]
+        verbose_name = "Grocery Item Name"
+        verbose_name_plural = "Grocery Item Names"
+    
+    def __str__(self):
+        return f"{self.name} (x{self.times_added})"
+    
+    @classmethod
+    def matching(cls, grocery_list_id, prefix):
+        """
+        Return a list's names with a word starting with ``prefix``, most
+        often and then most recently added first
+        
+        A narrow prefix collects its few matches from the term index and
+        sorts them. A broad one ("a" can match a tenth of the history)
+        would sort thousands, so it walks grocery_name_rank_idx in rank
+        order instead, checking each name's terms, until enough are found.
+        """
+        lower_bound, upper_bound = prefix_bounds(prefix)
+        terms = GroceryItemNameTerm.objects.filter(
+            grocery_list_id=grocery_list_id,
+            term__gte=lower_bound,
+            term__lt=upper_bound
+        )
+        names = cls.objects.filter(grocery_list_id=grocery_list_id)
+        if terms[:cls.BROAD_PREFIX_MATCHES].count() < cls.BROAD_PREFIX_MATCHES:
+            names = names.filter(pk__in=terms.values('name_id'))
+        else:
+            names = names.filter(Exists(terms.filter(name_id=OuterRef('pk'))))
+        return names.order_by('-times_added', '-last_added_at')
+    
+    @classmethod
+    def record(cls, grocery_list_id, items):
+        """
+        Count newly created ``items`` into a list's name history
+        
+        A constant number of queries however many items there are: one
+        SELECT, one UPDATE for names seen before and two INSERTs for new
+        ones (plus a savepoint so a concurrent insert of the same name can
+        be retried as an update).
+        """
+        added = {}
+        for item in items:
+            key = item.name.upper()
+            times, _, last_added_at = added.get(key, (0, None, item.created_at))
+            added[key] = (times + 1, item.name, max(last_added_at, item.created_at))
+        if not added:
+            return
+        
+        for attempt in range(2):
+            existing = dict(
+                cls.objects.filter(grocery_list_id=grocery_list_id, key__in=added)
+                .values_list('key', 'pk')
+            )
+            if existing:
+                cls.objects.filter(pk__in=existing.values()).update(
+                    times_added=F('times_added') + models.Case(
+                        *(models.When(key=key, then=added[key][0]) for key in existing),
+                        output_field=models.PositiveIntegerField()
+                    ),
+                    name=models.Case(
+                        *(models.When(key=key, then=models.Value(added[key][1])) for key in existing),
+                        output_field=models.CharField()
+                    ),
+                    last_added_at=Greatest(
+                        'last_added_at',
+                        models.Case(
+                            *(models.When(key=key, then=models.Value(added[key][2])) for key in existing),
+                            output_field=models.DateTimeField()
+                        )
+                    )
+                )
+            new = [
+                cls(
+                    grocery_list_id=grocery_list_id,
+                    key=key,
+                    name=name,
+                    times_added=times,
+                    last_added_at=last_added_at
+                )
+                for key, (times, name, last_added_at) in added.items()
+                if key not in existing
+            ]
+            if not new:
+                return
+            try:
+                with transaction.atomic():
+                    cls.objects.bulk_create(new)
+                    GroceryItemNameTerm.objects.bulk_create(
+                        GroceryItemNameTerm(
+                            name=entry, grocery_list_id=grocery_list_id, term=term
+                        )
+                        for entry in new
+                        for term in search_terms(entry.key)
+                    )
+                return
+            except IntegrityError:
+                if attempt:
+                    raise
+                # Another request added one of these names first; every
+                # name now exists, so the second pass only updates
+                added = {key: value for key, value in added.items() if key not in existing}
+    
+    @classmethod
+    def rebuild(cls, grocery_list_id, batch_size=1000):
+        """Rebuild a list's name history from the items it has now"""
+        with transaction.atomic():
+            cls.objects.filter(grocery_list_id=grocery_list_id).delete()
+            items = GroceryItem.objects.filter(
+                grocery_list_id=grocery_list_id
+            ).only('name', 'created_at').order_by().iterator(chunk_size=batch_size)
+            while batch := list(islice(items, batch_size)):
+                cls.record(grocery_list_id, batch)
+
+
+class GroceryItemNameTerm(models.Model):
+    """One word-start of a GroceryItemName, for index-backed prefix search"""
+    
+    name = models.ForeignKey(
+        GroceryItemName,
+        on_delete=models.CASCADE,
+        related_name='terms'
+    )
+    
+    # Copied from the name so the term index can lead with the list
+    grocery_list = models.ForeignKey(
+        GroceryList,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False
+    )
+    
+    term = models.CharField(
+        max_length=100,
+        help_text="Upper-cased name from the start of one of its words"
+    )
+    
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['grocery_list', 'term'],
+                name='grocery_name_term_idx'
+            ),
+        ]
+        verbose_name = "Grocery Item Name Term"
+        verbose_name_plural = "Grocery Item Name Terms"
+
+
+class GroceryItemPurchase(models.Model):
+    """
+    One item being marked bought, in an append-only log
+    
+    Written by the GroceryItem write signals whenever ``bought`` goes from
+    false to true. Entries are never updated, and they outlive the item,
+    so the household's buying history survives clearing the list. Reads
+    go to the GroceryItemPurchaseRollup it feeds, never to this log.
+    """
+    
+    # Indexed through grocery_purchase_key_idx, which leads with it
+    grocery_list = models.ForeignKey(
+        GroceryList,
+        on_delete=models.CASCADE,
+        related_name='purchases',
+        db_index=False
+    )
+    
+    item_id = models.UUIDField(
+        help_text="Id of the item that was bought; it may since have been deleted"
+    )
+    
+    name = models.CharField(max_length=100)
+    
+    key = models.CharField(
+        max_length=100,
+        help_text="Upper-cased name, as in GroceryItemName"
+    )
+    
+    bought_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['grocery_list', 'key', 'bought_at'],
+                name='grocery_purchase_key_idx'
+            ),
+        ]
+        verbose_name = "Grocery Item Purchase"
+        verbose_name_plural = "Grocery Item Purchases"
+    
+    def __str__(self):
+        return f"{self.name} bought {self.bought_at:%Y-%m-%d}"
+    
+    @classmethod
+    def record(cls, grocery_list_id, items):
+        """
+        Log ``items`` as just bought and fold them into the rollups
+        
+        A name bought again within ``settings.GROCERY_PURCHASE_MIN_INTERVAL``
+        seconds of its last purchase is not logged again: that is the same
+        shopping trip, or a bought -> not bought -> bought slip of the finger,
+        and counting it would make the name look due again at once.
+        """
+        purchases = [
+            cls(
+                grocery_list_id=grocery_list_id,
+                item_id=item.pk,
+                name=item.name,
+                key=item.name.upper(),
+                bought_at=item.updated_at
+            )
+            for item in items
+        ]
+        if not purchases:
+            return
+        counted = GroceryItemPurchaseRollup.apply(grocery_list_id, purchases)
+        if counted:
+            cls.objects.bulk_create(counted)
+
+
+class GroceryItemPurchaseRollup(models.Model):
+    """
+    Per-name purchase totals for a list, kept current from the purchase log
+    
+    Updated in the same transaction as each purchase, so reading them never
+    touches the log however many years it covers. ``next_due_at`` (last
+    purchase plus the average interval) is stored rather than computed so
+    "usually bought but not on the list" is an index walk in due order.
+    """
+    
+    # Indexed through grocery_purchase_list_key_uniq, which leads with it
+    grocery_list = models.ForeignKey(
+        GroceryList,
+        on_delete=models.CASCADE,
+        related_name='purchase_rollups',
+        db_index=False
+    )
+    
+    key = models.CharField(
+        max_length=100,
+        help_text="Upper-cased name; one row per key and list"
+    )
+    
+    name = models.CharField(
+        max_length=100,
+        help_text="Name as it was last bought"
+    )
+    
+    times_bought = models.PositiveIntegerField(default=0)
+    
+    first_bought_at = models.DateTimeField()
+    
+    last_bought_at = models.DateTimeField()
+    
+    next_due_at = models.DateTimeField(
+        null=True,
+        help_text="Last purchase plus the average interval; null until bought twice"
+    )
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['grocery_list', 'key'],
+                name='grocery_purchase_list_key_uniq'
+            ),
+        ]
+        indexes = [
+            # Names in the order they are due again, see the usual action
+            models.Index(
+                fields=['grocery_list', 'next_due_at'],
+                name='grocery_purchase_due_idx'
+            ),
+        ]
+        verbose_name = "Grocery Item Purchase Rollup"
+        verbose_name_plural = "Grocery Item Purchase Rollups"
+    
+    def __str__(self):
+        return f"{self.name} bought {self.times_bought} times"
+    
+    @property
+    def average_interval(self):
+        """Mean time between purchases as a timedelta, or None"""
+        if self.times_bought < 2:
+            return None
+        return (self.last_bought_at - self.first_bought_at) / (self.times_bought - 1)
+    
+    def add(self, purchase):
+        """Count one more purchase in"""
+        if self.times_bought == 0 or purchase.bought_at >= self.last_bought_at:
+            self.name = purchase.name
+        self.first_bought_at = min(self.first_bought_at, purchase.bought_at)
+        self.last_bought_at = max(self.last_bought_at, purchase.bought_at)
+        self.times_bought += 1
+        interval = self.average_interval
+        self.next_due_at = self.last_bought_at + interval if interval else None
+    
+    @classmethod
+    def apply(cls, grocery_list_id, purchases):
+        """
+        Fold new purchases into the rollups and return the ones counted
+        
+        A purchase less than ``GROCERY_PURCHASE_MIN_INTERVAL`` after its
+        name's last one is left out. One locking SELECT, one UPDATE for
+        names bought before and one INSERT for new ones, however many
+        purchases there are.
+        """
+        min_interval = timedelta(
+            seconds=getattr(settings, 'GROCERY_PURCHASE_MIN_INTERVAL', 15 * 60)
+        )
+        counted = []
+        for attempt in range(2):
+            rollups = {
+                rollup.key: rollup for rollup in cls.objects.select_for_update().filter(
+                    grocery_list_id=grocery_list_id,
+                    key__in={purchase.key for purchase in purchases}
+                )
+            }
+            new = {}
+            added = []
+            for purchase in purchases:
+                rollup = rollups.get(purchase.key) or new.get(purchase.key)
+                if rollup is None:
+                    rollup = new[purchase.key] = cls(
+                        grocery_list_id=grocery_list_id,
+                        key=purchase.key,
+                        first_bought_at=purchase.bought_at,
+                        last_bought_at=purchase.bought_at
+                    )
+                elif purchase.bought_at < rollup.last_bought_at + min_interval:
+                    continue
+                rollup.add(purchase)
+                added.append(purchase)
+            if rollups:
+                cls.objects.bulk_update(
+                    rollups.values(),
+                    ['name', 'times_bought', 'first_bought_at', 'last_bought_at', 'next_due_at']
+                )
+            if not new:
+                return counted + added
+            try:
+                with transaction.atomic():
+                    cls.objects.bulk_create(new.values())
+                return counted + added
+            except IntegrityError:
+                if attempt:
+                    raise
+                # Another request added one of these names first; fold the
+                # purchases that were not counted yet into its row
+                counted += [purchase for purchase in added if purchase.key not in new]
+                purchases = [purchase for purchase in purchases if purchase.key in new]
+    
+    @classmethod
+    def rebuild(cls, grocery_list_id):
+        """Rebuild a list's rollups from the purchase log"""
+        with transaction.atomic():
+            cls.objects.filter(grocery_list_id=grocery_list_id).delete()
+            totals = GroceryItemPurchase.objects.filter(
+                grocery_list_id=grocery_list_id
+            ).values('key').annotate(
+                names=Max('name'),
+                count=Count('pk'),
+                first=Min('bought_at'),
+                last=Max('bought_at')
+            ).order_by()
+            rollups = []
+            for total in totals.iterator():
+                rollup = cls(
+                    grocery_list_id=grocery_list_id,
+                    key=total['key'],
+                    name=total['names'],
+                    times_bought=total['count'],
+                    first_bought_at=total['first'],
+                    last_bought_at=total['last']
+                )
+                interval = rollup.average_interval
+                rollup.next_due_at = rollup.last_bought_at + interval if interval else None
+                rollups.append(rollup)
+            cls.objects.bulk_create(rollups, batch_size=1000)
+
+
+class IdempotencyRecord(models.Model):
+    """
+    Stored outcome of a write sent with an ``Idempotency-Key``
+    
+    Saved in the same transaction as the write, so a retried request is
+    either answered from here or runs for the first time, never twice.
+    Records expire after ``settings.GROCERY_IDEMPOTENCY_TTL`` seconds.
+    """
+    
+    key = models.CharField(max_length=255, primary_key=True)
+    
+    fingerprint = models.CharField(
+        max_length=300,
+        help_text="Method and path of the request the key was first used for"
+    )
+    
+    status_code = models.PositiveSmallIntegerField()
+    
+    body = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        help_text="Timestamp when the key was first used"
+    )
+    
+    class Meta:
+        verbose_name = "Idempotency Record"
+        verbose_name_plural = "Idempotency Records"
@@ -0,0 +1,122 @@
+import base64
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over (created_at, id)
+
+    Each page is fetched with ``WHERE (created_at, id) > (cursor)`` instead of
+    an OFFSET, so a page deep in the list costs the same as the first one.
+    Cursors are opaque url-safe tokens encoding the last row of the page.
+
+    Pagination is opt-in: it only kicks in when the client sends ``cursor``
+    or ``page_size``, so plain ``GET /items/`` keeps returning a bare array.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 500
+    ordering = ('created_at', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def is_requested(self, request):
+        """Return True if the client asked for a paginated response"""
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async version of ``paginate_queryset`` for the async item views"""
+        if not self.is_requested(request):
+            return None
+        return self.set_page([row async for row in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        """Return the (unevaluated) queryset for the requested page"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.current_page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            created_at, pk = self.decode_cursor(encoded)
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            )
+
+        # Fetch one extra row to find out whether there is a next page
+        return queryset[:self.current_page_size + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.current_page_size
+        self.page = rows[:self.current_page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        """Return the requested page size, clamped to max_page_size"""
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_position(self, item):
+        """Return the (created_at, id) keyset position of a page row"""
+        return item.created_at, item.id
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        cursor = self.encode_cursor(*self.get_position(self.page[-1]))
+        url = replace_query_param(self.base_url, self.cursor_query_param, cursor)
+        return replace_query_param(url, self.page_size_query_param, self.current_page_size)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def encode_cursor(self, created_at, pk):
+        """Encode a keyset position as an opaque url-safe token"""
+        raw = f"{created_at.isoformat()}|{pk}".encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, encoded):
+        """Decode a cursor token back into a (created_at, id) position"""
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+            created_at, pk = raw.split('|', 1)
+            return datetime.fromisoformat(created_at), uuid.UUID(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,287 @@
+"""
+On-demand and sampled cProfile captures of item API calls
+
+ProfilingMiddleware (middleware.py) profiles a request to the GroceryItemViewSet routes
+when it carries a valid ``X-Grocery-Profile`` token (``manage.py profiles
+--token``) or when it falls in the ``SAMPLE_RATE`` fraction of the rest
+(see ``settings.GROCERY_PROFILING``). The capture covers the view, its
+serializer and ORM work and the rendering of the response. It is written
+to ``DIRECTORY`` as a pstats ``.prof`` file, next to a ``.json`` file that
+says which request it was. Only the newest ``MAX_FILES`` captures are kept.
+``manage.py profiles`` lists them and sums up the top functions.
+
+A process runs one profile at a time. A request that would be profiled
+while another is being profiled runs unprofiled. Under ASGI the event loop
+interleaves requests, so the loop's profiler runs only while the profiled
+request's own coroutine does and is off whenever it awaits. The other
+requests served meanwhile stay out of the capture. A second profiler covers
+the thread Django gives the request for its sync code (``sync_to_async``:
+the ORM, sync views), and the two are saved as one capture. Time spent
+waiting, on the database or anything else, is in ``duration_ms`` but in no
+function.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+TOKEN_HEADER = 'HTTP_X_GROCERY_PROFILE'
+TOKEN_SALT = 'groceryItem.profiling'
+# Set on profiled responses so the caller can find the capture
+PROFILE_ID_HEADER = 'X-Grocery-Profile-Id'
+
+# Where ``manage.py profiles`` counts a function's own time: the first area
+# with a fragment in the function's "file:name" wins, the rest is "other"
+AREAS = (
+    ('database', ('sqlite3', 'psycopg')),
+    ('orm', ('django/db/',)),
+    ('cache', ('django/core/cache/', 'groceryItem/cache', '_pickle')),
+    ('serializer', (
+        'rest_framework/serializers', 'rest_framework/fields', 'groceryItem/serializers',
+    )),
+    ('renderer', (
+        'rest_framework/renderers', 'groceryItem/rendering', 'orjson', 'json/encoder',
+    )),
+    ('view', ('groceryItem/',)),
+)
+
+_profiling = threading.Lock()
+
+
+def profiling_config():
+    """Return ``settings.GROCERY_PROFILING`` or None when it is off"""
+    return getattr(settings, 'GROCERY_PROFILING', None)
+
+
+def make_token(label=''):
+    """A signed token that has the request carrying it profiled"""
+    return signing.dumps({'label': label}, salt=TOKEN_SALT, compress=True)
+
+
+def read_token(token, max_age):
+    """Return the token's label, or None if it is forged or expired"""
+    try:
+        return signing.loads(token, salt=TOKEN_SALT, max_age=max_age)['label']
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+def profiled_view(request, config):
+    """Return the url name of an item route ``request`` goes to, else None"""
+    try:
+        url_name = resolve(request.path_info).url_name
+    except Resolver404:
+        return None
+    if url_name is None or url_name in config['EXEMPT_VIEWS']:
+        return None
+    basename = url_name.rpartition('-')[0]
+    return url_name if basename in config['VIEWS'] else None
+
+
+def capture(request, config):
+    """
+    Return a Capture if ``request`` is to be profiled, else None
+
+    A returned Capture holds the process's profiling lock until released.
+    """
+    if not config:
+        return None
+    token = request.META.get(TOKEN_HEADER)
+    label = read_token(token, config['TOKEN_MAX_AGE']) if token else None
+    if label is not None:
+        trigger = 'token'
+    elif random.random() < config['SAMPLE_RATE']:
+        label, trigger = '', 'sample'
+    else:
+        return None
+    view = profiled_view(request, config)
+    if view is None or not _profiling.acquire(blocking=False):
+        return None
+    return Capture(view, trigger, label)
+
+
+def profile_directory(config=None):
+    config = config if config is not None else profiling_config()
+    return Path(config['DIRECTORY'])
+
+
+def write_profile(stats, info, config):
+    """Save a capture and its request info, then drop the oldest captures"""
+    directory = profile_directory(config)
+    directory.mkdir(parents=True, exist_ok=True)
+    # Names sort in capture order
+    name = f"{timezone.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+    stats.dump_stats(directory / f"{name}.prof")
+    (directory / f"{name}.json").write_text(json.dumps(info))
+    for stale in list_profiles(directory)[:-config['MAX_FILES']]:
+        for path in (directory / f"{stale}.prof", directory / f"{stale}.json"):
+            path.unlink(missing_ok=True)
+    return name
+
+
+def list_profiles(directory):
+    """Names of the captures in ``directory``, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        entry.name[:-len('.prof')]
+        for entry in os.scandir(directory)
+        if entry.name.endswith('.prof')
+    )
+
+
+def read_info(directory, name):
+    """The request info saved with a capture ({} if it is missing)"""
+    try:
+        return json.loads((Path(directory) / f"{name}.json").read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+class _Stepwise:
+    """Await ``awaitable`` with ``profiler`` on only while it runs"""
+
+    def __init__(self, awaitable, profiler):
+        self.awaitable = awaitable
+        self.profiler = profiler
+
+    def __await__(self):
+        steps = self.awaitable.__await__()
+        step, value = steps.send, None
+        while True:
+            self.profiler.enable()
+            try:
+                suspended_on = step(value)
+            except StopIteration as done:
+                return done.value
+            finally:
+                self.profiler.disable()
+            try:
+                value = yield suspended_on
+                step = steps.send
+            except GeneratorExit:
+                steps.close()
+                raise
+            except BaseException as e:
+                step, value = steps.throw, e
+
+
+class Capture:
+    """One request being profiled"""
+
+    def __init__(self, view, trigger, label):
+        self.view = view
+        self.trigger = trigger
+        self.label = label
+        self.profiler = cProfile.Profile()
+        # Under ASGI, the request's sync thread
+        self.thread_profiler = None
+        self.started = None
+        self.duration = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+
+    async def aprofile(self, awaitable):
+        """Return what ``awaitable`` returns, profiling only this request's work"""
+        self.thread_profiler = cProfile.Profile()
+        self.started = time.perf_counter()
+        # Thread-sensitive calls of one ASGI request all run in its thread
+        await sync_to_async(self.thread_profiler.enable)()
+        try:
+            return await _Stepwise(awaitable, self.profiler)
+        finally:
+            await sync_to_async(self.thread_profiler.disable)()
+            self.duration = time.perf_counter() - self.started
+
+    def stats(self):
+        """The capture's profilers added together"""
+        stats = pstats.Stats()
+        for profiler in (self.profiler, self.thread_profiler):
+            # Stats() refuses a profiler that saw no calls
+            if profiler is not None and profiler.getstats():
+                stats.add(profiler)
+        return stats
+
+    def save(self, request, response, config):
+        info = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': self.view,
+            'status': response.status_code,
+            'duration_ms': round(self.duration * 1000, 2),
+            'trigger': self.trigger,
+            'label': self.label,
+            'profiled_at': timezone.now().isoformat(),
+        }
+        try:
+            name = write_profile(self.stats(), info, config)
+        except OSError as e:
+            logger.warning(f"Could not save profile of {request.path}: {e}")
+            return
+        response[PROFILE_ID_HEADER] = name
+
+    def release(self):
+        _profiling.release()
+
+
+def load_stats(paths):
+    """The captures at ``paths`` added together"""
+    stats = pstats.Stats(str(paths[0]))
+    for path in paths[1:]:
+        stats.add(str(path))
+    return stats
+
+
+def area_of(function):
+    """The AREAS name for a pstats (file, line, name) key"""
+    filename, _, name = function
+    where = f"{filename.replace(os.sep, '/')}:{name}"
+    for area, fragments in AREAS:
+        if any(fragment in where for fragment in fragments):
+            return area
+    return 'other'
+
+
+def function_label(function):
+    """A pstats key as "file:line(name)", with the file relative to its package"""
+    filename, line, name = function
+    if filename == '~':
+        return name
+    filename = filename.replace(os.sep, '/')
+    roots = (
+        'site-packages/',
+        f"{Path(os.__file__).parent.as_posix()}/",  # The standard library
+        f"{Path(settings.BASE_DIR).as_posix()}/",
+    )
+    for root in roots:
+        filename = filename.rpartition(root)[2]
+    return f"{filename}:{line}({name})"
+
+
+def area_times(stats):
+    """Own time in seconds per area, largest first"""
+    totals = {}
+    for function, (_, _, own_time, _, _) in stats.stats.items():
+        area = area_of(function)
+        totals[area] = totals.get(area, 0.0) + own_time
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,214 @@
+"""
+Fast read path for grocery item responses
+
+List and detail reads fetch plain rows with ``values_list`` and build the
+response dicts directly, skipping model instances and the DRF field
+machinery. The output matches ``GroceryItemSerializer`` exactly.
+
+``GroceryItemJSONRenderer`` encodes with orjson when it is installed and
+falls back to DRF's JSONRenderer otherwise; both produce the same bytes.
+
+Clients that ask for ``application/vnd.grocery.columns+json`` (or
+``application/msgpack`` when msgpack is installed) get item lists in
+columnar form instead: one array per field rather than one object per row.
+
+With ``fields`` (API field names, see ``ITEM_FIELDS``) only those columns
+are selected and only those keys are sent.
+
+``EXPORT_RENDERERS`` name the formats of the streamed export (see
+transfer.py) for content negotiation.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import timed
+
+try:
+    import orjson
+    # Let DRF's encoder format dates so the output matches the fallback
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+# Columns needed to render an item, in GroceryItemSerializer field order
+ITEM_COLUMNS = ('id', 'name', 'bought', 'created_at')
+# API field name -> column, in the same order
+ITEM_FIELDS = dict(zip(('id', 'name', 'bought', 'createdAt'), ITEM_COLUMNS))
+
+
+def format_timestamp(value):
+    """Format a datetime the way GroceryItemSerializer does (Z for UTC)"""
+    return value.isoformat().replace('+00:00', 'Z')
+
+
+def item_rows(queryset, *extra, fields=None):
+    """
+    Return the queryset as named rows of ITEM_COLUMNS (plus ``extra``), or
+    of just the columns behind the API ``fields`` when given
+    """
+    columns = ITEM_COLUMNS if fields is None else tuple(ITEM_FIELDS[field] for field in fields)
+    return queryset.values_list(
+        *columns, *(column for column in extra if column not in columns), named=True
+    )
+
+
+def _format_field(field, value):
+    if field == 'id':
+        return str(value)
+    if field == 'createdAt':
+        return format_timestamp(value)
+    return value
+
+
+def item_dict(row):
+    """Build the API representation of one row from ``item_rows``"""
+    with timed('serialize'):
+        return {
+            'id': str(row.id),
+            'name': row.name,
+            'bought': row.bought,
+            'createdAt': format_timestamp(row.created_at),
+        }
+
+
+def item_dicts(rows, fields=None):
+    """Build the API representation of many rows from ``item_rows``"""
+    with timed('serialize'):
+        if fields is not None:
+            return [
+                {field: _format_field(field, getattr(row, ITEM_FIELDS[field])) for field in fields}
+                for row in rows
+            ]
+        return [
+            {
+                'id': str(pk),
+                'name': name,
+                'bought': bought,
+                'createdAt': format_timestamp(created_at),
+            }
+            for pk, name, bought, created_at, *_ in rows
+        ]
+
+
+def item_columns(rows, fields=None):
+    """
+    Build the columnar representation of many rows from ``item_rows``
+
+    {"id": [...], "name": [...], "bought": [...], "createdAt": [...]}, with
+    the i-th entry of each array describing the i-th item. Transposing the
+    rows is cheaper than building a dict per item, and the keys are sent
+    once instead of once per row.
+    """
+    with timed('serialize'):
+        if fields is not None:
+            rows = list(rows)
+            return {
+                field: [_format_field(field, getattr(row, ITEM_FIELDS[field])) for row in rows]
+                for field in fields
+            }
+        columns = list(zip(*rows)) or [()] * len(ITEM_COLUMNS)
+        return {
+            'id': [str(pk) for pk in columns[0]],
+            'name': list(columns[1]),
+            'bought': list(columns[2]),
+            'createdAt': [format_timestamp(value) for value in columns[3]],
+        }
+
+
+class GroceryItemJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that uses orjson for compact output when available
+
+    Anything orjson would format differently from DRF (dates, decimals,
+    lazy strings) is handed to DRF's encoder, and U+2028/U+2029
+    are escaped as DRF does, so the bytes are identical either way.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('serialize'):
+            return self.encode(data, accepted_media_type, renderer_context)
+
+    def encode(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=ORJSON_OPTIONS
+            )
+        except (TypeError, orjson.JSONEncodeError):
+            # e.g. non-string keys or integers wider than 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class GroceryItemColumnsRenderer(GroceryItemJSONRenderer):
+    """JSON for clients that asked for columnar item lists"""
+
+    media_type = 'application/vnd.grocery.columns+json'
+    format = 'columns'
+    columnar = True
+
+
+class GroceryItemMessagePackRenderer(BaseRenderer):
+    """MessagePack encoding of the columnar representation"""
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    columnar = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        with timed('serialize'):
+            return msgpack.packb(data, default=JSONEncoder().default)
+
+
+# Offered by the item endpoints after plain JSON, in order of preference
+COLUMNAR_RENDERERS = [GroceryItemColumnsRenderer]
+if msgpack is not None:
+    COLUMNAR_RENDERERS.append(GroceryItemMessagePackRenderer)
+
+
+class ItemExportRenderer(GroceryItemJSONRenderer):
+    """
+    An export format, chosen by ``?format=`` or Accept
+
+    The export itself is a StreamingHttpResponse written by transfer.py; the
+    only Responses rendered here are errors, which are sent as JSON.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return super().render(data, 'application/json', renderer_context)
+
+
+class ItemNDJSONRenderer(ItemExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class ItemCSVRenderer(ItemExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+# NDJSON first, so it is the default
+EXPORT_RENDERERS = [ItemNDJSONRenderer, ItemCSVRenderer]
@@ -1,5 +1,16 @@
 from rest_framework import serializers
-from .models import GroceryItem
+from .models import GroceryItem, GroceryList
+
+
+def validate_item_name(value):
+    """Return the stripped name, or raise ValidationError; shared with imports"""
+    if not value or not value.strip():
+        raise serializers.ValidationError("Name cannot be empty")
+    
+    if len(value.strip()) > 100:
+        raise serializers.ValidationError("Name cannot exceed 100 characters")
+    
+    return value.strip()
 
 
 class GroceryItemSerializer(serializers.ModelSerializer):
@@ -15,13 +26,7 @@ class GroceryItemSerializer(serializers.ModelSerializer):
     
     def validate_name(self, value):
         """Validate name field"""
-        if not value or not value.strip():
-            raise serializers.ValidationError("Name cannot be empty")
-        
-        if len(value.strip()) > 100:
-            raise serializers.ValidationError("Name cannot exceed 100 characters")
-        
-        return value.strip()
+        return validate_item_name(value)
     
     def validate_bought(self, value):
         """Validate bought field"""
@@ -59,13 +64,7 @@ class GroceryItemCreateSerializer(serializers.ModelSerializer):
     
     def validate_name(self, value):
         """Validate name field"""
-        if not value or not value.strip():
-            raise serializers.ValidationError("Name cannot be empty")
-        
-        if len(value.strip()) > 100:
-            raise serializers.ValidationError("Name cannot exceed 100 characters")
-        
-        return value.strip()
+        return validate_item_name(value)
     
     def create(self, validated_data):
         """Create a new grocery item with default bought=False"""
@@ -93,4 +92,69 @@ class GroceryItemUpdateSerializer(serializers.ModelSerializer):
         """Update only the bought field"""
         instance.bought = validated_data.get('bought', instance.bought)
         instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+
+class StrictBooleanField(serializers.BooleanField):
+    """BooleanField that only accepts real JSON booleans"""
+    
+    def to_internal_value(self, data):
+        if not isinstance(data, bool):
+            raise serializers.ValidationError("Bought field must be a boolean value")
+        return data
+
+
+class GroceryItemBulkUpdateSerializer(serializers.Serializer):
+    """Serializer for one entry of a bulk update - id plus bought field"""
+    
+    id = serializers.UUIDField()
+    bought = StrictBooleanField(required=True)
+
+
+class GroceryItemBulkDeleteSerializer(serializers.Serializer):
+    """Serializer for a bulk delete request body - a list of item ids"""
+    
+    ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False
+    )
+
+
+class GroceryItemOperationSerializer(serializers.Serializer):
+    """
+    Serializer for one queued offline write in a replay batch
+    
+    ``name`` and ``bought`` are checked by the create and update serializers
+    when the operation runs, so their errors are reported per operation.
+    """
+    
+    OPERATIONS = ('create', 'update', 'delete')
+    
+    key = serializers.CharField(max_length=255)
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    id = serializers.UUIDField(required=False)
+    name = serializers.JSONField(required=False)
+    bought = serializers.JSONField(required=False)
+    
+    def validate(self, attrs):
+        if attrs['op'] != 'create' and 'id' not in attrs:
+            raise serializers.ValidationError({"id": ["This field is required."]})
+        return attrs
+
+
+class GroceryListSerializer(serializers.ModelSerializer):
+    """Serializer for GroceryList model"""
+    
+    createdAt = serializers.DateTimeField(source='created_at', read_only=True)
+    
+    class Meta:
+        model = GroceryList
+        fields = ['id', 'name', 'createdAt']
+        read_only_fields = ['id', 'createdAt']
+    
+    def validate_name(self, value):
+        """Validate name field"""
+        if not value or not value.strip():
+            raise serializers.ValidationError("Name cannot be empty")
+        
+        return value.strip()
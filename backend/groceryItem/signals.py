@@ -0,0 +1,160 @@
+"""
+Signal receivers that fan grocery item writes out to the change feed,
+invalidate the cached item list, keep GroceryItemStats and the
+GroceryItemName history current, log purchases and leave
+GroceryItemTombstones for delta sync
+
+Single-row writes and deletes arrive through post_save / post_delete.
+``bulk_create``, ``QuerySet.update`` and ``delete_returning`` bypass those,
+so the bulk endpoints send ``bulk_items_changed`` instead.
+Events are published only once the surrounding transaction commits;
+counters are updated immediately, inside that transaction.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from . import cache, events, rendering
+from .models import (
+    GroceryItem,
+    GroceryItemName,
+    GroceryItemPurchase,
+    GroceryItemStats,
+    GroceryItemTombstone,
+    GroceryList,
+)
+
+# Sent by bulk write paths with grocery_list_id plus created=[items],
+# updated=[items] and/or deleted=[item ids]; updates and deletes also pass
+# bought_delta, the net change in bought, and updates newly_bought, the
+# updated items that were not bought before. log_purchases=False keeps the
+# changes out of the purchase log (imports restore items, nobody bought them)
+bulk_items_changed = Signal()
+
+
+def _item_payload(item):
+    # Same dict as GroceryItemSerializer, without its per-call field setup,
+    # which dominated bulk writes and imports
+    return rendering.item_dict(item)
+
+
+def _publish_on_commit(event_type, data, grocery_list_id):
+    transaction.on_commit(lambda: events.publish(event_type, data, grocery_list_id))
+
+
+@receiver(post_save, sender=GroceryItem, dispatch_uid='grocery_item_saved_event')
+def publish_item_saved(sender, instance, created, **kwargs):
+    cache.invalidate(instance.grocery_list_id)
+    event_type = events.EVENT_CREATED if created else events.EVENT_UPDATED
+    _publish_on_commit(event_type, _item_payload(instance), instance.grocery_list_id)
+
+
+@receiver(post_delete, sender=GroceryItem, dispatch_uid='grocery_item_deleted_event')
+def publish_item_deleted(sender, instance, **kwargs):
+    cache.invalidate(instance.grocery_list_id)
+    _publish_on_commit(
+        events.EVENT_DELETED, {'id': str(instance.pk)}, instance.grocery_list_id
+    )
+
+
+@receiver(bulk_items_changed, dispatch_uid='grocery_items_bulk_event')
+def publish_bulk_changes(
+    sender, grocery_list_id, created=(), updated=(), deleted=(), **kwargs
+):
+    cache.invalidate(grocery_list_id)
+    for item in created:
+        _publish_on_commit(events.EVENT_CREATED, _item_payload(item), grocery_list_id)
+    for item in updated:
+        _publish_on_commit(events.EVENT_UPDATED, _item_payload(item), grocery_list_id)
+    for pk in deleted:
+        _publish_on_commit(events.EVENT_DELETED, {'id': str(pk)}, grocery_list_id)
+
+
+@receiver(post_save, sender=GroceryItem, dispatch_uid='grocery_item_saved_stats')
+def count_item_saved(sender, instance, created, **kwargs):
+    grocery_list_id = instance.grocery_list_id
+    if created:
+        GroceryItemStats.apply(grocery_list_id, total=1, bought=int(instance.bought))
+        return
+    previous = getattr(instance, '_loaded_bought', None)
+    if previous is None:
+        # Saved without being loaded first, so the old value is unknown
+        GroceryItemStats.recount(grocery_list_id)
+    elif previous != instance.bought:
+        GroceryItemStats.apply(grocery_list_id, bought=1 if instance.bought else -1)
+
+
+@receiver(post_delete, sender=GroceryItem, dispatch_uid='grocery_item_deleted_stats')
+def count_item_deleted(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, GroceryList):
+        # The whole list is going, and its counters row with it
+        return
+    GroceryItemStats.apply(
+        instance.grocery_list_id, total=-1, bought=-int(instance.bought)
+    )
+
+
+@receiver(bulk_items_changed, dispatch_uid='grocery_items_bulk_stats')
+def count_bulk_changes(
+    sender, grocery_list_id, created=(), deleted=(), bought_delta=0, **kwargs
+):
+    GroceryItemStats.apply(
+        grocery_list_id,
+        total=len(created) - len(deleted),
+        bought=sum(item.bought for item in created) + bought_delta
+    )
+
+
+@receiver(post_save, sender=GroceryItem, dispatch_uid='grocery_item_saved_name')
+def record_item_name(sender, instance, created, **kwargs):
+    if created:
+        GroceryItemName.record(instance.grocery_list_id, [instance])
+
+
+@receiver(bulk_items_changed, dispatch_uid='grocery_items_bulk_name')
+def record_bulk_names(sender, grocery_list_id, created=(), **kwargs):
+    GroceryItemName.record(grocery_list_id, created)
+
+
+@receiver(post_save, sender=GroceryItem, dispatch_uid='grocery_item_saved_purchase')
+def record_item_purchase(sender, instance, created, **kwargs):
+    # Unknown when saved without being loaded first, like for the stats
+    was_bought = False if created else getattr(instance, '_loaded_bought', None)
+    if instance.bought and was_bought is False:
+        GroceryItemPurchase.record(instance.grocery_list_id, [instance])
+
+
+@receiver(bulk_items_changed, dispatch_uid='grocery_items_bulk_purchase')
+def record_bulk_purchases(
+    sender, grocery_list_id, created=(), newly_bought=(), log_purchases=True, **kwargs
+):
+    if not log_purchases:
+        return
+    GroceryItemPurchase.record(
+        grocery_list_id, [item for item in created if item.bought] + list(newly_bought)
+    )
+
+
+@receiver(post_delete, sender=GroceryItem, dispatch_uid='grocery_item_deleted_tombstone')
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, GroceryList):
+        # Tombstones would go with the list anyway
+        return
+    GroceryItemTombstone.objects.create(
+        id=instance.pk,
+        grocery_list_id=instance.grocery_list_id,
+        change_seq=GroceryList.next_change_seq(instance.grocery_list_id)
+    )
+
+
+@receiver(bulk_items_changed, dispatch_uid='grocery_items_bulk_tombstone')
+def record_bulk_tombstones(sender, grocery_list_id, deleted=(), **kwargs):
+    if not deleted:
+        return
+    # One reservation and one INSERT however many items went
+    last_seq = GroceryList.next_change_seq(grocery_list_id, count=len(deleted))
+    first_seq = last_seq - len(deleted) + 1
+    GroceryItemTombstone.objects.bulk_create([
+        GroceryItemTombstone(id=pk, grocery_list_id=grocery_list_id, change_seq=change_seq)
+        for change_seq, pk in enumerate(deleted, start=first_seq)
+    ])
@@ -1,13 +1,49 @@
+import asyncio
 import json
+import shutil
+import tempfile
 import uuid
 from datetime import datetime
-from django.test import TestCase
-from django.urls import reverse
+from io import StringIO
+from api import urls as api_urls
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import include, path, reverse
+from django.utils.http import http_date
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
+from unittest import skipIf
 from unittest.mock import patch
-from .models import GroceryItem 
+from rest_framework.renderers import JSONRenderer
+from .models import (
+    GroceryItem,
+    GroceryItemName,
+    GroceryItemPurchase,
+    GroceryItemPurchaseRollup,
+    GroceryItemStats,
+    GroceryItemTombstone,
+    GroceryList,
+    DEFAULT_LIST_ID,
+)
+from .serializers import GroceryItemSerializer
+from .conditional import item_validators
+from .events import (
+    CacheEventBackend,
+    LocalEventBackend,
+    get_event_backend,
+    reset_event_backend,
+)
+from .metrics import reset_registry, render_prometheus
+from .throttling import (
+    LocalBucketBackend,
+    LoadMonitor,
+    reset_bucket_backend,
+    reset_load_monitor,
+)
+from . import cache as list_cache
+from . import middleware, profiling, rendering, throttling
 
 
 class GroceryItemAPITestCase(APITestCase):
@@ -17,6 +53,8 @@ class GroceryItemAPITestCase(APITestCase):
         """Set up test data before each test method"""
         self.client = APIClient()
         self.list_url = reverse('groceryitem-list')  # Adjust URL name based on your URLconf
+        reset_bucket_backend()
+        reset_load_monitor()
         
         # Create test items
         self.item1 = GroceryItem.objects.create(
@@ -411,6 +449,2294 @@ class TestAPIPagination(GroceryItemAPITestCase):
         # Add specific pagination tests based on your setup
 
 
+class TestKeysetPagination(GroceryItemAPITestCase):
+    """Test opt-in keyset pagination on GET /items"""
+    
+    def _walk_pages(self, page_size):
+        """Follow next links until the last page and collect item ids"""
+        ids = []
+        url = f"{self.list_url}?page_size={page_size}"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), page_size)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+    
+    def test_unpaginated_by_default(self):
+        """Test that the list stays a plain array without pagination params"""
+        response = self.client.get(self.list_url)
+        
+        self.assertIsInstance(response.data, list)
+    
+    def test_walk_all_pages(self):
+        """Test that following cursors returns every item exactly once, in order"""
+        for i in range(20):
+            GroceryItem.objects.create(name=f"Test Item {i}")
+        
+        ids = self._walk_pages(page_size=7)
+        expected = [
+            str(pk) for pk in
+            GroceryItem.objects.order_by('created_at', 'id').values_list('id', flat=True)
+        ]
+        self.assertEqual(ids, expected)
+    
+    def test_ties_on_created_at_use_id(self):
+        """Test that rows sharing a created_at are neither skipped nor repeated"""
+        for i in range(10):
+            GroceryItem.objects.create(name=f"Test Item {i}")
+        GroceryItem.objects.update(created_at=timezone.now())
+        
+        ids = self._walk_pages(page_size=4)
+        self.assertEqual(len(ids), 13)
+        self.assertEqual(len(set(ids)), 13)
+    
+    def test_last_page_has_no_next(self):
+        """Test that a page holding the remaining rows has no next link"""
+        response = self.client.get(f"{self.list_url}?page_size=3")
+        
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNone(response.data['next'])
+    
+    def test_invalid_cursor(self):
+        """Test that a tampered cursor returns 404"""
+        response = self.client.get(f"{self.list_url}?cursor=not-a-cursor")
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestConditionalGet(GroceryItemAPITestCase):
+    """Test ETag / Last-Modified handling on GET /items and GET /items/{id}"""
+    
+    def test_list_sets_validators(self):
+        """Test that the list response carries an ETag but no Last-Modified"""
+        response = self.client.get(self.list_url)
+        
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+    
+    def test_list_ignores_if_modified_since(self):
+        """Test that deleting an older item is not hidden behind a 304"""
+        since = http_date(self.item3.updated_at.timestamp())
+        self.client.delete(self.detail_url_item1)
+        
+        response = self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE=since)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+    
+    def test_list_not_modified(self):
+        """Test that a matching If-None-Match returns 304 without serializing"""
+        etag = self.client.get(self.list_url)['ETag']
+        
+        with patch('groceryItem.views.GroceryItemSerializer.to_representation') as to_repr:
+            response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        to_repr.assert_not_called()
+    
+    def test_list_etag_changes_on_update_and_delete(self):
+        """Test that writes invalidate the list ETag"""
+        etag = self.client.get(self.list_url)['ETag']
+        
+        self.client.patch(self.detail_url_item1, {"bought": True}, format='json')
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        etag = response['ETag']
+        self.client.delete(self.detail_url_item2)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+    
+    def test_pages_have_distinct_etags(self):
+        """Test that different query strings get different validators"""
+        first = self.client.get(f"{self.list_url}?page_size=1")['ETag']
+        second = self.client.get(f"{self.list_url}?page_size=2")['ETag']
+        
+        self.assertNotEqual(first, second)
+    
+    def test_detail_not_modified(self):
+        """Test conditional GET on a single item"""
+        etag = self.client.get(self.detail_url_item1)['ETag']
+        
+        response = self.client.get(self.detail_url_item1, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        self.client.patch(self.detail_url_item1, {"bought": True}, format='json')
+        response = self.client.get(self.detail_url_item1, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['bought'])
+
+
+class TestBulkOperations(GroceryItemAPITestCase):
+    """Test POST/PATCH/DELETE /items/bulk endpoints"""
+    
+    def setUp(self):
+        super().setUp()
+        self.bulk_url = reverse('groceryitem-bulk')
+    
+    def test_bulk_create(self):
+        """Test creating many items in one request"""
+        data = [{"name": f"Recipe Item {i}"} for i in range(30)]
+        
+        # SAVEPOINT, change seq UPDATE ... RETURNING, one INSERT, one stats
+        # UPDATE, name history SELECT, SAVEPOINT, two INSERTs, RELEASE; RELEASE
+        with self.assertNumQueries(10):
+            response = self.client.post(self.bulk_url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 30)
+        self.assertTrue(all(item['bought'] is False for item in response.data))
+        self.assertEqual(GroceryItem.objects.count(), 33)
+    
+    def test_bulk_create_reports_errors_by_position(self):
+        """Test that one invalid entry rejects the batch with per-item errors"""
+        data = [{"name": "Eggs"}, {"name": ""}, {"name": "Flour"}]
+        
+        response = self.client.post(self.bulk_url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('name', response.data[1])
+        self.assertEqual(GroceryItem.objects.count(), 3)
+    
+    def test_bulk_create_requires_list(self):
+        """Test that a non-list body returns 400"""
+        response = self.client.post(self.bulk_url, {"name": "Eggs"}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_bulk_update(self):
+        """Test updating many items with a constant number of queries"""
+        data = [
+            {"id": str(self.item1.id), "bought": True},
+            {"id": str(self.item2.id), "bought": False},
+        ]
+        
+        # SAVEPOINT, SELECT ids, change seq UPDATE ... RETURNING, one UPDATE,
+        # SELECT rows, purchase INSERT, rollup SELECT + SAVEPOINT, INSERT,
+        # RELEASE; RELEASE
+        with self.assertNumQueries(11):
+            response = self.client.patch(self.bulk_url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.item1.refresh_from_db()
+        self.item2.refresh_from_db()
+        self.assertTrue(self.item1.bought)
+        self.assertFalse(self.item2.bought)
+    
+    def test_bulk_update_unknown_id(self):
+        """Test that an unknown id rejects the whole batch"""
+        data = [
+            {"id": str(self.item1.id), "bought": True},
+            {"id": str(uuid.uuid4()), "bought": True},
+        ]
+        
+        response = self.client.patch(self.bulk_url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.item1.refresh_from_db()
+        self.assertFalse(self.item1.bought)
+    
+    def test_bulk_update_rejects_non_boolean(self):
+        """Test that bought must be a real boolean"""
+        data = [{"id": str(self.item1.id), "bought": "true"}]
+        
+        response = self.client.patch(self.bulk_url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_bulk_delete_by_ids(self):
+        """Test deleting a list of ids"""
+        data = {"ids": [str(self.item1.id), str(self.item3.id)]}
+        
+        response = self.client.delete(self.bulk_url, data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deleted'], 2)
+        self.assertEqual(list(GroceryItem.objects.all()), [self.item2])
+    
+    def test_bulk_delete_bought(self):
+        """Test clearing every bought item"""
+        response = self.client.delete(f"{self.bulk_url}?bought=true")
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deleted'], 1)
+        self.assertFalse(GroceryItem.objects.filter(bought=True).exists())
+    
+    def test_bulk_delete_updates_stats_once(self):
+        """Test that a bulk delete applies one stats delta for all its rows"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        GroceryItem.objects.bulk_create([
+            GroceryItem(name=f"Item {i}", bought=i % 2 == 0) for i in range(50)
+        ])
+        GroceryItemStats.recount(DEFAULT_LIST_ID)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f"{self.bulk_url}?bought=true")
+        
+        self.assertEqual(response.data['deleted'], 26)
+        stats_updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "groceryItem_groceryitemstats"')
+        ]
+        self.assertEqual(len(stats_updates), 1)
+        stats = self.client.get(reverse('groceryitem-stats')).json()
+        self.assertEqual((stats['total'], stats['bought']), (27, 0))
+    
+    def test_bulk_delete_queries_do_not_grow_with_batch(self):
+        """Test that deleting 50 items takes as many queries as deleting 5"""
+        changes_url = reverse('groceryitem-changes')
+        GroceryItem.objects.all().delete()
+        since = self.client.get(changes_url, {'since': 0}).data['seq']
+        
+        for size in (5, 50):
+            with self.subTest(size=size):
+                GroceryItem.objects.bulk_create([
+                    GroceryItem(name=f"Item {i}", bought=True) for i in range(size)
+                ])
+                GroceryItemStats.recount(DEFAULT_LIST_ID)
+                # SAVEPOINT, DELETE ... RETURNING, stats UPDATE, change seq
+                # UPDATE ... RETURNING, tombstone INSERT, RELEASE
+                with self.assertNumQueries(6):
+                    response = self.client.delete(f"{self.bulk_url}?bought=true")
+                self.assertEqual(response.data['deleted'], size)
+        
+        changes = self.client.get(changes_url, {'since': since}).data
+        self.assertEqual(len(changes['deletes']), 55)
+        self.assertEqual(GroceryItemTombstone.objects.count(), 58)
+        self.assertEqual(
+            GroceryItemTombstone.objects.values('change_seq').distinct().count(), 58
+        )
+    
+    def test_bulk_delete_requires_ids(self):
+        """Test that a delete without ids or filter returns 400"""
+        response = self.client.delete(self.bulk_url, {}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestChangeFeed(GroceryItemAPITestCase):
+    """Test change events and the GET /items/stream SSE endpoint"""
+    
+    def setUp(self):
+        reset_event_backend()
+        super().setUp()
+        self.backend = get_event_backend()
+        self.stream_url = reverse('groceryitem-stream')
+    
+    def test_create_publishes_event_on_commit(self):
+        """Test that creating an item publishes a created event"""
+        token = self.backend.current_token()
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.list_url, {"name": "Greek Yogurt"}, format='json')
+        
+        events = self.backend.events_since(token)
+        self.assertEqual([event['type'] for event in events], ['created'])
+        self.assertEqual(events[0]['data']['name'], "Greek Yogurt")
+    
+    def test_update_and_delete_publish_events(self):
+        """Test that PATCH and DELETE publish deltas"""
+        token = self.backend.current_token()
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.detail_url_item1, {"bought": True}, format='json')
+            self.client.delete(self.detail_url_item2)
+        
+        events = self.backend.events_since(token)
+        self.assertEqual([event['type'] for event in events], ['updated', 'deleted'])
+        self.assertTrue(events[0]['data']['bought'])
+        self.assertEqual(events[1]['data'], {'id': str(self.item2.id)})
+    
+    def test_bulk_paths_publish_events(self):
+        """Test that bulk writes publish one event per item"""
+        token = self.backend.current_token()
+        bulk_url = reverse('groceryitem-bulk')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(bulk_url, [{"name": "Eggs"}, {"name": "Flour"}], format='json')
+            self.client.delete(f"{bulk_url}?bought=true")
+        
+        events = self.backend.events_since(token)
+        self.assertEqual(
+            [event['type'] for event in events],
+            ['created', 'created', 'deleted']
+        )
+        self.assertEqual(events[2]['data'], {'id': str(self.item2.id)})
+    
+    def test_unknown_token_cannot_resume(self):
+        """Test that a foreign or stale token asks the client to resync"""
+        self.assertIsNone(self.backend.events_since('deadbeef-1'))
+        self.assertEqual(self.backend.events_since(self.backend.current_token()), [])
+    
+    def test_stream_requires_asgi(self):
+        """Test that the stream refuses to run under WSGI"""
+        response = self.client.get(self.stream_url)
+        
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+    
+    async def test_stream_resumes_from_last_event_id(self):
+        """Test that a reconnecting client only receives missed events"""
+        first = self.backend.publish('created', {'id': 'a'}, DEFAULT_LIST_ID)
+        self.backend.publish('updated', {'id': 'a'}, DEFAULT_LIST_ID)
+        
+        response = await self.async_client.get(
+            self.stream_url, headers={'Last-Event-ID': first['id']}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b"retry: 3000\n\n")
+        frame = (await anext(chunks)).decode()
+        self.assertIn("event: updated", frame)
+        
+        self.backend.publish('deleted', {'id': 'a'}, DEFAULT_LIST_ID)
+        frame = (await anext(chunks)).decode()
+        self.assertIn("event: deleted", frame)
+        await chunks.aclose()
+    
+    async def test_stream_without_token_sends_reset(self):
+        """Test that a fresh client is told to load the full list first"""
+        response = await self.async_client.get(self.stream_url)
+        
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)
+        frame = (await anext(chunks)).decode()
+        self.assertIn("event: reset", frame)
+        await chunks.aclose()
+
+    
+    async def test_local_backend_is_per_process(self):
+        """Test that LocalEventBackend does not reach another worker's streams"""
+        worker_a, worker_b = LocalEventBackend(), LocalEventBackend()
+        subscription = worker_b.subscribe()
+        token = worker_a.current_token()
+        
+        worker_a.publish('created', {'id': 'a'}, DEFAULT_LIST_ID)
+        await asyncio.sleep(0.05)
+        
+        self.assertTrue(subscription.queue.empty())
+        self.assertIsNone(worker_b.events_since(token))
+        worker_b.unsubscribe(subscription)
+    
+    async def test_cache_backend_shares_events_between_workers(self):
+        """Test that CacheEventBackend streams events published by another worker"""
+        worker_a = CacheEventBackend(poll_interval=0.01)
+        worker_b = CacheEventBackend(poll_interval=0.01)
+        subscription = worker_b.subscribe()
+        token = worker_b.current_token()
+        
+        published = worker_a.publish('created', {'id': 'a'}, DEFAULT_LIST_ID)
+        received = await asyncio.wait_for(subscription.get(), timeout=2)
+        
+        self.assertEqual(received, published)
+        self.assertEqual(worker_b.events_since(token), [published])
+        self.assertEqual(worker_b.events_since(worker_a.current_token()), [])
+        self.assertIsNone(worker_b.events_since('deadbeef-1'))
+        worker_b.unsubscribe(subscription)
+    
+    async def test_cache_backend_resets_streams_that_lost_events(self):
+        """Test that an event evicted before it was read makes streams resync"""
+        worker_a = CacheEventBackend(poll_interval=0.01)
+        worker_b = CacheEventBackend(poll_interval=0.01)
+        subscription = worker_b.subscribe()
+        token = worker_b.current_token()
+        with patch.object(worker_a.cache, 'set'):
+            worker_a.publish('created', {'id': 'a'}, DEFAULT_LIST_ID)
+        
+        for _ in range(100):
+            if subscription.overflowed:
+                break
+            await asyncio.sleep(0.01)
+        
+        self.assertTrue(subscription.overflowed)
+        self.assertIsNone(worker_b.events_since(token))
+        worker_b.unsubscribe(subscription)
+
+class TestQueryIndexes(GroceryItemAPITestCase):
+    """Test the index-backed query shapes and the explain_queries command"""
+    
+    def test_name_startswith_is_case_insensitive(self):
+        """Test that prefix search ignores case"""
+        GroceryItem.objects.create(name="organic eggs")
+        
+        names = sorted(
+            GroceryItem.objects.name_startswith("ORGANIC").values_list('name', flat=True)
+        )
+        
+        self.assertEqual(names, ["Organic Milk", "organic eggs"])
+        self.assertEqual(GroceryItem.objects.name_startswith("").count(), 4)
+    
+    def test_explain_queries_uses_indexes(self):
+        """Test that every hot query is planned with its index"""
+        out = StringIO()
+        
+        call_command('explain_queries', stdout=out)
+        
+        self.assertNotIn("MISSING", out.getvalue())
+        self.assertEqual(out.getvalue().count("OK"), 11)
+
+
+class TestFastReadPath(GroceryItemAPITestCase):
+    """Test that list and detail output matches GroceryItemSerializer byte for byte"""
+    
+    def setUp(self):
+        super().setUp()
+        GroceryItem.objects.create(name="Crème fraîche \u2028 \"half\" fat")
+    
+    def expected_bytes(self, data):
+        return JSONRenderer().render(data)
+    
+    def assert_matches_serializer(self):
+        items = GroceryItem.objects.order_by('created_at')
+        
+        response = self.client.get(self.list_url)
+        self.assertEqual(
+            response.content,
+            self.expected_bytes(GroceryItemSerializer(items, many=True).data)
+        )
+        
+        response = self.client.get(self.detail_url_item1)
+        self.assertEqual(
+            response.content,
+            self.expected_bytes(GroceryItemSerializer(self.item1).data)
+        )
+        
+        response = self.client.get(self.list_url, {'page_size': 2})
+        self.assertEqual(
+            json.loads(response.content)['results'],
+            GroceryItemSerializer(items[:2], many=True).data
+        )
+    
+    def test_output_matches_serializer(self):
+        """Test the default encoder path"""
+        self.assert_matches_serializer()
+    
+    def test_output_matches_serializer_without_orjson(self):
+        """Test the stdlib json fallback"""
+        with patch('groceryItem.rendering.orjson', None):
+            self.assert_matches_serializer()
+    
+    def test_list_skips_model_instances(self):
+        """Test that the list is built without instantiating models"""
+        with patch.object(GroceryItem, 'from_db') as from_db:
+            response = self.client.get(self.list_url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        from_db.assert_not_called()
+
+
+class TestBenchmarkHarness(TestCase):
+    """Test the bench_items harness on a tiny in-process run"""
+    
+    def test_run_reports_every_operation(self):
+        """Test that one run times each operation and leaves the size unchanged"""
+        from .management.commands.bench_items import ClientTransport, ItemBenchmark
+        
+        benchmark = ItemBenchmark(requests=4, list_requests=2)
+        benchmark.seed(10)
+        
+        results = benchmark.run(ClientTransport(), size=10, concurrency=1)
+        
+        self.assertEqual(
+            [result['operation'] for result in results],
+            ['create', 'retrieve', 'patch', 'list', 'delete']
+        )
+        for result in results:
+            self.assertEqual(result['errors'], 0)
+            self.assertIn('p99', result['latency_ms'])
+        self.assertEqual(GroceryItem.objects.count(), 10)
+    
+    def test_compare_flags_p95_regressions(self):
+        """Test that the baseline comparison only flags slower p95s"""
+        from .management.commands.bench_items import compare
+        
+        def result(p95):
+            return {
+                'transport': 'client', 'size': 10, 'operation': 'list',
+                'concurrency': 1, 'latency_ms': {'p95': p95},
+            }
+        
+        baseline = {'results': [result(10.0)]}
+        
+        self.assertEqual(compare([result(11.0)], baseline, 0.2), [])
+        self.assertEqual(len(compare([result(13.0)], baseline, 0.2)), 1)
+
+
+class TestRequestMetrics(GroceryItemAPITestCase):
+    """Test the Server-Timing header and the /metrics endpoint"""
+    
+    def setUp(self):
+        reset_registry()
+        super().setUp()
+        self.metrics_url = reverse('metrics')
+    
+    def server_timing(self, response):
+        return dict(
+            entry.strip().split(';', 1) for entry in response['Server-Timing'].split(',')
+        )
+    
+    def test_server_timing_header(self):
+        """Test that responses carry db, serialize, view and total timings"""
+        response = self.client.get(self.list_url)
+        
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'db', 'serialize', 'view', 'total'})
+        self.assertIn('desc="2 queries"', timing['db'])
+    
+    def test_structured_log_line(self):
+        """Test that each request logs one JSON line"""
+        with self.assertLogs('groceryItem.metrics', level='INFO') as logs:
+            self.client.get(self.detail_url_item1)
+        
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'groceryitem-detail')
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(line['db_queries'], 1)
+    
+    def test_metrics_endpoint_requires_token_or_staff(self):
+        """Test that metrics are refused without the token or a staff login"""
+        from django.contrib.auth.models import User
+        
+        with override_settings(GROCERY_METRICS_TOKEN='scrape-secret'):
+            anonymous = self.client.get(self.metrics_url)
+            wrong = self.client.get(self.metrics_url, HTTP_AUTHORIZATION='Bearer guess')
+            self.client.force_login(User.objects.create(username='admin', is_staff=True))
+            staff = self.client.get(self.metrics_url)
+            self.client.logout()
+        with override_settings(GROCERY_METRICS_TOKEN=None):
+            # No token configured: an empty bearer must not match
+            empty = self.client.get(self.metrics_url, HTTP_AUTHORIZATION='Bearer ')
+        with override_settings(GROCERY_METRICS_PUBLIC=True):
+            public = self.client.get(self.metrics_url)
+        
+        for refused in (anonymous, wrong, empty):
+            self.assertEqual(refused.status_code, status.HTTP_403_FORBIDDEN)
+            self.assertIn('error', refused.json())
+        self.assertEqual(staff.status_code, status.HTTP_200_OK)
+        self.assertEqual(public.status_code, status.HTTP_200_OK)
+    
+    def test_metrics_endpoint_exposes_histograms(self):
+        """Test that aggregated metrics are served in Prometheus format"""
+        self.client.get(self.list_url)
+        self.client.get(self.list_url)
+        
+        with override_settings(GROCERY_METRICS_TOKEN='scrape-secret'):
+            response = self.client.get(
+                self.metrics_url, HTTP_AUTHORIZATION='Bearer scrape-secret'
+            )
+        body = response.content.decode()
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            'grocery_requests_total{view="groceryitem-list",method="GET",status="200"} 2',
+            body
+        )
+        self.assertIn(
+            'grocery_db_queries_bucket{view="groceryitem-list",method="GET",le="2"} 2',
+            body
+        )
+        self.assertIn('# TYPE grocery_request_duration_seconds histogram', body)
+
+
+class TestDatabaseProfile(GroceryItemAPITestCase):
+    """Test SQLite connection pragmas and the health endpoint"""
+    
+    def test_sqlite_pragmas_applied(self):
+        """Test that new SQLite connections get busy_timeout and synchronous"""
+        from django.db import connection
+        
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite only")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+    
+    def test_health_ok(self):
+        """Test that the health check reports the database"""
+        response = self.client.get(reverse('health'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['status'], 'ok')
+    
+    def test_health_reports_database_failure(self):
+        """Test that a failing database makes the health check return 503"""
+        with patch('groceryItem.views.connection.cursor', side_effect=Exception("down")):
+            response = self.client.get(reverse('health'))
+        
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class TestListCache(GroceryItemAPITestCase):
+    """Test the read-through item list cache and its invalidation"""
+    
+    def setUp(self):
+        reset_registry()
+        super().setUp()
+    
+    def test_repeat_list_served_from_cache(self):
+        """Test that an unchanged list is served without queries"""
+        first = self.client.get(self.list_url)
+        
+        with self.assertNumQueries(0):
+            second = self.client.get(self.list_url)
+        
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+    
+    def test_query_string_variants_cached_separately(self):
+        """Test that a page and the full list do not share an entry"""
+        self.client.get(self.list_url)
+        
+        response = self.client.get(self.list_url, {'page_size': 1})
+        
+        self.assertEqual(len(response.data['results']), 1)
+    
+    def test_single_and_bulk_writes_invalidate(self):
+        """Test that PATCH, DELETE and bulk writes are visible on the next read"""
+        self.client.get(self.list_url)
+        self.client.patch(self.detail_url_item1, {"bought": True}, format='json')
+        response = self.client.get(self.list_url)
+        self.assertTrue(response.data[0]['bought'])
+        
+        self.client.delete(self.detail_url_item2)
+        self.assertEqual(len(self.client.get(self.list_url).data), 2)
+        
+        self.client.patch(
+            reverse('groceryitem-bulk'),
+            [{"id": str(self.item1.id), "bought": False}],
+            format='json'
+        )
+        self.assertFalse(self.client.get(self.list_url).data[0]['bought'])
+    
+    def test_commit_discards_entries_cached_mid_transaction(self):
+        """Test that the on-commit bump orphans a racing reader's entry"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.patch(self.detail_url_item1, {"bought": True}, format='json')
+        
+        # A reader that saw the pre-commit snapshot after the first bump
+        request = self.client.get(self.list_url).wsgi_request
+        list_cache.set_entry(list_cache.list_key(request, DEFAULT_LIST_ID), ('"stale"', []))
+        
+        for callback in callbacks:
+            callback()
+        
+        response = self.client.get(self.list_url)
+        self.assertEqual(len(response.data), 3)
+    
+    def test_hit_and_miss_counters(self):
+        """Test that cache lookups are exported as metrics"""
+        self.client.get(self.list_url)
+        self.client.get(self.list_url)
+        
+        body = render_prometheus()
+        
+        self.assertIn('grocery_list_cache_requests_total{result="miss"} 1', body)
+        self.assertIn('grocery_list_cache_requests_total{result="hit"} 1', body)
+
+
+class TestItemStats(GroceryItemAPITestCase):
+    """Test GET /items/stats and the maintained counters"""
+    
+    def setUp(self):
+        super().setUp()
+        self.stats_url = reverse('groceryitem-stats')
+    
+    def assert_stats(self, total, bought):
+        response = self.client.get(self.stats_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {"total": total, "active": total - bought, "bought": bought}
+        )
+    
+    def test_stats_read_is_single_query(self):
+        """Test that stats come from the counters row, not a COUNT scan"""
+        self.assert_stats(3, 1)
+        
+        with self.assertNumQueries(1):
+            self.client.get(self.stats_url)
+    
+    def test_single_writes_update_counters(self):
+        """Test create, toggle, no-op PATCH and delete"""
+        self.client.post(self.list_url, {"name": "Eggs"}, format='json')
+        self.assert_stats(4, 1)
+        
+        self.client.patch(self.detail_url_item1, {"bought": True}, format='json')
+        self.client.patch(self.detail_url_item1, {"bought": True}, format='json')
+        self.assert_stats(4, 2)
+        
+        self.client.delete(self.detail_url_item2)
+        self.assert_stats(3, 1)
+    
+    def test_bulk_writes_update_counters(self):
+        """Test bulk create, update and delete"""
+        bulk_url = reverse('groceryitem-bulk')
+        
+        self.client.post(bulk_url, [{"name": "Eggs"}, {"name": "Flour"}], format='json')
+        self.assert_stats(5, 1)
+        
+        self.client.patch(bulk_url, [
+            {"id": str(self.item1.id), "bought": True},
+            {"id": str(self.item2.id), "bought": True},
+            {"id": str(self.item3.id), "bought": True},
+        ], format='json')
+        self.assert_stats(5, 3)
+        
+        self.client.delete(f"{bulk_url}?bought=true")
+        self.assert_stats(2, 0)
+    
+    def test_counter_rolls_back_with_write(self):
+        """Test that counters share the write's transaction"""
+        from django.db import transaction
+        
+        self.assert_stats(3, 1)
+        try:
+            with transaction.atomic():
+                GroceryItem.objects.create(name="Eggs")
+                raise RuntimeError("abort")
+        except RuntimeError:
+            pass
+        
+        self.assertEqual(GroceryItemStats.current(DEFAULT_LIST_ID).total, 3)
+
+
+class TestGroceryLists(GroceryItemAPITestCase):
+    """Test /lists/ and the list-scoped /lists/{id}/items/ routes"""
+    
+    def setUp(self):
+        reset_event_backend()
+        super().setUp()
+        self.other = GroceryList.objects.create(name="Flatmates")
+        self.other_item = GroceryItem.objects.create(
+            name="Coffee", grocery_list=self.other
+        )
+        self.other_list_url = reverse('listitem-list', kwargs={'list_pk': self.other.id})
+    
+    def test_legacy_routes_use_default_list(self):
+        """Test that /items/ only shows the default list's items"""
+        response = self.client.get(self.list_url)
+        
+        self.assertEqual(len(response.data), 3)
+        self.assertNotIn(str(self.other_item.id), [item['id'] for item in response.data])
+    
+    def test_nested_routes_are_scoped(self):
+        """Test list, create and detail under /lists/{id}/items/"""
+        response = self.client.get(self.other_list_url)
+        self.assertEqual([item['name'] for item in response.data], ["Coffee"])
+        
+        response = self.client.post(self.other_list_url, {"name": "Tea"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            GroceryItem.objects.get(pk=response.data['id']).grocery_list_id, self.other.id
+        )
+        
+        # Items of another list are not reachable through this one
+        foreign_url = reverse(
+            'listitem-detail', kwargs={'list_pk': self.other.id, 'pk': self.item1.id}
+        )
+        self.assertEqual(self.client.get(foreign_url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.patch(foreign_url, {"bought": True}, format='json').status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+    
+    def test_unknown_list_returns_404(self):
+        """Test that a missing or malformed list id is a 404"""
+        for list_pk in (uuid.uuid4(), 'not-a-uuid'):
+            with self.subTest(list_pk=list_pk):
+                response = self.client.get(f"/api/lists/{list_pk}/items/")
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+                self.assertEqual(response.data, {"error": "List not found"})
+    
+    def test_bulk_delete_is_scoped(self):
+        """Test that bulk delete by filter leaves other lists alone"""
+        bulk_url = reverse('listitem-bulk', kwargs={'list_pk': self.other.id})
+        
+        self.client.delete(f"{bulk_url}?bought=false")
+        
+        self.assertFalse(self.other.items.exists())
+        self.assertEqual(GroceryItem.objects.count(), 3)
+    
+    def test_stats_are_per_list(self):
+        """Test that each list has its own counters"""
+        stats_url = reverse('listitem-stats', kwargs={'list_pk': self.other.id})
+        
+        response = self.client.get(stats_url)
+        
+        self.assertEqual(response.data, {"total": 1, "active": 1, "bought": 0})
+        self.assertEqual(GroceryItemStats.current(DEFAULT_LIST_ID).total, 3)
+    
+    def test_write_only_invalidates_own_list_cache(self):
+        """Test that a write in one list keeps other lists' cache entries"""
+        self.client.get(self.list_url)
+        self.client.get(self.other_list_url)
+        
+        self.client.post(self.other_list_url, {"name": "Tea"}, format='json')
+        
+        with self.assertNumQueries(0):
+            self.client.get(self.list_url)
+        self.assertEqual(len(self.client.get(self.other_list_url).data), 2)
+    
+    def test_events_are_tagged_with_list(self):
+        """Test that change events carry their list id"""
+        token = get_event_backend().current_token()
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.other_list_url, {"name": "Tea"}, format='json')
+        
+        events = get_event_backend().events_since(token)
+        self.assertEqual([event['list'] for event in events], [str(self.other.id)])
+    
+    def test_create_and_delete_list(self):
+        """Test the /lists/ endpoints; deleting a list removes its items"""
+        response = self.client.post(reverse('grocerylist-list'), {"name": "Office"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['name'], "Office")
+        
+        response = self.client.delete(
+            reverse('grocerylist-detail', kwargs={'pk': self.other.id})
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(GroceryItem.objects.filter(pk=self.other_item.id).exists())
+    
+    def test_default_list_cannot_be_deleted(self):
+        """Test that the list behind the legacy /items/ routes is kept"""
+        response = self.client.delete(
+            reverse('grocerylist-detail', kwargs={'pk': DEFAULT_LIST_ID})
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data, {"error": "The default list cannot be deleted"})
+        self.assertTrue(GroceryList.objects.filter(pk=DEFAULT_LIST_ID).exists())
+        self.assertTrue(GroceryItem.objects.filter(pk=self.item1.id).exists())
+        response = self.client.post(self.list_url, {"name": "Eggs"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class TestDeltaSync(GroceryItemAPITestCase):
+    """Test GET /items/changes/ and delete tombstones"""
+    
+    def setUp(self):
+        super().setUp()
+        self.changes_url = reverse('groceryitem-changes')
+    
+    def sync(self, since):
+        response = self.client.get(self.changes_url, {'since': since})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+    
+    def test_first_sync_is_full_reset(self):
+        """Test that since=0 returns every item"""
+        data = self.sync(0)
+        
+        self.assertTrue(data['reset'])
+        self.assertEqual(len(data['upserts']), 3)
+        self.assertEqual(data['deletes'], [])
+    
+    def test_returns_only_later_writes_and_deletes(self):
+        """Test upserts and tombstones after a sync point"""
+        seq = self.sync(0)['seq']
+        
+        self.client.patch(self.detail_url_item1, {"bought": True}, format='json')
+        self.client.delete(self.detail_url_item2)
+        created = self.client.post(self.list_url, {"name": "Eggs"}, format='json').data
+        
+        data = self.sync(seq)
+        self.assertFalse(data['reset'])
+        self.assertEqual(
+            [item['id'] for item in data['upserts']], [str(self.item1.id), created['id']]
+        )
+        self.assertEqual(data['deletes'], [str(self.item2.id)])
+        self.assertGreater(data['seq'], seq)
+        
+        self.assertEqual(self.sync(data['seq'])['upserts'], [])
+    
+    def test_bulk_writes_are_tracked(self):
+        """Test that bulk create, update and delete show up"""
+        bulk_url = reverse('groceryitem-bulk')
+        seq = self.sync(0)['seq']
+        
+        self.client.post(bulk_url, [{"name": "Flour"}], format='json')
+        self.client.patch(bulk_url, [{"id": str(self.item3.id), "bought": True}], format='json')
+        self.client.delete(bulk_url, {"ids": [str(self.item1.id)]}, format='json')
+        
+        data = self.sync(seq)
+        self.assertEqual(
+            sorted(item['name'] for item in data['upserts']), ["Flour", "Fresh Apples"]
+        )
+        self.assertEqual(data['deletes'], [str(self.item1.id)])
+    
+    def test_compaction_forces_reset(self):
+        """Test that a cursor older than purged tombstones gets a full reload"""
+        seq = self.sync(0)['seq']
+        self.client.delete(self.detail_url_item1)
+        
+        call_command('compact_tombstones', days=0, stdout=StringIO())
+        
+        data = self.sync(seq)
+        self.assertTrue(data['reset'])
+        self.assertEqual(len(data['upserts']), 2)
+        self.assertFalse(self.sync(data['seq'])['reset'])
+    
+    def test_invalid_since(self):
+        """Test that since must be a non-negative integer"""
+        for since in ('-1', 'abc', '1.5'):
+            with self.subTest(since=since):
+                response = self.client.get(self.changes_url, {'since': since})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestIdempotentWrites(GroceryItemAPITestCase):
+    """Test Idempotency-Key handling and POST /items/replay/"""
+    
+    def setUp(self):
+        super().setUp()
+        self.replay_url = reverse('groceryitem-replay')
+    
+    def test_retried_create_does_not_duplicate(self):
+        """Test that a retried POST gets the first response back"""
+        headers = {'Idempotency-Key': 'create-eggs'}
+        
+        first = self.client.post(self.list_url, {"name": "Eggs"}, format='json', headers=headers)
+        second = self.client.post(self.list_url, {"name": "Eggs"}, format='json', headers=headers)
+        
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(GroceryItem.objects.filter(name="Eggs").count(), 1)
+    
+    def test_retried_delete_replays_204(self):
+        """Test that a retried DELETE does not turn into a 404"""
+        headers = {'Idempotency-Key': 'delete-milk'}
+        
+        self.client.delete(self.detail_url_item1, headers=headers)
+        response = self.client.delete(self.detail_url_item1, headers=headers)
+        
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+    
+    def test_key_reused_for_other_request(self):
+        """Test that a key cannot be reused for a different request"""
+        headers = {'Idempotency-Key': 'shared'}
+        self.client.patch(self.detail_url_item1, {"bought": True}, format='json', headers=headers)
+        
+        response = self.client.patch(
+            self.detail_url_item2, {"bought": False}, format='json', headers=headers
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertIn("error", response.data)
+    
+    def test_expired_key_runs_again(self):
+        """Test that keys stop applying after the TTL"""
+        headers = {'Idempotency-Key': 'old'}
+        self.client.post(self.list_url, {"name": "Eggs"}, format='json', headers=headers)
+        
+        with self.settings(GROCERY_IDEMPOTENCY_TTL=-1):
+            response = self.client.post(
+                self.list_url, {"name": "Eggs"}, format='json', headers=headers
+            )
+            call_command('purge_idempotency_keys', stdout=StringIO())
+        
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(GroceryItem.objects.filter(name="Eggs").count(), 2)
+    
+    def test_replay_applies_operations_in_order(self):
+        """Test a queued create, update and delete in one batch"""
+        operations = [
+            {"key": "op-1", "op": "create", "name": "Eggs"},
+            {"key": "op-2", "op": "update", "id": str(self.item1.id), "bought": True},
+            {"key": "op-3", "op": "delete", "id": str(self.item2.id)},
+            {"key": "op-4", "op": "delete", "id": str(uuid.uuid4())},
+        ]
+        
+        response = self.client.post(self.replay_url, operations, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [201, 200, 204, 404])
+        self.assertEqual(results[0]['body']['name'], "Eggs")
+        self.item1.refresh_from_db()
+        self.assertTrue(self.item1.bought)
+        self.assertFalse(GroceryItem.objects.filter(pk=self.item2.id).exists())
+    
+    def test_replayed_update_is_a_single_update(self):
+        """Test that a queued update writes like PATCH, with no read of the item"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        operations = [{"key": "op-1", "op": "update", "id": str(self.item1.id), "bought": True}]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.replay_url, operations, format='json')
+        
+        item_queries = [
+            query['sql'] for query in queries.captured_queries
+            if '"groceryItem_groceryitem"' in query['sql'].split(' WHERE ')[0]
+        ]
+        self.assertEqual(len(item_queries), 1)
+        self.assertTrue(item_queries[0].startswith('UPDATE'))
+        self.item1.refresh_from_db()
+        body = response.data['results'][0]['body']
+        self.assertEqual(body, GroceryItemSerializer(self.item1).data)
+        again = self.client.post(self.replay_url, operations, format='json')
+        self.assertEqual(again.data['results'][0]['body'], body)
+    
+    def test_replay_shares_keys_with_single_requests(self):
+        """Test that a batch skips writes that already went through"""
+        self.client.post(
+            self.list_url, {"name": "Eggs"}, format='json', headers={'Idempotency-Key': 'op-1'}
+        )
+        operations = [
+            {"key": "op-1", "op": "create", "name": "Eggs"},
+            {"key": "op-2", "op": "create", "name": "Flour"},
+        ]
+        
+        response = self.client.post(self.replay_url, operations, format='json')
+        again = self.client.post(self.replay_url, operations, format='json')
+        
+        self.assertEqual(
+            [result['replayed'] for result in response.data['results']], [True, False]
+        )
+        self.assertEqual(
+            [result['replayed'] for result in again.data['results']], [True, True]
+        )
+        self.assertEqual(GroceryItem.objects.filter(name__in=["Eggs", "Flour"]).count(), 2)
+    
+    def test_replay_rejects_malformed_operations(self):
+        """Test that the batch is validated before anything runs"""
+        operations = [
+            {"key": "op-1", "op": "create", "name": "Eggs"},
+            {"key": "op-2", "op": "update"},
+        ]
+        
+        response = self.client.post(self.replay_url, operations, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(GroceryItem.objects.filter(name="Eggs").exists())
+
+
+class TestWireFormats(GroceryItemAPITestCase):
+    """Test columnar representations and response compression"""
+    
+    COLUMNS = 'application/vnd.grocery.columns+json'
+    
+    def setUp(self):
+        super().setUp()
+        GroceryItem.objects.bulk_create(
+            GroceryItem(name=f"Bulk item {i}") for i in range(50)
+        )
+    
+    def test_columnar_list_matches_rows(self):
+        """Test that the columnar form carries the same items as the rows"""
+        rows = self.client.get(self.list_url).json()
+        
+        response = self.client.get(self.list_url, headers={'Accept': self.COLUMNS})
+        
+        self.assertEqual(response['Content-Type'], self.COLUMNS)
+        columns = response.json()
+        self.assertEqual(columns['id'], [row['id'] for row in rows])
+        self.assertEqual(columns['name'], [row['name'] for row in rows])
+        self.assertEqual(columns['bought'], [row['bought'] for row in rows])
+        self.assertEqual(columns['createdAt'], [row['createdAt'] for row in rows])
+    
+    def test_columnar_pages(self):
+        """Test that keyset pages put the columns under results"""
+        response = self.client.get(self.list_url, {'page_size': 2, 'format': 'columns'})
+        
+        self.assertEqual(len(response.json()['results']['id']), 2)
+        self.assertIsNotNone(response.json()['next'])
+    
+    def test_formats_have_distinct_validators(self):
+        """Test that each representation has its own ETag and cache entry"""
+        rows = self.client.get(self.list_url)
+        columns = self.client.get(self.list_url, headers={'Accept': self.COLUMNS})
+        
+        self.assertNotEqual(rows['ETag'], columns['ETag'])
+        self.assertIn('Accept', rows['Vary'])
+        cached = self.client.get(
+            self.list_url, headers={'Accept': self.COLUMNS, 'If-None-Match': columns['ETag']}
+        )
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    @skipIf(rendering.msgpack is None, "msgpack is not installed")
+    def test_msgpack_list(self):
+        """Test the MessagePack representation"""
+        response = self.client.get(self.list_url, headers={'Accept': 'application/msgpack'})
+        
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        columns = rendering.msgpack.unpackb(response.content)
+        self.assertEqual(len(columns['id']), 53)
+    
+    def test_gzip_list(self):
+        """Test that a large list is gzipped with a weak ETag"""
+        import gzip
+        
+        plain = self.client.get(self.list_url)
+        response = self.client.get(self.list_url, headers={'Accept-Encoding': 'gzip'})
+        
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content) / 3)
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        
+        cached = self.client.get(
+            self.list_url,
+            headers={'Accept-Encoding': 'gzip', 'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    @skipIf(middleware.brotli is None, "brotli is not installed")
+    def test_brotli_preferred(self):
+        """Test that brotli wins when the client accepts both"""
+        plain = self.client.get(self.list_url)
+        response = self.client.get(self.list_url, headers={'Accept-Encoding': 'gzip, br'})
+        
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(middleware.brotli.decompress(response.content), plain.content)
+    
+    def test_small_and_refused_responses_are_not_compressed(self):
+        """Test the size threshold and q=0 codings"""
+        small = self.client.get(self.detail_url_item1, headers={'Accept-Encoding': 'gzip'})
+        refused = self.client.get(
+            self.list_url, headers={'Accept-Encoding': 'gzip;q=0, br;q=0'}
+        )
+        
+        self.assertFalse(small.has_header('Content-Encoding'))
+        self.assertFalse(refused.has_header('Content-Encoding'))
+
+
+class AsyncURLConf:
+    """The API with GROCERY_ASYNC_VIEWS on"""
+    
+    urlpatterns = [path('api/', include(api_urls.async_item_patterns + api_urls.urlpatterns))]
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf)
+class TestAsyncViews(GroceryItemAPITestCase):
+    """Test the async item views against the viewset they replace"""
+    
+    COLUMNS = 'application/vnd.grocery.columns+json'
+    
+    async def viewset_get(self, url, **extra):
+        """GET through the sync viewset, bypassing the async routes"""
+        with override_settings(ROOT_URLCONF='backend.urls'):
+            response = await sync_to_async(self.client.get)(url, **extra)
+        list_cache.get_cache().clear()
+        return response
+    
+    async def test_list_matches_viewset(self):
+        """Test that the async list sends the same bytes as the viewset"""
+        for accept in ('application/json', self.COLUMNS):
+            expected = await self.viewset_get(self.list_url, headers={'Accept': accept})
+            
+            response = await self.async_client.get(self.list_url, headers={'Accept': accept})
+            
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Type'], accept)
+            self.assertEqual(response.content, expected.content)
+            self.assertEqual(response['ETag'], expected['ETag'])
+            self.assertIn('Accept', response['Vary'])
+    
+    async def test_list_pages_and_not_modified(self):
+        """Test keyset pages and If-None-Match on the async list"""
+        page = await self.async_client.get(self.list_url, {'page_size': 2})
+        self.assertEqual(len(page.json()['results']), 2)
+        self.assertIsNotNone(page.json()['next'])
+        
+        bad = await self.async_client.get(self.list_url, {'page_size': 2, 'cursor': 'junk'})
+        self.assertEqual(bad.status_code, status.HTTP_404_NOT_FOUND)
+        
+        response = await self.async_client.get(self.list_url)
+        cached = await self.async_client.get(
+            self.list_url, headers={'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    async def test_retrieve_matches_viewset(self):
+        """Test that retrieve sends the viewset's bytes and validators"""
+        expected = await self.viewset_get(self.detail_url_item1)
+        
+        response = await self.async_client.get(self.detail_url_item1)
+        
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response['ETag'], expected['ETag'])
+        missing = await self.async_client.get(
+            reverse('groceryitem-detail', kwargs={'pk': uuid.uuid4()})
+        )
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(missing.json(), {"error": "Item not found"})
+    
+    async def test_create_update_delete(self):
+        """Test that async writes keep stats and tombstones in step"""
+        created = await self.async_client.post(
+            self.list_url, {"name": "Eggs"}, content_type='application/json'
+        )
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(created.json()['bought'])
+        url = reverse('groceryitem-detail', kwargs={'pk': created.json()['id']})
+        
+        updated = await self.async_client.patch(
+            url, {"bought": True}, content_type='application/json'
+        )
+        self.assertTrue(updated.json()['bought'])
+        
+        invalid = await self.async_client.post(
+            self.list_url, {"name": ""}, content_type='application/json'
+        )
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        deleted = await self.async_client.delete(url)
+        self.assertEqual(deleted.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(
+            await GroceryItemTombstone.objects.filter(pk=created.json()['id']).aexists()
+        )
+        stats = await sync_to_async(GroceryItemStats.current)(DEFAULT_LIST_ID)
+        self.assertEqual((stats.total, stats.bought), (3, 1))
+    
+    async def test_list_scoped_routes(self):
+        """Test that list routes are scoped and unknown lists are 404s"""
+        grocery_list = await GroceryList.objects.acreate(name="Party")
+        url = reverse('listitem-list', kwargs={'list_pk': grocery_list.pk})
+        
+        await self.async_client.post(url, {"name": "Cake"}, content_type='application/json')
+        response = await self.async_client.get(url)
+        
+        self.assertEqual([item['name'] for item in response.json()], ["Cake"])
+        missing = await self.async_client.get(
+            reverse('listitem-list', kwargs={'list_pk': uuid.uuid4()})
+        )
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(missing.json(), {"error": "List not found"})
+    
+    async def test_idempotent_write_uses_viewset(self):
+        """Test that writes with an Idempotency-Key are still replayed"""
+        headers = {'Idempotency-Key': 'async-eggs'}
+        
+        first = await self.async_client.post(
+            self.list_url, {"name": "Eggs"}, content_type='application/json', headers=headers
+        )
+        second = await self.async_client.post(
+            self.list_url, {"name": "Eggs"}, content_type='application/json', headers=headers
+        )
+        
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(await GroceryItem.objects.filter(name="Eggs").acount(), 1)
+    
+    async def test_queries_are_counted(self):
+        """Test that Server-Timing counts queries run by the async ORM"""
+        response = await self.async_client.get(self.list_url)
+        
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+
+class TestItemSearch(GroceryItemAPITestCase):
+    """Test GET /items/search/ and /items/autocomplete/ over the name history"""
+    
+    def setUp(self):
+        super().setUp()
+        self.search_url = reverse('groceryitem-search')
+        self.autocomplete_url = reverse('groceryitem-autocomplete')
+    
+    def test_history_counts_creates(self):
+        """Test that creates are counted and deletes do not forget names"""
+        self.client.post(self.list_url, {"name": "organic milk"}, format='json')
+        self.client.post(reverse('groceryitem-bulk'), [{"name": "Eggs"}], format='json')
+        self.item1.delete()
+        
+        entry = GroceryItemName.objects.get(key="ORGANIC MILK")
+        self.assertEqual((entry.name, entry.times_added), ("organic milk", 2))
+        self.assertTrue(GroceryItemName.objects.filter(key="EGGS").exists())
+        self.assertEqual(
+            sorted(entry.terms.values_list('term', flat=True)), ["MILK", "ORGANIC MILK"]
+        )
+    
+    def test_autocomplete_matches_word_prefixes(self):
+        """Test that any word of a name matches and frequent names come first"""
+        for _ in range(2):
+            GroceryItem.objects.create(name="Milk Chocolate")
+        
+        response = self.client.get(self.autocomplete_url, {'q': 'mil'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [entry['name'] for entry in response.data], ["Milk Chocolate", "Organic Milk"]
+        )
+        self.assertEqual(response.data[0]['timesAdded'], 2)
+        self.assertIn('lastAddedAt', response.data[0])
+        self.assertEqual(self.client.get(self.autocomplete_url, {'q': 'ilk'}).data, [])
+    
+    def test_search_returns_items_on_list(self):
+        """Test that search returns current items ranked by history"""
+        GroceryItem.objects.create(name="Fresh Basil")
+        GroceryItem.objects.create(name="Fresh Apples")
+        self.item3.delete()
+        
+        response = self.client.get(self.search_url, {'q': 'FRESH', 'limit': 5})
+        
+        self.assertEqual([item['name'] for item in response.data], ["Fresh Apples", "Fresh Basil"])
+        self.assertEqual(
+            set(response.data[0]), {'id', 'name', 'bought', 'createdAt'}
+        )
+    
+    def test_search_is_scoped_to_list(self):
+        """Test that another household's names are not suggested"""
+        other = GroceryList.objects.create(name="Neighbours")
+        GroceryItem.objects.create(name="Mint", grocery_list=other)
+        
+        response = self.client.get(self.autocomplete_url, {'q': 'mi'})
+        
+        self.assertEqual([entry['name'] for entry in response.data], ["Organic Milk"])
+    
+    def test_invalid_parameters(self):
+        """Test that q is required and limit is bounded"""
+        for params in ({}, {'q': '  '}, {'q': 'milk', 'limit': '0'}, {'q': 'milk', 'limit': 'x'}):
+            with self.subTest(params=params):
+                response = self.client.get(self.search_url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_rebuild(self):
+        """Test that rebuild recovers history lost to raw bulk writes"""
+        GroceryItem.objects.bulk_create([GroceryItem(name="Rice"), GroceryItem(name="rice")])
+        
+        GroceryItemName.rebuild(DEFAULT_LIST_ID)
+        
+        self.assertEqual(GroceryItemName.objects.get(key="RICE").times_added, 2)
+        self.assertEqual(GroceryItemName.objects.count(), 4)
+
+
+class TestPurchaseHistory(GroceryItemAPITestCase):
+    """Test the purchase log, its rollups and GET /items/usual/"""
+    
+    def setUp(self):
+        super().setUp()
+        self.usual_url = reverse('groceryitem-usual')
+        self.now = timezone.now()
+    
+    def purchase(self, name, days_ago):
+        return GroceryItemPurchase(
+            grocery_list_id=DEFAULT_LIST_ID,
+            item_id=uuid.uuid4(),
+            name=name,
+            key=name.upper(),
+            bought_at=self.now - timezone.timedelta(days=days_ago)
+        )
+    
+    def test_marking_bought_logs_a_purchase(self):
+        """Test that only false -> true transitions are logged"""
+        self.client.patch(self.detail_url_item1, {"bought": True}, format='json')
+        self.client.patch(self.detail_url_item1, {"bought": True}, format='json')
+        self.client.patch(self.detail_url_item2, {"bought": False}, format='json')
+        
+        # item2 was logged when it was created bought
+        purchase = GroceryItemPurchase.objects.exclude(item_id=self.item2.id).get()
+        self.assertEqual((purchase.item_id, purchase.key), (self.item1.id, "ORGANIC MILK"))
+        rollup = GroceryItemPurchaseRollup.objects.get(key="ORGANIC MILK")
+        self.assertEqual(rollup.times_bought, 1)
+        self.assertIsNone(rollup.next_due_at)
+    
+    def test_rebuying_within_min_interval_is_not_logged(self):
+        """Test that a bought -> not bought -> bought slip logs one purchase"""
+        for bought in (True, False, True):
+            self.client.patch(self.detail_url_item1, {"bought": bought}, format='json')
+        
+        self.assertEqual(GroceryItemPurchase.objects.filter(key="ORGANIC MILK").count(), 1)
+        self.assertEqual(GroceryItemPurchaseRollup.objects.get(key="ORGANIC MILK").times_bought, 1)
+        
+        # Once the interval has passed it is a new purchase
+        with self.settings(GROCERY_PURCHASE_MIN_INTERVAL=0):
+            self.client.patch(self.detail_url_item1, {"bought": False}, format='json')
+            self.client.patch(self.detail_url_item1, {"bought": True}, format='json')
+        self.assertEqual(GroceryItemPurchase.objects.filter(key="ORGANIC MILK").count(), 2)
+        self.assertEqual(GroceryItemPurchaseRollup.objects.get(key="ORGANIC MILK").times_bought, 2)
+    
+    def test_bulk_update_logs_purchases_and_survives_delete(self):
+        """Test bulk toggles and that deleting the item keeps its history"""
+        data = [
+            {"id": str(self.item1.id), "bought": True},
+            {"id": str(self.item2.id), "bought": True},
+        ]
+        self.client.patch(reverse('groceryitem-bulk'), data, format='json')
+        GroceryItem.objects.filter(pk=self.item1.id).delete()
+        
+        self.assertEqual(GroceryItemPurchase.objects.filter(item_id=self.item1.id).count(), 1)
+        self.assertEqual(GroceryItemPurchase.objects.filter(item_id=self.item2.id).count(), 1)
+        self.assertTrue(GroceryItemPurchaseRollup.objects.filter(key="ORGANIC MILK").exists())
+    
+    def test_rollup_average_interval(self):
+        """Test that incremental rollups match a rebuild from the log"""
+        purchases = [self.purchase("Coffee", days) for days in (21, 14, 7)]
+        GroceryItemPurchaseRollup.apply(DEFAULT_LIST_ID, purchases[:1])
+        GroceryItemPurchaseRollup.apply(DEFAULT_LIST_ID, purchases[1:])
+        incremental = GroceryItemPurchaseRollup.objects.get(key="COFFEE")
+        
+        GroceryItemPurchase.objects.bulk_create(purchases)
+        GroceryItemPurchaseRollup.rebuild(DEFAULT_LIST_ID)
+        rebuilt = GroceryItemPurchaseRollup.objects.get(key="COFFEE")
+        
+        self.assertEqual(incremental.average_interval.days, 7)
+        self.assertEqual(incremental.next_due_at, self.now)
+        self.assertEqual(
+            (rebuilt.times_bought, rebuilt.next_due_at),
+            (incremental.times_bought, incremental.next_due_at)
+        )
+    
+    def test_usual_skips_items_on_the_list(self):
+        """Test that due names not already on the to-buy list are suggested"""
+        GroceryItemPurchaseRollup.apply(DEFAULT_LIST_ID, [
+            self.purchase("Coffee", 30), self.purchase("Coffee", 20),
+            self.purchase("Bananas", 6), self.purchase("Bananas", 3),
+            self.purchase("organic milk", 10), self.purchase("organic milk", 5),
+            self.purchase("Saffron", 100),
+        ])
+        
+        response = self.client.get(self.usual_url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([entry['name'] for entry in response.data], ["Coffee", "Bananas"])
+        self.assertEqual(response.data[0]['timesBought'], 2)
+        self.assertEqual(response.data[0]['averageIntervalDays'], 10.0)
+        self.assertEqual(
+            self.client.get(self.usual_url, {'limit': 0}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+def throttle_rates(**rates):
+    """override_settings for REST_FRAMEWORK with some throttle rates replaced"""
+    from django.conf import settings
+    return override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {
+            **settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates
+        },
+    })
+
+
+class TestThrottling(GroceryItemAPITestCase):
+    """Test the per-client and global token buckets on the item routes"""
+    
+    def test_client_over_its_burst_gets_429(self):
+        """Test that requests past the burst get 429 with Retry-After"""
+        with throttle_rates(items_client='3/minute'):
+            for _ in range(3):
+                self.assertEqual(self.client.get(self.list_url).status_code, status.HTTP_200_OK)
+            
+            response = self.client.post(self.list_url, {'name': 'Eggs'}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('error', response.json())
+        self.assertEqual(response['Retry-After'], '20')
+        self.assertFalse(GroceryItem.objects.filter(name='Eggs').exists())
+    
+    def test_clients_have_separate_buckets(self):
+        """Test that one client running out does not throttle another"""
+        with throttle_rates(items_client='1/minute'):
+            first = self.client.get(self.list_url, REMOTE_ADDR='10.0.0.1')
+            throttled = self.client.get(self.list_url, REMOTE_ADDR='10.0.0.1')
+            other = self.client.get(self.list_url, REMOTE_ADDR='10.0.0.2')
+        
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(throttled.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other.status_code, status.HTTP_200_OK)
+    
+    def test_global_bucket_spans_clients(self):
+        """Test that the global rate caps every client together"""
+        with throttle_rates(items_client=None, items_global='2/minute'):
+            responses = [
+                self.client.get(self.list_url, REMOTE_ADDR=f'10.0.0.{n}') for n in range(3)
+            ]
+        
+        self.assertEqual(
+            [response.status_code for response in responses],
+            [200, 200, status.HTTP_429_TOO_MANY_REQUESTS]
+        )
+    
+    def test_bucket_refills_over_time(self):
+        """Test that tokens come back at the rate and never beyond the burst"""
+        backend = LocalBucketBackend()
+        with patch('groceryItem.throttling.time.monotonic', return_value=100.0) as clock:
+            self.assertEqual([backend.take('k', 2, 1.0) for _ in range(2)], [0, 0])
+            self.assertEqual(backend.take('k', 2, 1.0), 1.0)
+            
+            clock.return_value = 101.5
+            self.assertEqual(backend.take('k', 2, 1.0), 0)
+            self.assertEqual(backend.take('k', 2, 1.0), 0.5)
+            
+            clock.return_value = 1000.0
+            self.assertEqual([backend.take('k', 2, 1.0) for _ in range(3)], [0, 0, 1.0])
+    
+    def test_local_backend_drops_least_recent_buckets(self):
+        """Test that the local backend keeps at most max_keys buckets"""
+        backend = LocalBucketBackend(max_keys=2)
+        for key in ('a', 'b', 'a', 'c'):
+            backend.take(key, 5, 1.0)
+        
+        self.assertEqual(list(backend.buckets), ['a', 'c'])
+    
+    @override_settings(GROCERY_THROTTLE_BACKEND='groceryItem.throttling.CacheBucketBackend')
+    def test_cache_backend(self):
+        """Test that buckets kept in the Django cache throttle the same way"""
+        reset_bucket_backend()
+        with throttle_rates(items_client='1/minute'):
+            first = self.client.get(self.list_url)
+            second = self.client.get(self.list_url)
+        reset_bucket_backend()
+        
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    async def test_async_views_are_throttled(self):
+        """Test that the async item views share the viewset's buckets"""
+        with throttle_rates(items_client='1/minute'):
+            first = await self.async_client.get(self.list_url)
+            second = await self.async_client.patch(
+                self.detail_url_item1, {'bought': True}, content_type='application/json'
+            )
+        
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(second['Retry-After'], '60')
+        self.assertIn('error', second.json())
+
+
+class TestLoadShedding(GroceryItemAPITestCase):
+    """Test that reads are shed under load while writes go through"""
+    
+    def overload_db(self):
+        """Report slow requests and keep one in flight, as under contention"""
+        for _ in range(5):
+            throttling.monitor.enter()
+            throttling.monitor.leave(db_time=5.0)
+        throttling.monitor.enter()
+    
+    def test_slow_db_sheds_reads_not_writes(self):
+        """Test that reads get 503 and writes still succeed when the DB is slow"""
+        self.overload_db()
+        
+        read = self.client.get(self.list_url)
+        write = self.client.patch(self.detail_url_item1, {'bought': True}, format='json')
+        health = self.client.get(reverse('health'))
+        
+        self.assertEqual(read.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(read['Retry-After'], '2')
+        self.assertIn('error', read.json())
+        self.assertEqual(write.status_code, status.HTTP_200_OK)
+        self.item1.refresh_from_db()
+        self.assertTrue(self.item1.bought)
+        self.assertEqual(health.status_code, status.HTTP_200_OK)
+    
+    def test_one_slow_request_does_not_shed_reads(self):
+        """Test that a lone slow request (an import, say) leaves reads alone"""
+        throttling.monitor.enter()
+        throttling.monitor.leave(db_time=5.0)
+        
+        self.assertEqual(self.client.get(self.list_url).status_code, status.HTTP_200_OK)
+        
+        # Nor does a read that finds the process to itself under a high average
+        self.overload_db()
+        throttling.monitor.leave()
+        self.assertGreater(throttling.monitor.db_time(), 0.5)
+        self.assertEqual(self.client.get(self.list_url).status_code, status.HTTP_200_OK)
+    
+    def test_queue_depth_sheds_reads(self):
+        """Test that too many requests in flight sheds reads"""
+        from django.conf import settings
+        config = {**settings.GROCERY_LOAD_SHEDDING, 'MAX_IN_FLIGHT': 1}
+        throttling.monitor.enter()
+        
+        with override_settings(GROCERY_LOAD_SHEDDING=config):
+            read = self.client.get(self.detail_url_item1)
+            write = self.client.post(self.list_url, {'name': 'Eggs'}, format='json')
+        
+        self.assertEqual(read.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(write.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(throttling.monitor.in_flight, 1)
+    
+    def test_reads_resume_when_load_drops(self):
+        """Test that an old overload is forgotten and shedding can be turned off"""
+        monitor = LoadMonitor(stale_after=10.0)
+        with patch('groceryItem.throttling.time.monotonic', return_value=100.0) as clock:
+            monitor.enter()
+            monitor.leave(db_time=5.0)
+            self.assertAlmostEqual(monitor.db_time(), 1.0)
+            clock.return_value = 111.0
+            self.assertEqual(monitor.db_time(), 0.0)
+        
+        self.overload_db()
+        with override_settings(GROCERY_LOAD_SHEDDING=None):
+            self.assertEqual(self.client.get(self.list_url).status_code, status.HTTP_200_OK)
+
+
+class TestAtomicWrites(GroceryItemAPITestCase):
+    """Test single-statement PATCH, toggle and If-Match preconditions"""
+    
+    def toggle_url(self, item):
+        return reverse('groceryitem-toggle', kwargs={'pk': item.id})
+    
+    def stats(self):
+        return self.client.get(reverse('groceryitem-stats')).json()
+    
+    def test_patch_does_not_read_the_item(self):
+        """Test that PATCH writes with one UPDATE and no SELECT of the item"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.detail_url_item2, {'bought': False}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item_queries = [
+            query['sql'] for query in queries.captured_queries
+            if '"groceryItem_groceryitem"' in query['sql'].split(' WHERE ')[0]
+        ]
+        self.assertEqual(len(item_queries), 1)
+        self.assertTrue(item_queries[0].startswith('UPDATE'))
+        self.assertFalse(response.data['bought'])
+        self.assertEqual(self.stats()['bought'], 0)
+    
+    def test_toggle_flips_and_keeps_counters(self):
+        """Test that each toggle flips bought and updates stats and purchases"""
+        first = self.client.post(self.toggle_url(self.item1))
+        second = self.client.post(self.toggle_url(self.item1))
+        third = self.client.post(self.toggle_url(self.item1))
+        
+        self.assertEqual(
+            [first.data['bought'], second.data['bought'], third.data['bought']],
+            [True, False, True]
+        )
+        self.assertEqual(self.stats()['bought'], 2)
+        # Bought again straight after un-buying: still the one purchase
+        self.assertEqual(
+            GroceryItemPurchase.objects.filter(item_id=self.item1.id).count(), 1
+        )
+        self.item1.refresh_from_db()
+        self.assertTrue(self.item1.bought)
+        self.assertEqual(third['ETag'], item_validators(self.item1)[0])
+    
+    def test_stale_toggles_both_apply(self):
+        """Test that two clients toggling from the same read flip twice"""
+        etag = self.client.get(self.detail_url_item1)['ETag']
+        
+        self.client.post(self.toggle_url(self.item1))
+        self.client.post(self.toggle_url(self.item1))
+        
+        self.item1.refresh_from_db()
+        self.assertFalse(self.item1.bought)
+        self.assertEqual(self.stats()['bought'], 1)
+        self.assertNotEqual(self.client.get(self.detail_url_item1)['ETag'], etag)
+    
+    def test_setting_same_value_still_records_a_write(self):
+        """Test that PATCHing the current value bumps change_seq as save() did"""
+        before = self.item2.change_seq
+        purchases = GroceryItemPurchase.objects.filter(item_id=self.item2.id)
+        logged = purchases.count()
+        
+        response = self.client.patch(self.detail_url_item2, {'bought': True}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.item2.refresh_from_db()
+        self.assertTrue(self.item2.bought)
+        self.assertGreater(self.item2.change_seq, before)
+        self.assertEqual(self.stats()['bought'], 1)
+        self.assertEqual(purchases.count(), logged)
+    
+    def test_if_match(self):
+        """Test that a write with a stale ETag fails with 412 and changes nothing"""
+        etag = self.client.get(self.detail_url_item1)['ETag']
+        
+        first = self.client.patch(
+            self.detail_url_item1, {'bought': True}, format='json', HTTP_IF_MATCH=etag
+        )
+        stale = self.client.post(self.toggle_url(self.item1), HTTP_IF_MATCH=etag)
+        fresh = self.client.post(
+            self.toggle_url(self.item1), HTTP_IF_MATCH='W/' + first['ETag']
+        )
+        
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(stale.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertIn('error', stale.json())
+        self.assertEqual(fresh.status_code, status.HTTP_200_OK)
+        self.assertFalse(fresh.data['bought'])
+        self.assertEqual(self.stats()['bought'], 1)
+    
+    def test_if_match_other_tags(self):
+        """Test If-Match with *, another item's ETag and a missing item"""
+        other = self.client.get(self.detail_url_item2)['ETag']
+        missing = reverse('groceryitem-toggle', kwargs={'pk': uuid.uuid4()})
+        
+        self.assertEqual(
+            self.client.post(self.toggle_url(self.item1), HTTP_IF_MATCH='*').status_code,
+            status.HTTP_200_OK
+        )
+        self.assertEqual(
+            self.client.post(self.toggle_url(self.item1), HTTP_IF_MATCH=other).status_code,
+            status.HTTP_412_PRECONDITION_FAILED
+        )
+        self.assertEqual(self.client.post(missing).status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_without_update_returning(self):
+        """Test the locked read-then-UPDATE path for databases without RETURNING"""
+        etag = self.client.get(self.detail_url_item1)['ETag']
+        with patch('groceryItem.models.can_update_returning', return_value=False):
+            toggled = self.client.post(self.toggle_url(self.item1), HTTP_IF_MATCH=etag)
+            stale = self.client.patch(
+                self.detail_url_item1, {'bought': False}, format='json', HTTP_IF_MATCH=etag
+            )
+            patched = self.client.patch(self.detail_url_item1, {'bought': False}, format='json')
+        
+        self.assertTrue(toggled.data['bought'])
+        self.assertEqual(stale.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertFalse(patched.data['bought'])
+        self.assertEqual(self.stats()['bought'], 1)
+    
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    async def test_async_patch_is_conditional(self):
+        """Test that the async PATCH uses the same conditional write"""
+        etag = (await self.async_client.get(self.detail_url_item1))['ETag']
+        
+        first = await self.async_client.patch(
+            self.detail_url_item1, {'bought': True},
+            content_type='application/json', headers={'If-Match': etag}
+        )
+        stale = await self.async_client.patch(
+            self.detail_url_item1, {'bought': False},
+            content_type='application/json', headers={'If-Match': etag}
+        )
+        
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertTrue(first.json()['bought'])
+        self.assertIn('ETag', first)
+        self.assertEqual(stale.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        item = await GroceryItem.objects.aget(pk=self.item1.pk)
+        self.assertTrue(item.bought)
+
+
+class TestImportExport(GroceryItemAPITestCase):
+    """Test the streaming CSV/NDJSON export, import endpoint and command"""
+    
+    def setUp(self):
+        super().setUp()
+        self.export_url = reverse('groceryitem-export')
+        self.import_url = reverse('groceryitem-import')
+        self.other_list = GroceryList.objects.create(name="Cabin")
+    
+    def body(self, response):
+        return b''.join(response.streaming_content).decode('utf-8')
+    
+    def import_body(self, body, content_type, url=None):
+        return self.client.generic(
+            'POST', url or self.import_url, body.encode('utf-8'), content_type=content_type
+        )
+    
+    def test_export_ndjson(self):
+        """Test that the default export is one API item object per line"""
+        response = self.client.get(self.export_url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('grocery-items.ndjson', response['Content-Disposition'])
+        lines = [json.loads(line) for line in self.body(response).splitlines()]
+        self.assertEqual(lines, self.client.get(self.list_url).json())
+    
+    def test_export_csv(self):
+        """Test CSV export through ?format= and through Accept"""
+        by_format = self.body(self.client.get(self.export_url, {'format': 'csv'}))
+        by_accept = self.client.get(self.export_url, HTTP_ACCEPT='text/csv')
+        
+        self.assertEqual(by_accept['Content-Type'], 'text/csv')
+        self.assertEqual(self.body(by_accept), by_format)
+        rows = by_format.splitlines()
+        self.assertEqual(rows[0], 'id,name,bought,createdAt')
+        self.assertEqual(rows[2].split(',')[1:3], ['Whole Wheat Bread', 'true'])
+        self.assertEqual(len(rows), 4)
+    
+    def test_export_is_chunked(self):
+        """Test that the export yields a chunk per chunk_size rows"""
+        from .transfer import export_items
+        
+        chunks = list(export_items(GroceryItem.objects.order_by('created_at'), 'csv', chunk_size=2))
+        
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[0], b'id,name,bought,createdAt\r\n')
+    
+    def test_export_errors_are_json(self):
+        """Test that a missing list gets a JSON 404 from the export"""
+        url = reverse('listitem-export', kwargs={'list_pk': uuid.uuid4()})
+        
+        response = self.client.get(url, {'format': 'csv'})
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('error', response.json())
+    
+    async def test_export_under_asgi(self):
+        """Test that ASGI gets an async stream with the same bytes"""
+        expected = await sync_to_async(lambda: self.body(self.client.get(self.export_url)))()
+        
+        response = await self.async_client.get(self.export_url)
+        chunks = [chunk async for chunk in response.streaming_content]
+        
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join(chunks).decode('utf-8'), expected)
+    
+    def test_round_trip_into_another_list(self):
+        """Test that an export imports into another list unchanged"""
+        exported = self.body(self.client.get(self.export_url, {'format': 'csv'}))
+        url = reverse('listitem-import', kwargs={'list_pk': self.other_list.pk})
+        
+        response = self.import_body(exported, 'text/csv', url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'created': 3, 'skipped': 0, 'errors': []})
+        copied = list(
+            GroceryItem.objects.filter(grocery_list=self.other_list)
+            .order_by('created_at').values_list('name', 'bought')
+        )
+        self.assertEqual(copied, [
+            ("Organic Milk", False), ("Whole Wheat Bread", True), ("Fresh Apples", False)
+        ])
+        stats = GroceryItemStats.objects.get(grocery_list=self.other_list)
+        self.assertEqual((stats.total, stats.bought), (3, 1))
+    
+    def test_import_ndjson_skips_invalid_rows(self):
+        """Test that rows breaking the name rules are reported, not inserted"""
+        body = "\n".join([
+            '{"name": "  Eggs  "}',
+            '{"name": ""}',
+            '',
+            '{"name": "%s"}' % ('x' * 101),
+            '["Butter"]',
+            '{"name": "Tea", "bought": true}',
+            '{"name": 7}',
+            'not json',
+        ])
+        
+        response = self.import_body(body, 'application/x-ndjson')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        report = response.json()
+        self.assertEqual((report['created'], report['skipped']), (2, 5))
+        self.assertEqual([error['line'] for error in report['errors']], [2, 4, 5, 7, 8])
+        self.assertEqual(report['errors'][0]['error'], "Name cannot be empty")
+        self.assertEqual(report['errors'][1]['error'], "Name cannot exceed 100 characters")
+        self.assertTrue(GroceryItem.objects.filter(name="Eggs", bought=False).exists())
+        self.assertTrue(GroceryItemName.objects.filter(key="TEA").exists())
+        self.assertFalse(GroceryItemPurchase.objects.filter(key="TEA").exists())
+    
+    def test_import_does_not_log_purchases(self):
+        """Test that items imported bought are not logged as purchases"""
+        self.import_body('name,bought\nTea,true\nCoffee,true\n', 'text/csv')
+        
+        self.assertEqual(GroceryItem.objects.filter(name__in=["Tea", "Coffee"], bought=True).count(), 2)
+        self.assertFalse(GroceryItemPurchase.objects.filter(key__in=["TEA", "COFFEE"]).exists())
+        self.assertFalse(GroceryItemPurchaseRollup.objects.filter(key__in=["TEA", "COFFEE"]).exists())
+    
+    def test_import_rejects_unreadable_input(self):
+        """Test 415 for other types and 400 for a bad header or encoding"""
+        wrong_type = self.import_body('{"name": "Eggs"}', 'application/json')
+        no_header = self.import_body('Eggs\nTea\n', 'text/csv')
+        bad_utf8 = self.client.generic(
+            'POST', self.import_url, b'name\nEggs\n\xff\n', content_type='text/csv'
+        )
+        
+        self.assertEqual(wrong_type.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.assertEqual(no_header.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('header', no_header.json()['error'])
+        self.assertEqual(bad_utf8.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(bad_utf8.json()['created'], 1)
+        self.assertTrue(GroceryItem.objects.filter(name="Eggs").exists())
+    
+    def test_import_command(self):
+        """Test that the command commits one batch per --batch-size rows"""
+        import tempfile
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write("name,bought\n")
+            handle.writelines(f"Item {i},{'yes' if i % 2 else 'no'}\n" for i in range(5))
+            handle.write(",\n")
+        before = GroceryList.objects.get(pk=self.other_list.pk).change_seq
+        out, err = StringIO(), StringIO()
+        
+        call_command(
+            'import_items', handle.name, '--list', str(self.other_list.pk),
+            '--batch-size', '2', stdout=out, stderr=err
+        )
+        
+        self.assertIn("Imported 5 items, skipped 1", out.getvalue())
+        self.assertIn("line 7: Name cannot be empty", err.getvalue())
+        self.assertEqual(
+            GroceryList.objects.get(pk=self.other_list.pk).change_seq, before + 3
+        )
+        self.assertEqual(
+            GroceryItem.objects.filter(grocery_list=self.other_list, bought=True).count(), 2
+        )
+        import os
+        os.unlink(handle.name)
+
+
+class TestListQuery(GroceryItemAPITestCase):
+    """Test filters, ordering and sparse fieldsets on GET /items/"""
+    
+    def names(self, response):
+        return [item['name'] for item in response.json()]
+    
+    def test_bought_filter(self):
+        """Test ?bought= returns only items to buy or only bought items"""
+        to_buy = self.client.get(self.list_url, {'bought': 'false'})
+        bought = self.client.get(self.list_url, {'bought': 'TRUE'})
+        invalid = self.client.get(self.list_url, {'bought': 'maybe'})
+        
+        self.assertEqual(self.names(to_buy), ["Organic Milk", "Fresh Apples"])
+        self.assertEqual(self.names(bought), ["Whole Wheat Bread"])
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(invalid.json(), {"error": "bought must be true or false"})
+        self.assertNotEqual(to_buy['ETag'], bought['ETag'])
+    
+    def test_time_filters(self):
+        """Test ?created_after= and ?updated_since= against the timestamps"""
+        after = self.item1.created_at.isoformat()
+        self.client.patch(self.detail_url_item1, {'bought': True}, format='json')
+        since = GroceryItem.objects.get(pk=self.item1.pk).updated_at.isoformat()
+        
+        created = self.client.get(self.list_url, {'created_after': after})
+        updated = self.client.get(self.list_url, {'updated_since': since})
+        invalid = self.client.get(self.list_url, {'created_after': 'yesterday'})
+        
+        self.assertEqual(self.names(created), ["Whole Wheat Bread", "Fresh Apples"])
+        self.assertEqual(self.names(updated), ["Organic Milk"])
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("ISO 8601", invalid.json()['error'])
+    
+    def test_ordering(self):
+        """Test the allow-listed orderings and rejection of anything else"""
+        by_name = self.client.get(self.list_url, {'ordering': 'name'})
+        newest = self.client.get(self.list_url, {'ordering': '-created_at'})
+        invalid = self.client.get(self.list_url, {'ordering': 'bought'})
+        paged = self.client.get(self.list_url, {'ordering': 'name', 'page_size': 2})
+        
+        self.assertEqual(
+            self.names(by_name), ["Fresh Apples", "Organic Milk", "Whole Wheat Bread"]
+        )
+        self.assertEqual(
+            self.names(newest), ["Fresh Apples", "Whole Wheat Bread", "Organic Milk"]
+        )
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(paged.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_fields_are_selected_in_sql(self):
+        """Test ?fields= limits both the keys sent and the columns read"""
+        from .filters import ListQuery
+        
+        response = self.client.get(self.list_url, {'bought': 'false', 'fields': 'name,id'})
+        invalid = self.client.get(self.list_url, {'fields': 'name,price'})
+        rows = ListQuery({'fields': 'name,id'}).rows(GroceryItem.objects.all())
+        
+        self.assertEqual(response.json(), [
+            {'id': str(self.item1.id), 'name': "Organic Milk"},
+            {'id': str(self.item3.id), 'name': "Fresh Apples"},
+        ])
+        columns = str(rows.query).split(' FROM ')[0]
+        self.assertIn('"name"', columns)
+        self.assertNotIn('"bought"', columns)
+        self.assertNotIn('"created_at"', columns)
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_fields_with_pages_and_columns(self):
+        """Test sparse keyset pages still link on, and columnar output"""
+        first = self.client.get(self.list_url, {'fields': 'name', 'page_size': 2}).json()
+        second = self.client.get(first['next']).json()
+        columns = self.client.get(
+            self.list_url, {'fields': 'name,bought'},
+            HTTP_ACCEPT='application/vnd.grocery.columns+json'
+        ).json()
+        
+        self.assertEqual(first['results'], [{'name': "Organic Milk"}, {'name': "Whole Wheat Bread"}])
+        self.assertEqual(second, {'next': None, 'results': [{'name': "Fresh Apples"}]})
+        self.assertEqual(columns, {
+            'name': ["Organic Milk", "Whole Wheat Bread", "Fresh Apples"],
+            'bought': [False, True, False],
+        })
+    
+    @override_settings(GROCERY_STREAM_LIST_MIN_ITEMS=2)
+    def test_streamed_list_is_filtered(self):
+        """Test that a streamed list applies the same filters and fields"""
+        response = self.client.get(self.list_url, {'bought': 'false', 'fields': 'name'})
+        
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            json.loads(b''.join(response.streaming_content)),
+            [{'name': "Organic Milk"}, {'name': "Fresh Apples"}]
+        )
+    
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    async def test_async_list_query(self):
+        """Test that the async list filters and projects like the viewset"""
+        params = {'bought': 'false', 'fields': 'id,name', 'ordering': '-created_at'}
+        with override_settings(ROOT_URLCONF='backend.urls'):
+            expected = await sync_to_async(self.client.get)(self.list_url, params)
+        
+        response = await self.async_client.get(self.list_url, params)
+        invalid = await self.async_client.get(self.list_url, {'ordering': 'price'})
+        
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestStreamingList(GroceryItemAPITestCase):
+    """Test that long unpaginated lists are streamed with the same bytes"""
+    
+    def body(self, response):
+        return b''.join(response.streaming_content)
+    
+    def built(self, **extra):
+        """The list as the viewset builds it in memory"""
+        with override_settings(GROCERY_STREAM_LIST_MIN_ITEMS=None):
+            response = self.client.get(self.list_url, **extra)
+        list_cache.get_cache().clear()
+        return response
+    
+    @override_settings(GROCERY_STREAM_LIST_MIN_ITEMS=3)
+    def test_long_list_is_streamed(self):
+        """Test that a list at the threshold streams the built list's bytes"""
+        expected = self.built()
+        
+        response = self.client.get(self.list_url)
+        
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(self.body(response), expected.content)
+        self.assertEqual(response['ETag'], expected['ETag'])
+        cached = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    @override_settings(GROCERY_STREAM_LIST_MIN_ITEMS=3)
+    def test_stream_chunks_join_into_one_array(self):
+        """Test that chunks are separated with commas and empty lists stay []"""
+        from .transfer import export_items
+        
+        queryset = GroceryItem.objects.order_by('created_at')
+        chunks = list(export_items(queryset, 'json', chunk_size=2))
+        empty = b''.join(export_items(queryset.none(), 'json'))
+        
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(b''.join(chunks), self.built().content)
+        self.assertEqual(empty, b'[]')
+    
+    @override_settings(GROCERY_STREAM_LIST_MIN_ITEMS=3)
+    def test_other_lists_are_built(self):
+        """Test that pages, columns and indented JSON are not streamed"""
+        columns = 'application/vnd.grocery.columns+json'
+        
+        for extra in (
+            {'data': {'page_size': 2}},
+            {'HTTP_ACCEPT': columns},
+            {'HTTP_ACCEPT': 'application/json; indent=2'},
+        ):
+            with self.subTest(extra=extra):
+                response = self.client.get(self.list_url, **extra)
+                self.assertFalse(response.streaming)
+                self.assertEqual(response.content, self.built(**extra).content)
+        with override_settings(GROCERY_STREAM_LIST_MIN_ITEMS=4):
+            self.assertFalse(self.client.get(self.list_url).streaming)
+    
+    @override_settings(ROOT_URLCONF=AsyncURLConf, GROCERY_STREAM_LIST_MIN_ITEMS=3)
+    async def test_async_list_is_streamed(self):
+        """Test that the async list streams from aiterator with the same bytes"""
+        with override_settings(ROOT_URLCONF='backend.urls'):
+            expected = await sync_to_async(self.built)()
+        
+        response = await self.async_client.get(self.list_url)
+        chunks = [chunk async for chunk in response.streaming_content]
+        
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join(chunks), expected.content)
+        self.assertEqual(response['ETag'], expected['ETag'])
+
+
+class TestItemIds(GroceryItemAPITestCase):
+    """Test time-ordered item ids and rekeying old random ones"""
+    
+    def test_new_items_get_time_ordered_ids(self):
+        """Test that new ids are UUIDv7 strings sorting in creation order"""
+        created = [
+            self.client.post(self.list_url, {'name': f"Item {i}"}, format='json').data['id']
+            for i in range(5)
+        ]
+        
+        self.assertEqual(created, sorted(created))
+        self.assertTrue(all(uuid.UUID(pk).version == 7 for pk in created))
+        with override_settings(GROCERY_ITEM_ID_VERSION=4):
+            self.assertEqual(GroceryItem.objects.create(name="Random").pk.version, 4)
+    
+    def test_uuid7_layout(self):
+        """Test the timestamp, version and variant bits and same-millisecond order"""
+        from .models import uuid7
+        
+        ids = [uuid7(1700000000000) for _ in range(100)]
+        
+        self.assertEqual(ids[0].int >> 80, 1700000000000)
+        self.assertEqual((ids[0].version, ids[0].variant), (7, uuid.RFC_4122))
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), 100)
+    
+    def test_rekey_items_command(self):
+        """Test that v4 ids are rewritten in created_at order and clients resync"""
+        changes_url = reverse('groceryitem-changes')
+        with override_settings(GROCERY_ITEM_ID_VERSION=4):
+            GroceryItem.objects.all().delete()
+            items = [
+                GroceryItem.objects.create(name=f"Item {i}", bought=i == 1) for i in range(5)
+            ]
+        # A tie at the batch boundary must not be skipped
+        GroceryItem.objects.filter(pk__in=[items[1].pk, items[2].pk]).update(
+            created_at=items[1].created_at
+        )
+        since = self.client.get(changes_url, {'since': 0}).data['seq']
+        out = StringIO()
+        
+        call_command('rekey_items', '--batch-size', '2', stdout=out)
+        
+        self.assertIn("Rekeyed 5 items in 1 lists", out.getvalue())
+        rows = list(GroceryItem.objects.order_by('created_at', 'id').values_list('pk', 'name'))
+        self.assertTrue(all(pk.version == 7 for pk, _ in rows))
+        self.assertEqual([pk for pk, _ in rows], sorted(pk for pk, _ in rows))
+        self.assertEqual(
+            sorted(name for _, name in rows), [f"Item {i}" for i in range(5)]
+        )
+        purchase = GroceryItemPurchase.objects.get(name="Item 1")
+        self.assertTrue(GroceryItem.objects.filter(pk=purchase.item_id).exists())
+        self.assertTrue(self.client.get(changes_url, {'since': since}).data['reset'])
+        
+        call_command('rekey_items', stdout=out)
+        self.assertIn("Rekeyed 0 items in 0 lists", out.getvalue())
+    
+    def test_rekey_changes_list_etag(self):
+        """Test that a list revalidated after rekeying is sent again with its new ids"""
+        with override_settings(GROCERY_ITEM_ID_VERSION=4):
+            GroceryItem.objects.create(name="Random")
+        etag = self.client.get(self.list_url)['ETag']
+        
+        call_command('rekey_items', stdout=StringIO())
+        
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertTrue(all(uuid.UUID(item['id']).version == 7 for item in response.json()))
+
+
+class TestProfiling(GroceryItemAPITestCase):
+    """Test profiling item API calls on request and by sampling"""
+    
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+    
+    def profiling_settings(self, **overrides):
+        from django.conf import settings
+        return override_settings(GROCERY_PROFILING={
+            **settings.GROCERY_PROFILING, 'DIRECTORY': self.directory, **overrides
+        })
+    
+    def test_token_profiles_item_calls(self):
+        """Test that a signed token has an item call profiled and saved"""
+        token = profiling.make_token('slow list')
+        with self.profiling_settings():
+            response = self.client.get(self.list_url, HTTP_X_GROCERY_PROFILE=token)
+            forged = self.client.get(self.list_url, HTTP_X_GROCERY_PROFILE=token + 'x')
+            health = self.client.get(reverse('health'), HTTP_X_GROCERY_PROFILE=token)
+            plain = self.client.get(self.list_url)
+        
+        name = response['X-Grocery-Profile-Id']
+        self.assertEqual(profiling.list_profiles(self.directory), [name])
+        info = profiling.read_info(self.directory, name)
+        self.assertEqual(
+            (info['view'], info['status'], info['trigger'], info['label']),
+            ('groceryitem-list', 200, 'token', 'slow list')
+        )
+        stats = profiling.load_stats([f"{self.directory}/{name}.prof"])
+        self.assertIn('orm', dict(profiling.area_times(stats)))
+        for unprofiled in (forged, health, plain):
+            self.assertNotIn('X-Grocery-Profile-Id', unprofiled)
+    
+    def test_sampling_keeps_newest_captures(self):
+        """Test that sampled calls are profiled and only MAX_FILES are kept"""
+        with self.profiling_settings(SAMPLE_RATE=1.0, MAX_FILES=2):
+            names = [
+                self.client.get(self.detail_url_item1)['X-Grocery-Profile-Id']
+                for _ in range(3)
+            ]
+        with self.profiling_settings(SAMPLE_RATE=0.0):
+            self.assertNotIn('X-Grocery-Profile-Id', self.client.get(self.list_url))
+        
+        self.assertEqual(profiling.list_profiles(self.directory), names[1:])
+        self.assertEqual(
+            profiling.read_info(self.directory, names[-1])['trigger'], 'sample'
+        )
+    
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    async def test_async_list_is_profiled(self):
+        """Test that an async call is profiled without what else the loop runs"""
+        def other_request_work():
+            return sum(range(100))
+        
+        async def other_request(profiled):
+            while not profiled.done():
+                other_request_work()
+                await asyncio.sleep(0)
+        
+        with self.profiling_settings():
+            profiled = asyncio.ensure_future(self.async_client.get(
+                self.list_url, headers={'X-Grocery-Profile': profiling.make_token()}
+            ))
+            await other_request(profiled)
+            response = profiled.result()
+        
+        name = response['X-Grocery-Profile-Id']
+        self.assertEqual(profiling.read_info(self.directory, name)['view'], 'groceryitem-list')
+        stats = profiling.load_stats([f"{self.directory}/{name}.prof"])
+        functions = {function for _, _, function in stats.stats}
+        self.assertIn('get', functions)
+        self.assertNotIn('other_request_work', functions)
+        # The ORM work done in the request's sync thread is in the capture
+        self.assertIn('orm', dict(profiling.area_times(stats)))
+    
+    def test_profiles_command(self):
+        """Test that the command lists captures, sums them up and makes tokens"""
+        out = StringIO()
+        with self.profiling_settings(SAMPLE_RATE=1.0):
+            self.client.get(self.list_url)
+            self.client.post(self.list_url, {'name': 'Eggs'}, format='json')
+            
+            call_command('profiles', stdout=out)
+            call_command('profiles', '--last', '2', '--limit', '5', stdout=out)
+            call_command('profiles', '--token', '--label', 'checkout', stdout=out)
+        
+        output = out.getvalue()
+        self.assertIn("GET /api/items/", output)
+        self.assertIn("POST /api/items/", output)
+        self.assertIn("Captures: 2,", output)
+        self.assertIn("Top functions by cumulative", output)
+        self.assertIn("views.py", output)
+        token = output.strip().splitlines()[-1]
+        self.assertEqual(profiling.read_token(token, max_age=60), 'checkout')
+
+
 class TestAPIAuthentication(GroceryItemAPITestCase):
     """Test authentication if implemented"""
     
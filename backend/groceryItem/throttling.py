@@ -0,0 +1,259 @@
+"""
+Token-bucket rate limiting and load shedding for the item API
+
+Every client gets a bucket holding up to ``num_requests`` tokens of its
+DRF rate (``'30/second'`` is a burst of 30 refilled at 30 a second) and
+each request takes one; the whole API shares one more bucket under the
+``items_global`` rate. A bucket is two numbers updated on demand, so
+there is no timestamp history per client as with DRF's SimpleRateThrottle.
+
+Buckets live in ``settings.GROCERY_THROTTLE_BACKEND``. The default
+``LocalBucketBackend`` keeps them in process memory; ``CacheBucketBackend``
+keeps them in a Django cache shared by every worker.
+
+``LoadMonitor`` tracks the requests in flight and a moving average of DB
+time per request; LoadSheddingMiddleware consults it to turn away reads
+while the process is overloaded.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+DEFAULT_BACKEND = 'groceryItem.throttling.LocalBucketBackend'
+
+
+def refill(tokens, updated, now, capacity, refill_per_second):
+    """Return the tokens a bucket holds at ``now``"""
+    return min(capacity, tokens + (now - updated) * refill_per_second)
+
+
+def take_token(tokens, capacity, refill_per_second):
+    """Take one token; return (tokens left, seconds to wait or 0 if allowed)"""
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / refill_per_second
+
+
+class LocalBucketBackend:
+    """
+    Buckets in a dict in this process
+
+    The least recently used buckets are dropped past ``max_keys``; a dropped
+    bucket comes back full, which only ever errs towards letting a client in.
+    """
+
+    # Cheap enough to call on the event loop
+    blocking = False
+
+    def __init__(self, max_keys=None):
+        self.max_keys = max_keys or getattr(settings, 'GROCERY_THROTTLE_MAX_KEYS', 10000)
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, refill_per_second):
+        """Take a token from ``key``'s bucket; return 0 or the seconds to wait"""
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.pop(key, None)
+            tokens = capacity if bucket is None else refill(*bucket, now, capacity, refill_per_second)
+            tokens, wait = take_token(tokens, capacity, refill_per_second)
+            self.buckets[key] = (tokens, now)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return wait
+
+
+class CacheBucketBackend:
+    """
+    Buckets in the Django cache named by ``settings.GROCERY_THROTTLE_CACHE``
+
+    Shared by every worker using that cache. The read and write are not
+    atomic, so concurrent requests from one client can occasionally both
+    spend the same token; the limit is approximate, never much too strict.
+    """
+
+    blocking = True
+
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'GROCERY_THROTTLE_CACHE', 'default')]
+
+    def take(self, key, capacity, refill_per_second):
+        now = time.time()
+        bucket = self.cache.get(key)
+        tokens = capacity if bucket is None else refill(*bucket, now, capacity, refill_per_second)
+        tokens, wait = take_token(tokens, capacity, refill_per_second)
+        # A bucket left alone until it is full again is the same as none
+        self.cache.set(key, (tokens, now), math.ceil(capacity / refill_per_second))
+        return wait
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_bucket_backend():
+    """Return the process-wide bucket backend configured in settings"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'GROCERY_THROTTLE_BACKEND', DEFAULT_BACKEND)
+                _backend = import_string(path)()
+    return _backend
+
+
+def reset_bucket_backend():
+    """Drop the cached backend and every bucket (used by tests and settings changes)"""
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    SimpleRateThrottle with its request history replaced by a token bucket
+
+    A scope whose rate is missing or None is not throttled.
+    """
+
+    def __init__(self):
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.delay = 0
+
+    def get_rate(self):
+        # Read on every request, not frozen at import like the base class
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.delay = get_bucket_backend().take(
+            self.key, self.num_requests, self.num_requests / self.duration
+        )
+        return self.delay == 0
+
+    def wait(self):
+        return self.delay
+
+
+class ItemClientThrottle(TokenBucketThrottle):
+    """One bucket per client, by user id or else address"""
+
+    scope = 'items_client'
+
+    def get_cache_key(self, request, view):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            ident = user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class ItemGlobalThrottle(TokenBucketThrottle):
+    """One bucket for every client together"""
+
+    scope = 'items_global'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': 'all'}
+
+
+ITEM_THROTTLES = (ItemClientThrottle, ItemGlobalThrottle)
+
+
+def throttle_wait(request, view=None, throttle_classes=ITEM_THROTTLES):
+    """
+    Apply ``throttle_classes`` like APIView.check_throttles
+
+    Returns None if the request may go ahead, otherwise the seconds until it
+    would be allowed. For views that are not DRF views, such as the async
+    item views.
+    """
+    waits = [
+        throttle.wait()
+        for throttle in (throttle_class() for throttle_class in throttle_classes)
+        if not throttle.allow_request(request, view)
+    ]
+    return max(waits) if waits else None
+
+
+def load_shedding_config():
+    """Return ``settings.GROCERY_LOAD_SHEDDING`` or None when it is off"""
+    return getattr(settings, 'GROCERY_LOAD_SHEDDING', None)
+
+
+class LoadMonitor:
+    """
+    Requests in flight and a moving average of their DB time in this process
+
+    The average forgets samples older than ``stale_after`` seconds, so a
+    quiet spell after an overload brings reads back even with no writes to
+    pull the average down. After such a spell it starts again from 0, so a
+    single slow request (a big import, say) moves it only part of the way.
+    """
+
+    def __init__(self, smoothing=0.2, stale_after=10.0):
+        self.smoothing = smoothing
+        self.stale_after = stale_after
+        self.in_flight = 0
+        self.average_db_time = 0.0
+        self.sampled_at = None
+        self.lock = threading.Lock()
+
+    def enter(self):
+        """Count a request in; returns how many are now in flight"""
+        with self.lock:
+            self.in_flight += 1
+            return self.in_flight
+
+    def leave(self, db_time=None):
+        """Count a request out, folding its DB time into the average"""
+        now = time.monotonic()
+        with self.lock:
+            self.in_flight -= 1
+            if db_time is None:
+                return
+            if self.sampled_at is None or now - self.sampled_at > self.stale_after:
+                self.average_db_time = 0.0
+            self.average_db_time += self.smoothing * (db_time - self.average_db_time)
+            self.sampled_at = now
+
+    def db_time(self):
+        """The recent average DB time per request, in seconds"""
+        sampled_at = self.sampled_at
+        if sampled_at is None or time.monotonic() - sampled_at > self.stale_after:
+            return 0.0
+        return self.average_db_time
+
+    def overloaded(self, in_flight, config):
+        """
+        Whether ``in_flight`` requests or the DB average exceed ``config``
+
+        The DB average only counts while other requests are in flight: a
+        request that has the process to itself queues behind nothing, and
+        letting it through is what brings the average back down.
+        """
+        if in_flight > config['MAX_IN_FLIGHT']:
+            return True
+        return in_flight > 1 and self.db_time() > config['MAX_DB_TIME']
+
+
+monitor = LoadMonitor()
+
+
+def reset_load_monitor():
+    """Start from an idle process (used by tests)"""
+    global monitor
+    monitor = LoadMonitor()
@@ -0,0 +1,308 @@
+"""
+Streaming import and export of grocery items as CSV or NDJSON
+
+Exports read the list with ``iterator(chunk_size=...)`` (``aiterator``
+under ASGI; a server-side cursor on PostgreSQL) and yield one encoded chunk
+at a time, so a response of any size holds a single chunk of rows in memory.
+
+Imports read their input a line at a time and insert it in ``bulk_create``
+batches. Each batch commits on its own with the same change_seq and
+``bulk_items_changed`` bookkeeping as ``POST /items/bulk/``, except that
+items imported bought are not logged as purchases. A 5M-row file
+therefore needs no more memory than a 1k-row one. Rows that fail the API's
+name rules are skipped and reported by line; rows already inserted stay
+when a later row turns out to be malformed.
+
+``GET /items/`` streams large plain JSON lists through the same
+generators (see ``streams_list``): the ``json`` format writes the bytes the
+list would otherwise render in one piece, an array opened in the first
+chunk and closed in the last.
+
+The CSV and NDJSON formats carry the API's item fields. CSV has a header row
+``id,name,bought,createdAt`` and NDJSON has one item object per line.
+Imports read ``name`` and ``bought`` only. Items get new ids, so an export
+can be imported into another list or into the same one again.
+"""
+import codecs
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import GroceryItem, GroceryList
+from .rendering import GroceryItemJSONRenderer, format_timestamp, item_dicts, item_rows
+from .serializers import validate_item_name
+from .signals import bulk_items_changed
+
+FORMATS = ('csv', 'ndjson')
+IMPORT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+CSV_HEADER = ('id', 'name', 'bought', 'createdAt')
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_BATCH_SIZE = 1000
+# Errors listed in an import report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+CSV_BOOLEANS = {
+    '': False,
+    'false': False, '0': False, 'no': False,
+    'true': True, '1': True, 'yes': True,
+}
+
+
+class MalformedInput(Exception):
+    """The input cannot be read any further (bad encoding, CSV or header)"""
+
+    def __init__(self, line, message):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+        self.message = message
+
+
+def export_rows(queryset, fields=None):
+    """The rows an export writes, in list order"""
+    # Named rows: on Django 4.2 aiterator() over plain values_list() rows
+    # runs its query on the event loop and fails
+    return item_rows(queryset, fields=fields)
+
+
+class ChunkEncoder:
+    """
+    Encodes export rows in a format, one chunk of rows at a time
+
+    ``fields`` limits the API fields of the ``json`` format.
+    """
+
+    def __init__(self, fmt, fields=None):
+        self.fmt = fmt
+        self.fields = fields
+        self.json = GroceryItemJSONRenderer()
+        self.buffer = io.StringIO()
+        self.csv = csv.writer(self.buffer)
+        self.started = False
+
+    def header(self):
+        if self.fmt == 'json':
+            return b'['
+        if self.fmt != 'csv':
+            return b''
+        self.csv.writerow(CSV_HEADER)
+        return self.flush()
+
+    def footer(self):
+        return b']' if self.fmt == 'json' else b''
+
+    def encode(self, rows):
+        if self.fmt == 'json':
+            # The chunk's array without its brackets; compact JSON has no
+            # other whitespace, so the pieces join into the whole list's bytes
+            separator = b',' if self.started else b''
+            self.started = True
+            return separator + self.json.encode(item_dicts(rows, self.fields))[1:-1]
+        if self.fmt == 'csv':
+            self.csv.writerows(
+                (pk, name, 'true' if bought else 'false', format_timestamp(created_at))
+                for pk, name, bought, created_at in rows
+            )
+            return self.flush()
+        return b''.join(
+            self.json.encode({
+                'id': str(pk),
+                'name': name,
+                'bought': bought,
+                'createdAt': format_timestamp(created_at),
+            }) + b'\n'
+            for pk, name, bought, created_at in rows
+        )
+
+    def flush(self):
+        data = self.buffer.getvalue().encode('utf-8')
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+def export_items(queryset, fmt, chunk_size=EXPORT_CHUNK_SIZE, fields=None):
+    """Yield ``queryset``'s items encoded as ``fmt``, a chunk at a time"""
+    encoder = ChunkEncoder(fmt, fields)
+    yield encoder.header()
+    chunk = []
+    for row in export_rows(queryset, fields).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield encoder.encode(chunk)
+            chunk = []
+    if chunk:
+        yield encoder.encode(chunk)
+    if encoder.footer():
+        yield encoder.footer()
+
+
+async def aexport_items(queryset, fmt, chunk_size=EXPORT_CHUNK_SIZE, fields=None):
+    """``export_items`` for ASGI, where a sync iterator would be read whole"""
+    encoder = ChunkEncoder(fmt, fields)
+    yield encoder.header()
+    chunk = []
+    async for row in export_rows(queryset, fields).aiterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield encoder.encode(chunk)
+            chunk = []
+    if chunk:
+        yield encoder.encode(chunk)
+    if encoder.footer():
+        yield encoder.footer()
+
+
+def streams_list(count, renderer, accepted_media_type):
+    """
+    Whether an unpaginated list of ``count`` items is streamed as JSON
+
+    Lists of at least ``settings.GROCERY_STREAM_LIST_MIN_ITEMS`` items are,
+    when the client takes compact JSON; the rest are built whole and cached.
+    """
+    min_items = getattr(settings, 'GROCERY_STREAM_LIST_MIN_ITEMS', None)
+    return (
+        min_items is not None
+        and count is not None
+        and count >= min_items
+        and renderer.format == 'json'
+        and renderer.get_indent(accepted_media_type, {}) is None
+    )
+
+
+def decode_lines(lines):
+    """Decode an iterable of UTF-8 byte lines (BOM allowed) to text"""
+    return codecs.iterdecode(lines, 'utf-8-sig')
+
+
+def clean_record(name, bought):
+    """Return (name, bought) with the API's rules applied, or raise ValueError"""
+    if not isinstance(name, str):
+        raise ValueError("Name must be a string")
+    try:
+        name = validate_item_name(name)
+    except serializers.ValidationError as e:
+        raise ValueError(str(e.detail[0]))
+    if not isinstance(bought, bool):
+        raise ValueError("Bought field must be a boolean value")
+    return name, bought
+
+
+def parse_csv(lines):
+    """Yield (line, record or ValueError) for CSV text lines with a header"""
+    reader = csv.DictReader(lines)
+    try:
+        if reader.fieldnames is None or 'name' not in reader.fieldnames:
+            raise MalformedInput(1, "Expected a header row with a name column")
+        for row in reader:
+            try:
+                bought = CSV_BOOLEANS.get((row.get('bought') or '').strip().lower())
+                if bought is None:
+                    raise ValueError("Bought field must be true or false")
+                yield reader.line_num, clean_record(row['name'], bought)
+            except ValueError as e:
+                yield reader.line_num, e
+    except csv.Error as e:
+        raise MalformedInput(reader.line_num, str(e))
+    except UnicodeDecodeError:
+        raise MalformedInput(reader.line_num + 1, "Not valid UTF-8")
+
+
+def parse_ndjson(lines):
+    """Yield (line, record or ValueError) for NDJSON text lines"""
+    line_number = 0
+    try:
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Expected a JSON object")
+                yield line_number, clean_record(record.get('name'), record.get('bought', False))
+            except ValueError as e:
+                # json.JSONDecodeError is a ValueError too
+                yield line_number, e
+    except UnicodeDecodeError:
+        raise MalformedInput(line_number + 1, "Not valid UTF-8")
+
+
+PARSERS = {'csv': parse_csv, 'ndjson': parse_ndjson}
+
+
+class ImportReport:
+    """What an import created and skipped"""
+
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+
+    def skip(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {'created': self.created, 'skipped': self.skipped, 'errors': self.errors}
+
+
+def create_items(grocery_list_id, items, log_purchases=True):
+    """
+    Insert new items with one INSERT as a single change to the list
+
+    Sends ``bulk_items_changed`` so stats, names, purchases, the list cache
+    and the change feed follow, as a post_save would for each item. With
+    ``log_purchases`` False, items created bought are not logged as bought.
+    """
+    with transaction.atomic():
+        # The whole batch is one change
+        change_seq = GroceryList.next_change_seq(grocery_list_id)
+        for item in items:
+            item.change_seq = change_seq
+        GroceryItem.objects.bulk_create(items)
+        bulk_items_changed.send(
+            sender=GroceryItem,
+            grocery_list_id=grocery_list_id,
+            created=items,
+            log_purchases=log_purchases
+        )
+    return items
+
+
+def import_items(lines, fmt, grocery_list_id, batch_size=IMPORT_BATCH_SIZE, report=None):
+    """
+    Import items from text ``lines`` in ``fmt`` into a list
+
+    Returns an ImportReport. Raises MalformedInput if the input cannot be
+    read to the end; batches before the bad line are kept, and ``report``
+    (pass one in to see it) says how far the import got.
+    """
+    report = report if report is not None else ImportReport()
+    batch = []
+    try:
+        for line, record in PARSERS[fmt](lines):
+            if isinstance(record, ValueError):
+                report.skip(line, str(record))
+                continue
+            name, bought = record
+            batch.append(GroceryItem(name=name, bought=bought, grocery_list_id=grocery_list_id))
+            if len(batch) >= batch_size:
+                report.created += len(create_items(grocery_list_id, batch, log_purchases=False))
+                batch = []
+    except MalformedInput:
+        # Keep every good row before the bad line
+        if batch:
+            report.created += len(create_items(grocery_list_id, batch, log_purchases=False))
+        raise
+    if batch:
+        report.created += len(create_items(grocery_list_id, batch, log_purchases=False))
+    return report
@@ -1,53 +1,318 @@
+import asyncio
+import json
 import logging
+import math
 from rest_framework import viewsets, status
 from rest_framework.response import Response
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound, Throttled
 from django.shortcuts import get_object_or_404
-from django.http import Http404
+from django.urls import reverse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from .models import GroceryItem
+from django.db import connection, transaction
+from django.db.models import Case, Exists, OuterRef, When, Value
+from django.db.models.functions import Upper
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from .models import (
+    GroceryItem,
+    GroceryItemName,
+    GroceryItemPurchaseRollup,
+    GroceryItemStats,
+    GroceryItemTombstone,
+    GroceryList,
+    DEFAULT_LIST_ID,
+    delete_returning,
+)
 from .serializers import (
     GroceryItemSerializer, 
     GroceryItemCreateSerializer, 
-    GroceryItemUpdateSerializer
+    GroceryItemUpdateSerializer,
+    GroceryItemBulkUpdateSerializer,
+    GroceryItemBulkDeleteSerializer,
+    GroceryItemOperationSerializer,
+    GroceryListSerializer
+)
+from .filters import InvalidListQuery, ListQuery
+from .pagination import KeysetPagination
+from .rendering import (
+    COLUMNAR_RENDERERS,
+    EXPORT_RENDERERS,
+    GroceryItemJSONRenderer,
+    format_timestamp,
+    item_rows,
+    item_dict,
+    item_dicts,
+    item_columns
+)
+from .signals import bulk_items_changed
+from . import cache as list_cache
+from . import idempotency
+from . import transfer
+from .events import get_event_backend
+from .metrics import render_prometheus
+from .throttling import ITEM_THROTTLES
+from .conditional import (
+    PreconditionFailed,
+    if_match_versions,
+    list_validators,
+    item_validators,
+    not_modified,
+    set_validators
 )
 
 logger = logging.getLogger(__name__)
 
 
+def update_bought(grocery_list_id, pk, bought=None, expected=None):
+    """
+    Set or toggle one item's bought field with GroceryItem.set_bought
+    
+    Sends bulk_items_changed in place of the post_save that save() would
+    send, so stats, purchases, the list cache and the change feed follow.
+    Raises GroceryItem.DoesNotExist, or PreconditionFailed if the item
+    exists but is no longer at an ``expected`` version.
+    """
+    try:
+        with transaction.atomic():
+            item, previous = GroceryItem.set_bought(grocery_list_id, pk, bought, expected)
+            bulk_items_changed.send(
+                sender=GroceryItem,
+                grocery_list_id=grocery_list_id,
+                updated=[item],
+                bought_delta=int(item.bought) - int(previous),
+                newly_bought=[item] if item.bought and not previous else []
+            )
+    except GroceryItem.DoesNotExist:
+        if expected is not None and GroceryItem.objects.filter(
+            grocery_list_id=grocery_list_id, pk=pk
+        ).exists():
+            raise PreconditionFailed()
+        raise
+    return item
+
+
+class ListNotFound(NotFound):
+    default_detail = "List not found"
+
+
 class GroceryItemViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing grocery items
     
     Provides CRUD operations:
-    - GET /items/ - List all items
+    - GET /items/ - List all items (?page_size=&cursor= for keyset pages;
+      ?bought=, ?created_after=, ?updated_since=, ?ordering=, ?fields=)
     - POST /items/ - Create new item
     - GET /items/{id}/ - Retrieve specific item
     - PATCH /items/{id}/ - Update item status
+    - POST /items/{id}/toggle/ - Flip item status
     - DELETE /items/{id}/ - Delete item
+    - POST/PATCH/DELETE /items/bulk/ - Create, update or delete many items
+    - GET /items/stats/ - Total, active and bought counts
+    - GET /items/changes/?since=<seq> - Upserts and deletes after a sync point
+    - GET /items/search/?q= - Items whose name has a word starting with q
+    - GET /items/autocomplete/?q= - Names from the list's history for q
+    - GET /items/usual/ - Names bought regularly that are not on the list
+    - GET /items/export/ - Stream the list as NDJSON or CSV
+    - POST /items/import/ - Add items from an NDJSON or CSV body
+    - POST /items/replay/ - Apply a batch of queued offline writes
+    
+    The same routes are mounted under /lists/{list_id}/items/; every query
+    is scoped to that list. The bare /items/ routes use the default list.
+    
+    POST, PATCH and DELETE accept an Idempotency-Key header; a retry with
+    the same key gets the first response back instead of writing again.
+    PATCH and toggle also accept If-Match with the item's ETag, and fail
+    with 412 if the item has changed since.
+    
+    Requests are rate limited per client and overall (see throttling.py);
+    a throttled request gets 429 with Retry-After.
     """
     
     queryset = GroceryItem.objects.all().order_by('created_at')
     serializer_class = GroceryItemSerializer
+    pagination_class = KeysetPagination
+    renderer_classes = [GroceryItemJSONRenderer, *COLUMNAR_RENDERERS, BrowsableAPIRenderer]
+    throttle_classes = ITEM_THROTTLES
     lookup_field = 'pk'
+    bulk_max_items = 500
+    search_default_limit = 10
+    search_max_limit = 50
+    
+    def dispatch(self, request, *args, **kwargs):
+        # A keyed write and its stored response commit together
+        if request.method in idempotency.METHODS and idempotency.HEADER in request.headers:
+            with transaction.atomic():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+    
+    def initial(self, request, *args, **kwargs):
+        self.idempotency_key = None
+        super().initial(request, *args, **kwargs)
+        self.grocery_list_id = self.get_grocery_list_id()
+        
+        if request.method in idempotency.METHODS:
+            key = request.headers.get(idempotency.HEADER)
+            if key is not None:
+                self.idempotency_fingerprint = idempotency.fingerprint(
+                    request.method, request.path
+                )
+                record = idempotency.get_record(idempotency.validate_key(key))
+                if record is not None:
+                    raise idempotency.Replayed(
+                        idempotency.replay(record, self.idempotency_fingerprint)
+                    )
+                self.idempotency_key = key
+    
+    def finalize_response(self, request, response, *args, **kwargs):
+        key, self.idempotency_key = getattr(self, 'idempotency_key', None), None
+        if key is not None:
+            if response.status_code >= 500:
+                transaction.set_rollback(True)
+            else:
+                try:
+                    winner = idempotency.save_record(
+                        key, self.idempotency_fingerprint, response
+                    )
+                    if winner is not None:
+                        # A concurrent retry got there first; undo ours
+                        transaction.set_rollback(True)
+                        response = idempotency.replay(winner, self.idempotency_fingerprint)
+                except APIException as exc:
+                    transaction.set_rollback(True)
+                    response = self.error_response(exc)
+        return super().finalize_response(request, response, *args, **kwargs)
+    
+    def get_grocery_list_id(self):
+        """Return the id of the list in the URL, or the default list"""
+        list_pk = self.kwargs.get('list_pk')
+        if list_pk is None:
+            return DEFAULT_LIST_ID
+        try:
+            return GroceryList.objects.values_list('pk', flat=True).get(pk=list_pk)
+        except (GroceryList.DoesNotExist, ValueError, ValidationError):
+            raise ListNotFound()
+    
+    def get_queryset(self):
+        """Return this list's items; filters lead the (list, created_at) indexes"""
+        return GroceryItem.objects.filter(
+            grocery_list_id=self.grocery_list_id
+        ).order_by('created_at')
+    
+    def handle_exception(self, exc):
+        if isinstance(exc, idempotency.Replayed):
+            return exc.response
+        if isinstance(exc, (
+            ListNotFound,
+            Throttled,
+            PreconditionFailed,
+            idempotency.InvalidIdempotencyKey,
+            idempotency.IdempotencyKeyReused,
+            idempotency.IdempotencyKeyInUse
+        )):
+            return self.error_response(exc)
+        return super().handle_exception(exc)
+    
+    def error_response(self, exc):
+        """Render an APIException in the API's {"error": ...} shape"""
+        response = Response({"error": str(exc.detail)}, status=exc.status_code)
+        if getattr(exc, 'wait', None):
+            response['Retry-After'] = str(math.ceil(exc.wait))
+        return response
     
     def get_serializer_class(self):
         """Return appropriate serializer based on action"""
-        if self.action == 'create':
+        if self.action in ('create', 'bulk'):
             return GroceryItemCreateSerializer
         elif self.action == 'partial_update':
             return GroceryItemUpdateSerializer
+        elif self.action == 'bulk_update':
+            return GroceryItemBulkUpdateSerializer
+        elif self.action == 'bulk_destroy':
+            return GroceryItemBulkDeleteSerializer
+        elif self.action == 'replay':
+            return GroceryItemOperationSerializer
         return GroceryItemSerializer
     
     def list(self, request, *args, **kwargs):
         """
         GET /items/
-        Retrieve all grocery items
+        Retrieve all grocery items, or one keyset page of them
+        
+        Honours If-None-Match and answers 304 without touching any rows
+        when the list has not changed. Rows are rendered
+        straight from values_list (see rendering.py), not the serializer,
+        and the payload is cached together with its validators (cache.py),
+        so a cache hit costs no queries at all.
+        
+        A columnar renderer (Accept: application/vnd.grocery.columns+json
+        or application/msgpack) gets one array per field instead of rows.
+        
+        Unpaginated JSON lists of GROCERY_STREAM_LIST_MIN_ITEMS items or
+        more are streamed from a cursor a chunk at a time (transfer.py)
+        instead, and not cached, so memory does not grow with the list.
+        
+        ?bought=, ?created_after=, ?updated_since=, ?ordering= and ?fields=
+        filter, order and project the rows in SQL (see filters.py).
         """
         try:
-            queryset = self.get_queryset()
-            serializer = self.get_serializer(queryset, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            query = ListQuery(request.query_params, self.paginator.is_requested(request))
+            queryset = query.filter(self.get_queryset())
+            representation = request.accepted_renderer.format
+            build = (
+                item_columns if getattr(request.accepted_renderer, 'columnar', False)
+                else item_dicts
+            )
+            
+            key = list_cache.list_key(request, self.grocery_list_id, representation)
+            entry = list_cache.get_entry(key)
+            if entry is not None:
+                etag, data = entry
+                count = None
+            else:
+                etag, count = list_validators(request, queryset, representation)
+                data = None
+            
+            cached = not_modified(request, etag)
+            if cached is not None:
+                return set_validators(cached, etag)
+            
+            if (
+                data is None
+                and not self.paginator.is_requested(request)
+                and transfer.streams_list(
+                    count, request.accepted_renderer, request.accepted_media_type
+                )
+            ):
+                response = self.streaming_response(request, queryset, 'json', query.fields)
+                return set_validators(response, etag)
+            
+            if data is None:
+                rows = query.rows(queryset)
+                page = self.paginate_queryset(rows)
+                if page is not None:
+                    data = self.get_paginated_response(build(page, query.fields)).data
+                else:
+                    data = build(rows, query.fields)
+                list_cache.set_entry(key, (etag, data))
+            
+            response = Response(data, status=status.HTTP_200_OK)
+            return set_validators(response, etag)
+        except InvalidListQuery as e:
+            return Response(
+                {"error": str(e.detail)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except NotFound as e:
+            return Response(
+                {"error": str(e.detail)},
+                status=status.HTTP_404_NOT_FOUND
+            )
         except Exception as e:
             logger.error(f"Error retrieving grocery items: {str(e)}")
             return Response(
@@ -64,7 +329,7 @@ class GroceryItemViewSet(viewsets.ModelViewSet):
             serializer = self.get_serializer(data=request.data)
             
             if serializer.is_valid():
-                item = serializer.save()
+                item = serializer.save(grocery_list_id=self.grocery_list_id)
                 
                 # Return the created item using the display serializer
                 response_serializer = GroceryItemSerializer(item)
@@ -90,15 +355,23 @@ class GroceryItemViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    def retrieve(self, request, pk=None):
+    def retrieve(self, request, pk=None, **kwargs):
         """
         GET /items/{id}/
         Retrieve a specific grocery item
         """
         try:
-            item = get_object_or_404(GroceryItem, pk=pk)
-            serializer = self.get_serializer(item)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            item = get_object_or_404(
+                item_rows(self.get_queryset(), 'updated_at'), pk=pk
+            )
+            
+            etag, last_modified = item_validators(item)
+            cached = not_modified(request, etag, last_modified)
+            if cached is not None:
+                return set_validators(cached, etag, last_modified)
+            
+            response = Response(item_dict(item), status=status.HTTP_200_OK)
+            return set_validators(response, etag, last_modified)
         except Http404:
             return Response(
                 {"error": "Item not found"},
@@ -111,35 +384,45 @@ class GroceryItemViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    def partial_update(self, request, pk=None):
+    def partial_update(self, request, pk=None, **kwargs):
         """
         PATCH /items/{id}/
         Update grocery item status (bought field only)
+        
+        The new value is written with a single UPDATE, not read and saved
+        back, so concurrent PATCHes cannot undo each other.
         """
         try:
-            item = get_object_or_404(GroceryItem, pk=pk)
-            serializer = self.get_serializer(item, data=request.data, partial=True)
+            serializer = self.get_serializer(data=request.data, partial=True)
             
             if serializer.is_valid():
-                updated_item = serializer.save()
+                if 'bought' in serializer.validated_data:
+                    updated_item = update_bought(
+                        self.grocery_list_id,
+                        pk,
+                        serializer.validated_data['bought'],
+                        if_match_versions(request, pk)
+                    )
+                else:
+                    # Nothing to change; saved anyway, which marks it updated
+                    updated_item = get_object_or_404(self.get_queryset(), pk=pk)
+                    updated_item.save()
                 
                 # Return the updated item using the display serializer
-                response_serializer = GroceryItemSerializer(updated_item)
-                return Response(
-                    response_serializer.data, 
-                    status=status.HTTP_200_OK
-                )
+                return self.written_item_response(updated_item)
             else:
                 return Response(
                     serializer.errors, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
                 
-        except Http404:
+        except (Http404, GroceryItem.DoesNotExist):
             return Response(
                 {"error": "Item not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
+        except PreconditionFailed as e:
+            return self.error_response(e)
         except ValidationError as e:
             return Response(
                 {"error": str(e)},
@@ -152,13 +435,53 @@ class GroceryItemViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    def destroy(self, request, pk=None):
+    @action(detail=True, methods=['post'])
+    def toggle(self, request, pk=None, **kwargs):
+        """
+        POST /items/{id}/toggle/
+        Flip the bought field in one statement
+        
+        Two taps at once flip the item twice rather than both writing the
+        same value. Send an Idempotency-Key so a retried tap is not applied
+        again.
+        """
+        try:
+            item = update_bought(
+                self.grocery_list_id, pk, expected=if_match_versions(request, pk)
+            )
+            return self.written_item_response(item)
+        except GroceryItem.DoesNotExist:
+            return Response(
+                {"error": "Item not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except PreconditionFailed as e:
+            return self.error_response(e)
+        except ValidationError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"Error toggling grocery item {pk}: {str(e)}")
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    def written_item_response(self, item):
+        """The written item, with its new ETag for the next conditional write"""
+        response = Response(GroceryItemSerializer(item).data, status=status.HTTP_200_OK)
+        response['ETag'] = item_validators(item)[0]
+        return response
+    
+    def destroy(self, request, pk=None, **kwargs):
         """
         DELETE /items/{id}/
         Delete a grocery item
         """
         try:
-            item = get_object_or_404(GroceryItem, pk=pk)
+            item = get_object_or_404(self.get_queryset(), pk=pk)
             item.delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
             
@@ -174,7 +497,7 @@ class GroceryItemViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    def update(self, request, pk=None):
+    def update(self, request, pk=None, **kwargs):
         """
         PUT /items/{id}/
         Full update not allowed - return 405 Method Not Allowed
@@ -184,6 +507,633 @@ class GroceryItemViewSet(viewsets.ModelViewSet):
             status=status.HTTP_405_METHOD_NOT_ALLOWED
         )
     
+    def _bulk_payload_error(self, payload):
+        """Return an error response if a bulk payload is not a sane list"""
+        if not isinstance(payload, list):
+            return Response(
+                {"error": "Expected a list of items"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not payload:
+            return Response(
+                {"error": "Expected at least one item"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(payload) > self.bulk_max_items:
+            return Response(
+                {"error": f"Cannot process more than {self.bulk_max_items} items at once"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return None
+    
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request, **kwargs):
+        """
+        POST /items/bulk/
+        Create many grocery items with a single INSERT
+        
+        The whole array is validated first; if any entry is invalid nothing is
+        written and the response lists the errors by position.
+        """
+        try:
+            error = self._bulk_payload_error(request.data)
+            if error is not None:
+                return error
+            
+            serializer = self.get_serializer(data=request.data, many=True)
+            if not serializer.is_valid():
+                return Response(
+                    serializer.errors,
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            items = [
+                GroceryItem(
+                    name=entry['name'],
+                    bought=False,
+                    grocery_list_id=self.grocery_list_id
+                )
+                for entry in serializer.validated_data
+            ]
+            transfer.create_items(self.grocery_list_id, items)
+            
+            response_serializer = GroceryItemSerializer(items, many=True)
+            return Response(
+                response_serializer.data,
+                status=status.HTTP_201_CREATED
+            )
+        except Exception as e:
+            logger.error(f"Error bulk creating grocery items: {str(e)}")
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @bulk.mapping.patch
+    def bulk_update(self, request, **kwargs):
+        """
+        PATCH /items/bulk/
+        Update the bought field of many items with a single UPDATE
+        
+        Body: [{"id": "<uuid>", "bought": true}, ...]. Unknown ids are reported
+        by position and nothing is written.
+        """
+        try:
+            error = self._bulk_payload_error(request.data)
+            if error is not None:
+                return error
+            
+            serializer = self.get_serializer(data=request.data, many=True)
+            if not serializer.is_valid():
+                return Response(
+                    serializer.errors,
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # Later entries for the same id win, like sequential PATCHes would
+            changes = {
+                entry['id']: entry['bought']
+                for entry in serializer.validated_data
+            }
+            
+            with transaction.atomic():
+                existing = dict(
+                    self.get_queryset()
+                    .select_for_update()
+                    .filter(id__in=changes)
+                    .order_by()
+                    .values_list('id', 'bought')
+                )
+                missing = [
+                    {"id": ["Item not found"]} if entry['id'] not in existing else {}
+                    for entry in serializer.validated_data
+                ]
+                if len(existing) != len(changes):
+                    return Response(missing, status=status.HTTP_400_BAD_REQUEST)
+                
+                bought_ids = [pk for pk, bought in changes.items() if bought]
+                self.get_queryset().filter(id__in=changes).update(
+                    bought=Case(
+                        When(id__in=bought_ids, then=Value(True)),
+                        default=Value(False)
+                    ),
+                    updated_at=timezone.now(),
+                    change_seq=GroceryList.next_change_seq(self.grocery_list_id)
+                )
+                items = list(self.get_queryset().filter(id__in=changes))
+                bought_delta = sum(
+                    int(bought) - int(existing[pk]) for pk, bought in changes.items()
+                )
+                bulk_items_changed.send(
+                    sender=GroceryItem,
+                    grocery_list_id=self.grocery_list_id,
+                    updated=items,
+                    bought_delta=bought_delta,
+                    newly_bought=[
+                        item for item in items if item.bought and not existing[item.pk]
+                    ]
+                )
+                response_serializer = GroceryItemSerializer(items, many=True)
+                data = response_serializer.data
+            
+            return Response(data, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error bulk updating grocery items: {str(e)}")
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @bulk.mapping.delete
+    def bulk_destroy(self, request, **kwargs):
+        """
+        DELETE /items/bulk/
+        Delete many items with a single DELETE
+        
+        Either send {"ids": [...]} in the body, or pass ?bought=true to clear
+        every bought item (?bought=false clears the items still to buy).
+        """
+        try:
+            bought = request.query_params.get('bought')
+            if bought is not None:
+                if bought not in ('true', 'false'):
+                    return Response(
+                        {"error": "bought must be 'true' or 'false'"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                queryset = self.get_queryset().filter(bought=(bought == 'true'))
+            else:
+                serializer = self.get_serializer(data=request.data)
+                if not serializer.is_valid():
+                    return Response(
+                        serializer.errors,
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                ids = serializer.validated_data['ids']
+                if len(ids) > self.bulk_max_items:
+                    return Response(
+                        {"error": f"Cannot process more than {self.bulk_max_items} items at once"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                queryset = self.get_queryset().filter(id__in=ids)
+            
+            # A constant number of queries however many rows go: one DELETE,
+            # one stats update, one change seq reservation and one tombstone
+            # INSERT, rather than a post_delete round per row
+            with transaction.atomic():
+                rows = delete_returning(queryset, 'id', 'bought')
+                if rows:
+                    bulk_items_changed.send(
+                        sender=GroceryItem,
+                        grocery_list_id=self.grocery_list_id,
+                        deleted=[pk for pk, _ in rows],
+                        bought_delta=-sum(bought for _, bought in rows)
+                    )
+            
+            return Response({"deleted": len(rows)}, status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error bulk deleting grocery items: {str(e)}")
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @action(detail=False, methods=['post'], url_path='replay')
+    def replay(self, request, **kwargs):
+        """
+        POST /items/replay/
+        Apply a client's queued offline writes in order, in one transaction
+        
+        Body: [{"key": "<idempotency key>", "op": "create", "name": "Milk"},
+        {"key": ..., "op": "update", "id": "<uuid>", "bought": true},
+        {"key": ..., "op": "delete", "id": "<uuid>"}, ...]. Returns one
+        {"key", "status", "replayed", "body"} result per operation, matching
+        what the single POST/PATCH/DELETE would have answered. Keys are
+        shared with the Idempotency-Key header, so resending a batch, or
+        part of one that already went through, never writes twice. A failed
+        operation (e.g. 404 for an item deleted elsewhere) does not stop
+        the ones after it.
+        """
+        try:
+            error = self._bulk_payload_error(request.data)
+            if error is not None:
+                return error
+            
+            serializer = self.get_serializer(data=request.data, many=True)
+            if not serializer.is_valid():
+                return Response(
+                    serializer.errors,
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            results = []
+            with transaction.atomic():
+                for entry in serializer.validated_data:
+                    response, replayed = self._replay_operation(entry)
+                    results.append({
+                        "key": entry['key'],
+                        "status": response.status_code,
+                        "replayed": replayed,
+                        "body": response.data
+                    })
+            
+            return Response({"results": results}, status=status.HTTP_200_OK)
+        except idempotency.IdempotencyKeyInUse as e:
+            return self.error_response(e)
+        except Exception as e:
+            logger.error(f"Error replaying grocery item operations: {str(e)}")
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    def _replay_operation(self, entry):
+        """Run one queued operation once per key; returns (response, replayed)"""
+        route_kwargs = {
+            name: value for name, value in self.kwargs.items() if name == 'list_pk'
+        }
+        if entry['op'] == 'create':
+            method, path = 'POST', reverse(f'{self.basename}-list', kwargs=route_kwargs)
+        else:
+            method = 'PATCH' if entry['op'] == 'update' else 'DELETE'
+            path = reverse(
+                f'{self.basename}-detail', kwargs={**route_kwargs, 'pk': entry['id']}
+            )
+        fingerprint = idempotency.fingerprint(method, path)
+        
+        try:
+            record = idempotency.get_record(entry['key'])
+            if record is not None:
+                return idempotency.replay(record, fingerprint), True
+            
+            with transaction.atomic():
+                response = self._apply_operation(entry)
+                winner = idempotency.save_record(entry['key'], fingerprint, response)
+                if winner is not None:
+                    transaction.set_rollback(True)
+                    return idempotency.replay(winner, fingerprint), True
+            return response, False
+        except idempotency.IdempotencyKeyReused as e:
+            return self.error_response(e), False
+    
+    def _apply_operation(self, entry):
+        """Apply one queued create/update/delete and return its response"""
+        if entry['op'] == 'create':
+            data = {'name': entry['name']} if 'name' in entry else {}
+            serializer = GroceryItemCreateSerializer(data=data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            item = serializer.save(grocery_list_id=self.grocery_list_id)
+            return Response(GroceryItemSerializer(item).data, status=status.HTTP_201_CREATED)
+        
+        if entry['op'] == 'update' and 'bought' in entry:
+            serializer = GroceryItemUpdateSerializer(data={'bought': entry['bought']}, partial=True)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            # The single UPDATE a live PATCH makes, so replays cannot race
+            try:
+                item = update_bought(
+                    self.grocery_list_id, entry['id'], serializer.validated_data['bought']
+                )
+            except GroceryItem.DoesNotExist:
+                return Response({"error": "Item not found"}, status=status.HTTP_404_NOT_FOUND)
+            return Response(GroceryItemSerializer(item).data, status=status.HTTP_200_OK)
+        
+        item = self.get_queryset().filter(pk=entry['id']).first()
+        if item is None:
+            return Response({"error": "Item not found"}, status=status.HTTP_404_NOT_FOUND)
+        if entry['op'] == 'delete':
+            item.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        
+        # Nothing to change; saved anyway, which marks it updated
+        item.save()
+        return Response(GroceryItemSerializer(item).data, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get'], url_path='stats')
+    def stats(self, request, **kwargs):
+        """
+        GET /items/stats/
+        Total, active and bought counts from the maintained counters row
+        """
+        try:
+            stats = GroceryItemStats.current(self.grocery_list_id)
+            return Response(
+                {"total": stats.total, "active": stats.active, "bought": stats.bought},
+                status=status.HTTP_200_OK
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving grocery item stats: {str(e)}")
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @action(detail=False, methods=['get'], url_path='changes')
+    def changes(self, request, **kwargs):
+        """
+        GET /items/changes/?since=<seq>
+        Items written and ids deleted since a previous sync
+        
+        Send back the returned ``seq`` as ``since`` next time. ``reset`` is
+        true when ``since`` is 0 or older than the retained tombstones: the
+        upserts are then the whole list and the client should drop
+        anything else it holds.
+        """
+        try:
+            since = request.query_params.get('since', '0')
+            if not (since.isascii() and since.isdigit()):
+                return Response(
+                    {"error": "since must be a non-negative integer"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            since = int(since)
+            
+            seq, compacted_seq = GroceryList.objects.values_list(
+                'change_seq', 'compacted_seq'
+            ).get(pk=self.grocery_list_id)
+            reset = since == 0 or since < compacted_seq or since > seq
+            
+            if reset:
+                rows = item_rows(self.get_queryset())
+                deletes = []
+            else:
+                # Writes numbered above seq are still committing; they are
+                # picked up by the next sync
+                rows = item_rows(
+                    self.get_queryset()
+                    .filter(change_seq__gt=since, change_seq__lte=seq)
+                    .order_by('change_seq')
+                )
+                deletes = [
+                    str(pk) for pk in GroceryItemTombstone.objects.filter(
+                        grocery_list_id=self.grocery_list_id,
+                        change_seq__gt=since,
+                        change_seq__lte=seq
+                    ).order_by('change_seq').values_list('id', flat=True)
+                ]
+            
+            return Response(
+                {
+                    "seq": seq,
+                    "reset": reset,
+                    "upserts": item_dicts(rows),
+                    "deletes": deletes
+                },
+                status=status.HTTP_200_OK
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving grocery item changes: {str(e)}")
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    def _limit_param(self, request):
+        """Return ?limit= for the search style actions, or an error response"""
+        limit = request.query_params.get('limit', str(self.search_default_limit))
+        valid = limit.isascii() and limit.isdigit()
+        if not valid or not 1 <= int(limit) <= self.search_max_limit:
+            return None, Response(
+                {"error": f"limit must be between 1 and {self.search_max_limit}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return int(limit), None
+    
+    def _search_params(self, request):
+        """Return (q, limit) from the query string, or an error response"""
+        q = ' '.join(request.query_params.get('q', '').split())
+        if not q:
+            return None, Response(
+                {"error": "q is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit, error = self._limit_param(request)
+        if error is not None:
+            return None, error
+        return (q[:100], limit), None
+    
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request, **kwargs):
+        """
+        GET /items/search/?q=<text>&limit=<n>
+        Items on the list with a word starting with ``q``, case-insensitive
+        
+        Matches go through the name history's word index, and items whose
+        name has been added most often (then most recently) come first.
+        """
+        try:
+            params, error = self._search_params(request)
+            if error is not None:
+                return error
+            q, limit = params
+            
+            # Walk matching names best first and pick up the items that carry
+            # them, in doubling batches of names, until the page is full
+            ranked = GroceryItemName.matching(self.grocery_list_id, q).values_list(
+                'key', flat=True
+            )
+            queryset = self.get_queryset().annotate(name_upper=Upper('name'))
+            rows = []
+            start, size = 0, limit
+            while len(rows) < limit:
+                keys = list(ranked[start:start + size])
+                if not keys:
+                    break
+                rank = {key: position for position, key in enumerate(keys)}
+                batch = item_rows(queryset.filter(name_upper__in=keys), 'name_upper')
+                rows.extend(sorted(
+                    sorted(batch, key=lambda row: row.created_at, reverse=True),
+                    key=lambda row: rank.get(row.name_upper, len(rank))
+                ))
+                start, size = start + size, size * 2
+            return Response(item_dicts(rows[:limit]), status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error searching grocery items: {str(e)}")
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @action(detail=False, methods=['get'], url_path='autocomplete')
+    def autocomplete(self, request, **kwargs):
+        """
+        GET /items/autocomplete/?q=<text>&limit=<n>
+        Suggest names the household has added before, for an add-item box
+        
+        Includes names no longer on the list, most often added first.
+        """
+        try:
+            params, error = self._search_params(request)
+            if error is not None:
+                return error
+            q, limit = params
+            
+            names = GroceryItemName.matching(self.grocery_list_id, q).values_list(
+                'name', 'times_added', 'last_added_at'
+            )[:limit]
+            return Response(
+                [
+                    {
+                        "name": name,
+                        "timesAdded": times_added,
+                        "lastAddedAt": format_timestamp(last_added_at)
+                    }
+                    for name, times_added, last_added_at in names
+                ],
+                status=status.HTTP_200_OK
+            )
+        except Exception as e:
+            logger.error(f"Error autocompleting grocery item names: {str(e)}")
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @action(detail=False, methods=['get'], url_path='usual')
+    def usual(self, request, **kwargs):
+        """
+        GET /items/usual/?limit=<n>
+        Names the household buys regularly that are not on the list to buy
+        
+        Read from the purchase rollups, soonest due first (overdue names
+        lead), so the cost does not grow with years of purchase history.
+        """
+        try:
+            limit, error = self._limit_param(request)
+            if error is not None:
+                return error
+            
+            on_list = GroceryItem.objects.alias(name_upper=Upper('name')).filter(
+                grocery_list_id=OuterRef('grocery_list_id'),
+                name_upper=OuterRef('key'),
+                bought=False
+            )
+            rollups = GroceryItemPurchaseRollup.objects.filter(
+                grocery_list_id=self.grocery_list_id,
+                next_due_at__isnull=False
+            ).filter(~Exists(on_list)).order_by('next_due_at')[:limit]
+            
+            return Response(
+                [
+                    {
+                        "name": rollup.name,
+                        "timesBought": rollup.times_bought,
+                        "lastBoughtAt": format_timestamp(rollup.last_bought_at),
+                        "averageIntervalDays": round(
+                            rollup.average_interval.total_seconds() / 86400, 1
+                        ),
+                        "dueAt": format_timestamp(rollup.next_due_at)
+                    }
+                    for rollup in rollups
+                ],
+                status=status.HTTP_200_OK
+            )
+        except Exception as e:
+            logger.error(f"Error retrieving usual grocery items: {str(e)}")
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @action(
+        detail=False, methods=['get'], url_path='export',
+        renderer_classes=EXPORT_RENDERERS
+    )
+    def export(self, request, **kwargs):
+        """
+        GET /items/export/
+        Stream every item of the list as NDJSON or CSV
+        
+        NDJSON by default; CSV with ?format=csv or Accept: text/csv. Rows are
+        read and written a chunk at a time, so memory use does not grow
+        with the list.
+        """
+        try:
+            renderer = request.accepted_renderer
+            response = self.streaming_response(request, self.get_queryset(), renderer.format)
+            response['Content-Disposition'] = (
+                f'attachment; filename="grocery-items.{renderer.format}"'
+            )
+            return response
+        except Exception as e:
+            logger.error(f"Error exporting grocery items: {str(e)}")
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    def streaming_response(self, request, queryset, fmt, fields=None):
+        """Stream ``queryset`` encoded as ``fmt`` (see transfer.py)"""
+        # Under ASGI a sync iterator would be consumed whole on a thread
+        if isinstance(request._request, ASGIRequest):
+            content = transfer.aexport_items(queryset, fmt, fields=fields)
+        else:
+            content = transfer.export_items(queryset, fmt, fields=fields)
+        return StreamingHttpResponse(content, content_type=request.accepted_renderer.media_type)
+    
+    @action(detail=False, methods=['post'], url_path='import', url_name='import')
+    def import_items(self, request, **kwargs):
+        """
+        POST /items/import/
+        Add the items in a CSV or NDJSON body
+        
+        Send Content-Type text/csv (with a header row naming a "name" and
+        optionally a "bought" column) or application/x-ndjson. The body is
+        read a line at a time and inserted in batches; rows that break the
+        name rules are skipped and listed in the report.
+        """
+        fmt = transfer.IMPORT_CONTENT_TYPES.get(request.content_type.split(';')[0].strip())
+        if fmt is None:
+            return Response(
+                {"error": "Send text/csv or application/x-ndjson"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        report = transfer.ImportReport()
+        try:
+            stream = request.stream
+            lines = transfer.decode_lines(stream if stream is not None else [])
+            transfer.import_items(lines, fmt, self.grocery_list_id, report=report)
+            return Response(report.as_dict(), status=status.HTTP_200_OK)
+        except transfer.MalformedInput as e:
+            return Response(
+                {"error": str(e), **report.as_dict()},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"Error importing grocery items: {str(e)}")
+            return Response(
+                {"error": "Internal server error", **report.as_dict()},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    def get_object(self):
+        """
+        Override to handle invalid UUIDs gracefully
+        """
+        try:
+            return super().get_object()
+        except (ValueError, ValidationError):
+            raise Http404("Invalid item ID format")
+
+
+class GroceryListViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for managing grocery lists (households)
+    
+    - GET /lists/ - List all lists
+    - POST /lists/ - Create a list
+    - GET /lists/{id}/ - Retrieve a list
+    - PATCH /lists/{id}/ - Rename a list
+    - DELETE /lists/{id}/ - Delete a list and its items
+    
+    Items live under /lists/{id}/items/ (see GroceryItemViewSet).
+    """
+    
+    queryset = GroceryList.objects.all().order_by('created_at')
+    serializer_class = GroceryListSerializer
+    http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
+    
     def get_object(self):
         """
         Override to handle invalid UUIDs gracefully
@@ -191,4 +1141,164 @@ class GroceryItemViewSet(viewsets.ModelViewSet):
         try:
             return super().get_object()
         except (ValueError, ValidationError):
-            raise Http404("Invalid item ID format")
\ No newline at end of file
+            raise Http404("Invalid list ID format")
+    
+    def destroy(self, request, *args, **kwargs):
+        """
+        DELETE /lists/{id}/
+        The default list backs the legacy /items/ routes and cannot be deleted
+        """
+        if self.get_object().pk == DEFAULT_LIST_ID:
+            return Response(
+                {"error": "The default list cannot be deleted"},
+                status=status.HTTP_409_CONFLICT
+            )
+        return super().destroy(request, *args, **kwargs)
+
+
+def _format_event(event):
+    """Format a change event as a Server-Sent Events frame"""
+    return (
+        f"id: {event['id']}\n"
+        f"event: {event['type']}\n"
+        f"data: {json.dumps(event['data'], separators=(',', ':'))}\n\n"
+    )
+
+
+async def item_stream(request, list_pk=None):
+    """
+    GET /items/stream/ and /lists/{list_id}/items/stream/
+    Server-Sent Events feed of one list's item create/update/delete deltas
+    
+    Reconnecting clients send the last event id they saw (Last-Event-ID
+    header, or ?last_event_id=) and receive only the events they missed.
+    If that is no longer possible a ``reset`` event tells them to refetch
+    the full list. Requires an ASGI server.
+    """
+    if request.method != 'GET':
+        return JsonResponse(
+            {"error": "Method not allowed"},
+            status=status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"error": "Streaming requires an ASGI server"},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    
+    if list_pk is not None:
+        if not await GroceryList.objects.filter(pk=list_pk).aexists():
+            return JsonResponse(
+                {"error": "List not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+    scope = str(list_pk or DEFAULT_LIST_ID)
+    
+    backend = get_event_backend()
+    last_event_id = (
+        request.headers.get('Last-Event-ID')
+        or request.GET.get('last_event_id')
+    )
+    heartbeat = getattr(settings, 'GROCERY_EVENTS_HEARTBEAT', 15)
+    
+    async def event_source():
+        # Subscribe before reading the backlog so nothing falls in between
+        subscription = backend.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            
+            missed = backend.events_since(last_event_id) if last_event_id else None
+            if missed is None:
+                token = backend.current_token()
+                yield _format_event({'id': token, 'type': 'reset', 'data': {}})
+                missed = []
+            
+            missed = [event for event in missed if event.get('list') == scope]
+            sent = {event['id'] for event in missed}
+            for event in missed:
+                yield _format_event(event)
+            
+            while True:
+                if subscription.overflowed and subscription.queue.empty():
+                    # Events were dropped while this client lagged behind
+                    yield _format_event(
+                        {'id': backend.current_token(), 'type': 'reset', 'data': {}}
+                    )
+                    return
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event.get('list') != scope:
+                    continue
+                if event['id'] in sent:
+                    sent.discard(event['id'])
+                    continue
+                yield _format_event(event)
+        finally:
+            backend.unsubscribe(subscription)
+    
+    response = StreamingHttpResponse(event_source(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _may_read_metrics(request):
+    """Whether ``request`` is a staff session or carries the metrics token"""
+    if getattr(settings, 'GROCERY_METRICS_PUBLIC', False):
+        return True
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    token = getattr(settings, 'GROCERY_METRICS_TOKEN', None)
+    scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    return (
+        bool(token)
+        and scheme.lower() == 'bearer'
+        and constant_time_compare(credentials.strip(), token)
+    )
+
+
+def metrics_view(request):
+    """
+    GET /metrics/
+    Aggregated request metrics in the Prometheus text format
+    
+    Served to staff and to ``Authorization: Bearer`` requests with
+    ``settings.GROCERY_METRICS_TOKEN``, or to anyone with
+    ``GROCERY_METRICS_PUBLIC``.
+    """
+    if request.method != 'GET':
+        return JsonResponse(
+            {"error": "Method not allowed"},
+            status=status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+    if not _may_read_metrics(request):
+        return JsonResponse(
+            {"error": "Metrics require a staff login or the metrics token"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    return HttpResponse(
+        render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+def health_view(request):
+    """
+    GET /health/
+    Liveness check that also round-trips to the database
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+    except Exception as e:
+        logger.error(f"Health check failed: {str(e)}")
+        return JsonResponse(
+            {"status": "unavailable"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    return JsonResponse({"status": "ok", "database": connection.vendor})
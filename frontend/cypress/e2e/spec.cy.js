@@ -10,9 +10,15 @@ describe('Family Grocery List - E2E Tests', () => {
     { id: '3', name: 'Eggs', bought: false, createdAt: '2023-08-15T14:32:00Z' }
   ];
 
+  // The app loads each section with its own ?bought= request
+  const interceptItems = (items) => cy.intercept('GET', `${API_BASE}/items`, (req) => {
+    const bought = req.query.bought === 'true';
+    req.reply({ body: items.filter(item => item.bought === bought) });
+  });
+
   beforeEach(() => {
     // Intercept API calls and provide mock responses
-    cy.intercept('GET', `${API_BASE}/items`, { body: testItems }).as('getItems');
+    interceptItems(testItems).as('getItems');
     cy.intercept('POST', `${API_BASE}/items`, { statusCode: 201 }).as('addItem');
     cy.intercept('PATCH', `${API_BASE}/items/*`, { statusCode: 200 }).as('updateItem');
     cy.intercept('DELETE', `${API_BASE}/items/*`, { statusCode: 204 }).as('deleteItem');
@@ -71,9 +77,9 @@ describe('Family Grocery List - E2E Tests', () => {
         body: { id: '4', name: 'Cheese', bought: false, createdAt: '2023-08-15T14:33:00Z' }
       }).as('addNewItem');
 
-      cy.intercept('GET', `${API_BASE}/items`, { 
-        body: [...testItems, { id: '4', name: 'Cheese', bought: false, createdAt: '2023-08-15T14:33:00Z' }]
-      }).as('getUpdatedItems');
+      interceptItems(
+        [...testItems, { id: '4', name: 'Cheese', bought: false, createdAt: '2023-08-15T14:33:00Z' }]
+      ).as('getUpdatedItems');
 
       cy.get('[data-cy="add-item-input"]').type('Cheese');
       cy.get('[data-cy="add-item-button"]').click();
@@ -342,7 +348,7 @@ describe('Family Grocery List - E2E Tests', () => {
     it('should show empty state for active items when none exist', () => {
       const boughtOnlyItems = testItems.map(item => ({ ...item, bought: true }));
       
-      cy.intercept('GET', `${API_BASE}/items`, { body: boughtOnlyItems }).as('getBoughtOnly');
+      interceptItems(boughtOnlyItems).as('getBoughtOnly');
       cy.reload();
       cy.wait('@getBoughtOnly');
 
@@ -356,7 +362,7 @@ describe('Family Grocery List - E2E Tests', () => {
     it('should show empty state for bought items when none exist', () => {
       const activeOnlyItems = testItems.map(item => ({ ...item, bought: false }));
       
-      cy.intercept('GET', `${API_BASE}/items`, { body: activeOnlyItems }).as('getActiveOnly');
+      interceptItems(activeOnlyItems).as('getActiveOnly');
       cy.reload();
       cy.wait('@getActiveOnly');
 
@@ -368,7 +374,7 @@ describe('Family Grocery List - E2E Tests', () => {
     });
 
     it('should show empty states when no items exist at all', () => {
-      cy.intercept('GET', `${API_BASE}/items`, { body: [] }).as('getEmpty');
+      interceptItems([]).as('getEmpty');
       cy.reload();
       cy.wait('@getEmpty');
 
@@ -11,19 +11,27 @@ import { LoadingProvider } from './LoadingContext'
 
 // API base URL - update this to match your API endpoint
 const API_BASE_URL = 'http://127.0.0.1:8000/api'; // Change this to your actual API URL
+// The fields the item sections show
+const ITEM_FIELDS = 'id,name,createdAt';
 
 function App() {
   const [items, setItems] = useState([]);
   const [loading, setLoading] = useState(true);
   const [notification, setNotification] = useState({ message: '', visible: false });
 
-  // Fetch all items from API
+  // Fetch the items to buy and the bought items from API, each filtered
+  // and trimmed to the shown fields by the server
   const fetchItems = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/items/`);
-      if (response.ok) {
-        const data = await response.json();
-        setItems(data);
+      const responses = await Promise.all([false, true].map(bought =>
+        fetch(`${API_BASE_URL}/items/?bought=${bought}&fields=${ITEM_FIELDS}`)
+      ));
+      if (responses.every(response => response.ok)) {
+        const [toBuy, bought] = await Promise.all(responses.map(response => response.json()));
+        setItems([
+          ...toBuy.map(item => ({ ...item, bought: false })),
+          ...bought.map(item => ({ ...item, bought: true })),
+        ]);
       } else {
         showNotification('Failed to fetch items');
       }